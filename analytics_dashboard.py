@@ -1,12 +1,22 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 import os # To construct absolute path
 
+from db import get_pool, lookup_shard, shard_file_paths # Same pooled, WAL-mode connections the Flask app uses
+import replica # Read-only snapshots refreshed by `flask refresh-replica`
+import task_stats # SQL aggregations shared with the Flask /analytics page
+import task_fields
+
 # --- Configuration ---
 # Assumes fixmate.db is in the same directory as this script
 DATABASE_FILENAME = 'fixmate.db'
+# Must match the app's DB_SHARDS; the user's tasks are read from their shard's file
+DB_SHARDS = int(os.environ.get('FIXMATE_DB_SHARDS', 1))
+# Read tasks from the replica snapshots instead of the files the app is writing (match the
+# app's ANALYTICS_REPLICA settings); falls back to the live file when the snapshot is too old
+USE_REPLICA = os.environ.get('FIXMATE_ANALYTICS_REPLICA', '').lower() in ('1', 'true', 'yes')
+REPLICA_MAX_AGE = float(os.environ.get('FIXMATE_ANALYTICS_REPLICA_MAX_AGE', replica.DEFAULT_MAX_AGE))
 st.set_page_config(page_title="My FixMate Analytics", layout="wide")
 st.title("📊 FixMate - My Task Analytics")
 
@@ -26,46 +36,116 @@ if user_id is None:
     st.stop() # Halt execution if no valid user_id
 
 # --- Database Connection Function (Cached) ---
-@st.cache_resource # Cache the connection for efficiency
+@st.cache_resource # Cache the pool for efficiency
 def get_connection(db_file):
+    """Returns the shared connection pool; borrow with `with get_connection(...).connection() as conn:`."""
     db_path = os.path.abspath(db_file)
     print(f"Connecting to Streamlit DB at: {db_path}") # For debugging path
-    return sqlite3.connect(db_path, check_same_thread=False) # check_same_thread=False needed for Streamlit
-
-# --- Data Loading Function (Filtered by user_id, Cached) ---
-@st.cache_data # Cache the data based on user_id (reruns if user_id changes)
-def load_user_data(user_id_param):
-    """Loads tasks specifically for the given user ID."""
-    conn = get_connection(DATABASE_FILENAME)
-    try:
-        # Select only tasks for the specific user
-        query = "SELECT * FROM tasks WHERE user_id = ?"
-        # Use params argument for safe query parameterization
-        df = pd.read_sql_query(query, conn, params=(user_id_param,))
-
-        # --- Data Type Conversions & Cleaning ---
-        # Convert due_date, coercing errors to NaT (Not a Time)
-        df['due_date'] = pd.to_datetime(df['due_date'], errors='coerce')
-        # Convert cost, coercing errors to NaN (Not a Number)
-        df['cost'] = pd.to_numeric(df['cost'], errors='coerce')
-        # Convert completed, filling missing values with 0, ensuring integer type
-        df['completed'] = pd.to_numeric(df['completed'], errors='coerce').fillna(0).astype(int)
-        # Ensure category is string, fill missing with 'Uncategorized'
-        df['category'] = df['category'].fillna('Uncategorized').astype(str)
-
-        print(f"Loaded {len(df)} tasks for user_id {user_id_param}") # Debug output
-        return df
-    except Exception as e:
-        st.error(f"🚨 Error loading data from database: {e}")
-        return pd.DataFrame() # Return empty DataFrame on error
-
-# --- Load Data for the specific user ---
-df_user = load_user_data(user_id)
+    # Small pool: Streamlit runs one script thread per browser session
+    return get_pool(db_path, size=2)
+
+def connect(db_file):
+    """Borrows a connection to db_file: a fresh read-only one for a replica (its file gets swapped), else pooled."""
+    if replica.is_replica(db_file):
+        return replica.replica_connection(db_file)
+    return get_connection(db_file).connection()
+
+def get_tasks_file(user_id_param):
+    """
+    (file to read the user's tasks from, snapshot time): their shard's file (DATABASE_FILENAME
+    unless sharded), or its replica and when it was taken with USE_REPLICA. Never cached.
+    """
+    tasks_file = DATABASE_FILENAME
+    if DB_SHARDS > 1:
+        with get_connection(DATABASE_FILENAME).connection() as conn:
+            tasks_file = shard_file_paths(DATABASE_FILENAME, DB_SHARDS)[lookup_shard(conn, user_id_param)]
+    if USE_REPLICA:
+        snapshot_file, snapshot_at = replica.fresh_replica(tasks_file, REPLICA_MAX_AGE)
+        if snapshot_file:
+            return snapshot_file, snapshot_at
+    return tasks_file, None
+
+# --- Data Loading Functions (Computed in SQL, Cached per data version) ---
+# Each loader takes the user's tasks file and data version as arguments. The Flask write
+# routes bump that version (and moving a user to another shard changes the file), so a
+# changed task list produces a new cache key and fresh numbers, while unchanged data is
+# served straight from Streamlit's cache.
+def get_data_version(db_file, user_id_param):
+    """Cheap primary-key lookup of the user's current data version (never cached)."""
+    with connect(db_file) as conn:
+        return task_stats.get_data_version(conn, user_id_param)
+
+@st.cache_data
+def load_status_counts(db_file, user_id_param, data_version):
+    """Returns (total, completed) task counts for the user."""
+    with connect(db_file) as conn:
+        rows = conn.execute(task_stats.STATUS_COUNTS_SQL, (user_id_param,)).fetchall()
+    counts = {row['completed']: row['task_count'] for row in rows}
+    return sum(counts.values()), counts.get(1, 0)
+
+@st.cache_data
+def load_category_counts(db_file, user_id_param, data_version):
+    """Returns a Series of task counts indexed by category name."""
+    with connect(db_file) as conn:
+        df = pd.read_sql_query(
+            task_stats.CATEGORY_COUNTS_SQL, conn, params=(user_id_param,),
+            index_col='category', dtype={'task_count': 'int64'}
+        )
+    return df['task_count']
+
+@st.cache_data
+def load_cost_stats(db_file, user_id_param, data_version):
+    """Returns (number of priced tasks, total cost, average cost)."""
+    with connect(db_file) as conn:
+        row = conn.execute(task_stats.COST_STATS_SQL, (user_id_param,)).fetchone()
+    return row['priced_tasks'], row['total_cost'], row['avg_cost']
+
+@st.cache_data
+def load_due_tasks(db_file, user_id_param, data_version, today_iso):
+    """Returns (overdue, upcoming) DataFrames of title/due_date/category, sorted by due date."""
+    overdue_range, upcoming_range = task_stats.due_window(datetime.fromisoformat(today_iso).date())
+    frames = []
+    with connect(db_file) as conn:
+        for start, end in (overdue_range, upcoming_range):
+            frames.append(pd.read_sql_query(
+                task_stats.DUE_TASKS_SQL, conn, params=(user_id_param, start, end),
+                parse_dates={'due_date': '%Y-%m-%d'}, # Always ISO dates (validated on save)
+                dtype={'title': 'string', 'category': 'category'}
+            ))
+    return frames[0], frames[1]
+
+@st.cache_data
+def load_raw_tasks(db_file, user_id_param, data_version):
+    """Loads the user's task list for the raw table view (no guide text)."""
+    # Stored as typed columns (cents, minutes, ISO dates), so nothing needs coercing here
+    query = f"""
+        SELECT {task_fields.select_columns(('id', 'title', 'category', 'due_date', 'frequency',
+                                            'cost', 'estimated_minutes', 'completed'))}
+        FROM tasks
+        WHERE user_id = ?
+        ORDER BY due_date ASC, title ASC
+    """
+    with connect(db_file) as conn:
+        return pd.read_sql_query(
+            query, conn, params=(user_id_param,),
+            parse_dates={'due_date': '%Y-%m-%d'},
+            dtype={'id': 'int64', 'title': 'string', 'category': 'category',
+                   'frequency': 'category', 'cost': 'float64',
+                   'estimated_minutes': 'Int64', 'completed': 'int8'}
+        )
+
+# --- Current data version for this user ---
+try:
+    tasks_file, snapshot_at = get_tasks_file(user_id)
+    data_version = get_data_version(tasks_file, user_id)
+except Exception as e:
+    st.error(f"🚨 Error loading data from database: {e}")
+    st.stop()
 
 # --- Display Username (Optional but nice) ---
 try:
-    conn = get_connection(DATABASE_FILENAME)
-    user_info = pd.read_sql_query("SELECT username FROM users WHERE id = ?", conn, params=(user_id,))
+    with get_connection(DATABASE_FILENAME).connection() as conn:
+        user_info = pd.read_sql_query("SELECT username FROM users WHERE id = ?", conn, params=(user_id,))
     if not user_info.empty:
         st.subheader(f"Analytics for User: {user_info['username'].iloc[0]}")
     else:
@@ -73,17 +153,22 @@ try:
 except Exception as e:
      st.warning(f"Could not retrieve username: {e}")
 
+# --- Data Freshness ---
+if snapshot_at:
+    age_minutes = int((datetime.now(timezone.utc) - snapshot_at).total_seconds() // 60)
+    st.caption(f"🕒 Figures from a snapshot taken {snapshot_at:%Y-%m-%d %H:%M} UTC "
+               f"({age_minutes} min ago); recent changes may not show yet.")
+
 
 # --- Handle No Tasks ---
-if df_user.empty:
+total_tasks, completed_tasks = load_status_counts(tasks_file, user_id, data_version)
+if total_tasks == 0:
     st.warning(f"🤷 No tasks found for you (User ID {user_id}). Add some tasks in the main FixMate application!")
     st.stop() # Stop execution if there's no data to analyze
 
 # --- Display Metrics ---
 st.markdown("---")
 st.subheader("📊 Overall Summary")
-total_tasks = len(df_user)
-completed_tasks = df_user['completed'].sum() # Summing 0s and 1s gives count of 1s
 pending_tasks = total_tasks - completed_tasks
 
 col1, col2, col3 = st.columns(3)
@@ -98,18 +183,13 @@ col_viz1, col_viz2 = st.columns(2)
 with col_viz1:
     # --- Completion Status Chart ---
     st.subheader("📈 Completion Status")
-    completion_status = df_user['completed'].map({0: 'Pending', 1: 'Complete'}).value_counts()
-    # Ensure both categories exist for consistent charting
-    if 'Pending' not in completion_status: completion_status['Pending'] = 0
-    if 'Complete' not in completion_status: completion_status['Complete'] = 0
+    completion_status = pd.Series({'Pending': pending_tasks, 'Complete': completed_tasks})
     st.bar_chart(completion_status)
 
     # --- Cost Analysis ---
     st.subheader("💰 Cost Overview")
-    valid_costs = df_user['cost'].dropna() # Ignore tasks without cost
-    if not valid_costs.empty:
-        total_cost = valid_costs.sum()
-        avg_cost = valid_costs.mean()
+    priced_tasks, total_cost, avg_cost = load_cost_stats(tasks_file, user_id, data_version) # Ignores tasks without cost
+    if priced_tasks:
         cost_m1, cost_m2 = st.columns(2)
         cost_m1.metric("Total Estimated Cost", f"${total_cost:,.2f}")
         cost_m2.metric("Avg Cost per Task", f"${avg_cost:,.2f}")
@@ -119,7 +199,7 @@ with col_viz1:
 with col_viz2:
     # --- Tasks per Category ---
     st.subheader("📁 Tasks by Category")
-    category_counts = df_user['category'].value_counts()
+    category_counts = load_category_counts(tasks_file, user_id, data_version)
     if not category_counts.empty:
         st.bar_chart(category_counts)
         # Expander for table view
@@ -131,37 +211,29 @@ with col_viz2:
 # --- Upcoming & Overdue Tasks ---
 st.markdown("---")
 st.subheader("⏰ Due Dates Analysis")
-today = pd.Timestamp(datetime.now().date()) # Get today's date without time
-upcoming_cutoff = today + timedelta(days=7) # Example: tasks due within next 7 days
-
-# Filter tasks that have a valid due date AND are not completed
-df_dated_pending = df_user.dropna(subset=['due_date'])
-df_dated_pending = df_dated_pending[df_dated_pending['completed'] == 0]
-
-upcoming_tasks = df_dated_pending[
-    (df_dated_pending['due_date'] >= today) &
-    (df_dated_pending['due_date'] <= upcoming_cutoff)
-]
-overdue_tasks = df_dated_pending[df_dated_pending['due_date'] < today]
+# Filtering by due date happens in SQL on the ISO date strings
+overdue_tasks, upcoming_tasks = load_due_tasks(tasks_file, user_id, data_version, datetime.now().date().isoformat())
 
 due_col1, due_col2 = st.columns(2)
 with due_col1:
     st.markdown("**🚨 Overdue Tasks**")
     if not overdue_tasks.empty:
-        st.dataframe(overdue_tasks[['title', 'due_date', 'category']].sort_values(by='due_date'))
+        st.dataframe(overdue_tasks)
     else:
         st.success("✅ No overdue tasks!")
 
 with due_col2:
     st.markdown(f"**📅 Upcoming Tasks (Next 7 Days)**")
     if not upcoming_tasks.empty:
-        st.dataframe(upcoming_tasks[['title', 'due_date', 'category']].sort_values(by='due_date'))
+        st.dataframe(upcoming_tasks)
     else:
         st.info("📭 No tasks due soon.")
 
 # --- Raw Data View (Filtered for the user) ---
 st.markdown("---")
 with st.expander("📋 View Your Raw Task Data"):
-    st.dataframe(df_user)
+    # Only query the full list when asked for it
+    if st.checkbox("Load task table"):
+        st.dataframe(load_raw_tasks(tasks_file, user_id, data_version))
 
 st.caption("End of Report")
@@ -0,0 +1,206 @@
+# --- Imports ---
+import json
+import os
+from datetime import date, datetime, timezone
+
+try:
+    import pyarrow as pa # Optional: pip install pyarrow for the columnar analytics export
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# --- Default Export Settings (override via app.config / CLI options) ---
+DEFAULT_CHUNK_IDS = 50000 # Task ids per file; a changed task rewrites only its file
+COMPRESSION = 'zstd'
+STATE_FILENAME = '_export.json' # Leading underscore: dataset readers skip it
+
+# --- Columnar Analytics Export ---
+# `flask export-analytics` copies the columns fleet-wide reports need into Parquet files:
+#
+#     <export dir>/tasks/shard=0/part-00000.parquet   tasks 0..49999 of fixmate.db
+#     <export dir>/tasks/shard=0/part-00001.parquet   tasks 50000..99999
+#     <export dir>/tasks/shard=1/part-00000.parquet   (fixmate.shard1.db, own task ids)
+#
+# The first export into a directory reads every task. After that, only tasks listed in
+# task_changes (kept by triggers, see migration 12) are read: each file holding one of
+# them is loaded, the changed rows are swapped for their current values (or dropped if
+# deleted) and the file is replaced. Reports then read just the columns they use from
+# the memory-mapped files instead of querying every user's rows in SQLite.
+
+EXPORT_SELECT_SQL = '''SELECT t.id, t.user_id, c.name AS category, t.due_date, t.completed,
+        t.cost_cents, t.estimated_minutes, t.recur_unit, t.created_timestamp
+    FROM tasks t LEFT JOIN categories c ON c.id = t.category_id'''
+CHUNK_ROWS_SQL = f'{EXPORT_SELECT_SQL} WHERE t.id >= ? AND t.id < ? ORDER BY t.id'
+CHANGED_ROWS_SQL = (f'{EXPORT_SELECT_SQL} WHERE t.id IN (SELECT task_id FROM task_changes '
+                    'WHERE task_id >= ? AND task_id < ? AND seq <= ?) ORDER BY t.id')
+# Every task changed up to a counter value, in id order (walks the primary key)
+CHANGED_IDS_SQL = 'SELECT task_id FROM task_changes WHERE seq <= ? ORDER BY task_id'
+PRUNE_CHANGES_SQL = 'DELETE FROM task_changes WHERE seq <= ?'
+
+
+def require_pyarrow():
+    if pa is None:
+        raise RuntimeError("The analytics export needs pyarrow: pip install pyarrow")
+
+def task_schema():
+    require_pyarrow()
+    return pa.schema([
+        ('id', pa.int64()),
+        ('user_id', pa.int64()),
+        ('category', pa.string()),
+        ('due_date', pa.date32()),
+        ('completed', pa.bool_()),
+        ('cost_cents', pa.int64()),
+        ('estimated_minutes', pa.int32()),
+        ('recur_unit', pa.string()),
+        ('created_at', pa.timestamp('ms')),
+    ])
+
+
+# --- Rows -> Arrow ---
+def _as_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None # Pre-migration-9 oddities; left out of date-based reports
+
+def _as_datetime(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+def rows_to_table(rows):
+    """Builds a table in task_schema() from EXPORT_SELECT_SQL rows."""
+    columns = list(zip(*rows)) if rows else [()] * 9
+    ids, user_ids, categories, due_dates, completed, costs, minutes, recur_units, created = columns
+    return pa.Table.from_arrays([
+        pa.array(ids, pa.int64()),
+        pa.array(user_ids, pa.int64()),
+        pa.array(categories, pa.string()),
+        pa.array([_as_date(value) for value in due_dates], pa.date32()),
+        pa.array([bool(value) for value in completed], pa.bool_()),
+        pa.array(costs, pa.int64()),
+        pa.array(minutes, pa.int32()),
+        pa.array(recur_units, pa.string()),
+        pa.array([_as_datetime(value) for value in created], pa.timestamp('ms')),
+    ], schema=task_schema())
+
+
+# --- Writing ---
+def _shard_dir(export_dir, shard):
+    return os.path.join(export_dir, 'tasks', f'shard={shard}')
+
+def _chunk_path(shard_dir, chunk):
+    return os.path.join(shard_dir, f'part-{chunk:05d}.parquet')
+
+def _write_chunk(path, table):
+    """Replaces one file atomically (readers see the old or the new one); removes it if empty."""
+    if table.num_rows == 0:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    building = f'{path}.tmp'
+    pq.write_table(table, building, compression=COMPRESSION)
+    os.replace(building, path)
+
+def _read_state(shard_dir):
+    try:
+        with open(os.path.join(shard_dir, STATE_FILENAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_state(shard_dir, state):
+    path = os.path.join(shard_dir, STATE_FILENAME)
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(f'{path}.tmp', path)
+
+def export_shard(db, export_dir, shard=0, chunk_ids=DEFAULT_CHUNK_IDS, full=False):
+    """
+    Brings the files for one database file up to date. Returns (mode, files written,
+    tasks read). `db` is a connection to that file; the export reads it in one
+    transaction, so the files match one moment however much is written meanwhile.
+    """
+    require_pyarrow()
+    shard_dir = _shard_dir(export_dir, shard)
+    os.makedirs(shard_dir, exist_ok=True)
+    state = _read_state(shard_dir)
+    # A new directory (or one split into different-sized files) starts from every task
+    full = full or state is None or state.get('chunk_ids') != chunk_ids
+    written = read = 0
+
+    db.execute('BEGIN')
+    try:
+        last_seq = db.execute('SELECT COALESCE(MAX(seq), 0) FROM task_changes').fetchone()[0]
+        if full:
+            max_id = db.execute('SELECT COALESCE(MAX(id), 0) FROM tasks').fetchone()[0]
+            chunks = range(max_id // chunk_ids + 1)
+            for name in os.listdir(shard_dir): # Files past the last task (e.g. after a move)
+                if name.startswith('part-') and name.endswith('.parquet') and int(name[5:10]) >= len(chunks):
+                    os.remove(os.path.join(shard_dir, name))
+            for chunk in chunks:
+                rows = db.execute(CHUNK_ROWS_SQL, (chunk * chunk_ids, (chunk + 1) * chunk_ids)).fetchall()
+                _write_chunk(_chunk_path(shard_dir, chunk), rows_to_table(rows))
+                written += bool(rows) # Empty id ranges get no file
+                read += len(rows)
+        else:
+            changed = {}
+            for (task_id,) in db.execute(CHANGED_IDS_SQL, (last_seq,)):
+                changed.setdefault(task_id // chunk_ids, []).append(task_id)
+            for chunk, ids in changed.items():
+                rows = db.execute(CHANGED_ROWS_SQL, (chunk * chunk_ids, (chunk + 1) * chunk_ids, last_seq)).fetchall()
+                path = _chunk_path(shard_dir, chunk)
+                table = rows_to_table(rows)
+                if os.path.exists(path):
+                    old = pq.read_table(path, memory_map=True)
+                    kept = old.filter(pc.invert(pc.is_in(old['id'], value_set=pa.array(ids, pa.int64()))))
+                    table = pa.concat_tables([kept, table]).sort_by('id')
+                _write_chunk(path, table)
+                written += 1
+                read += len(rows)
+    finally:
+        db.rollback() # Only read; ends the snapshot
+
+    # The files are in place, so the handled changes can go; later ones have a higher seq
+    db.execute(PRUNE_CHANGES_SQL, (last_seq,))
+    db.commit()
+    _write_state(shard_dir, {'exported_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                             'chunk_ids': chunk_ids})
+    return ('full' if full else 'incremental'), written, read
+
+
+# --- Reading ---
+def load_tasks(export_dir, columns=None):
+    """Every exported task (all shards) as one pyarrow Table, reading only `columns` from memory-mapped files."""
+    require_pyarrow()
+    dataset = ds.dataset(os.path.join(export_dir, 'tasks'), format='parquet', partitioning='hive',
+                         filesystem=pafs.LocalFileSystem(use_mmap=True))
+    return dataset.to_table(columns=columns)
+
+def monthly_costs(table):
+    """[{month, category, tasks, cost}] by due month ('YYYY-MM') and category, newest month first."""
+    table = table.append_column('month', pc.strftime(table['due_date'], format='%Y-%m'))
+    grouped = table.group_by(['month', 'category']).aggregate([('id', 'count'), ('cost_cents', 'sum')])
+    rows = [
+        {'month': row['month'], 'category': row['category'] or 'Uncategorized',
+         'tasks': row['id_count'], 'cost': (row['cost_cents_sum'] or 0) / 100}
+        for row in grouped.to_pylist() if row['month']
+    ]
+    rows.sort(key=lambda r: (-r['cost'], r['category']))
+    rows.sort(key=lambda r: r['month'], reverse=True) # Stable: costliest first within a month
+    return rows
+
+def completion_rates(table):
+    """[{category, tasks, done, rate}] for every category, most tasks first."""
+    grouped = table.group_by('category').aggregate([('completed', 'count'), ('completed', 'sum')])
+    rows = [
+        {'category': row['category'] or 'Uncategorized', 'tasks': row['completed_count'],
+         'done': row['completed_sum'], 'rate': row['completed_sum'] / row['completed_count']}
+        for row in grouped.to_pylist() if row['completed_count']
+    ]
+    return sorted(rows, key=lambda r: (-r['tasks'], r['category']))
@@ -0,0 +1,359 @@
+# --- Imports ---
+import gzip
+import sqlite3
+from datetime import date
+from functools import wraps
+
+from flask import Blueprint, current_app, jsonify, request, session, url_for
+
+import auth
+import fragment_cache
+import pagination
+import recurrence
+import task_calendar
+import task_fields
+import task_io
+import task_ops
+import task_pages
+import task_stats
+from db import get_db, get_directory_db
+from write_queue import run_write
+
+# --- JSON API (version 1) ---
+# The same tasks as the HTML pages, for the mobile client and integrations.
+# Authentication is the normal session cookie (log in with POST /api/v1/session).
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Columns a client may read; `fields=` picks a subset (id is always included)
+API_FIELDS = (
+    'id', 'title', 'category', 'due_date', 'frequency', 'cost', 'estimated_time',
+    'estimated_minutes', 'guide', 'video_url', 'completed', 'next_due_date', 'created_timestamp',
+)
+# Columns a client may write (same rules as the CSV/JSON Lines import); estimated_minutes
+# is the estimate as a number, instead of text like "1 h 30 min" in estimated_time
+WRITABLE_FIELDS = task_io.TASK_FIELDS + ('estimated_minutes',)
+STATUS_VIEWS = {'pending': 'incomplete', 'completed': 'completed'}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+GZIP_MIN_SIZE = 500 # Smaller responses aren't worth compressing
+
+
+class ApiError(Exception):
+    """Turned into a JSON {"error": ...} response with the given status code."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@api.errorhandler(ApiError)
+def handle_api_error(error):
+    return jsonify(error=error.message), error.status
+
+@api.errorhandler(sqlite3.Error)
+def handle_db_error(error):
+    current_app.logger.error(f"API DB Error: {error}")
+    return jsonify(error="A database error occurred."), 500
+
+
+def api_login_required(f):
+    """Like login_required in app.py, but answers 401 JSON instead of redirecting."""
+    @wraps(f)
+    def wrapped(*args, **kwargs):
+        if 'user' not in session:
+            raise ApiError("Authentication required.", 401)
+        if auth.load_session_user(get_directory_db(), session['user']['id']) is None:
+            session.clear()
+            raise ApiError("Authentication required.", 401)
+        return f(*args, **kwargs)
+    return wrapped
+
+
+# --- Request Helpers ---
+def parse_fields():
+    """Returns the columns named in ?fields=a,b (id always first), or all of API_FIELDS."""
+    raw = request.args.get('fields', '').strip()
+    if not raw:
+        return list(API_FIELDS)
+    requested = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in requested if name not in API_FIELDS]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(API_FIELDS)}.")
+    return ['id'] + [name for name in dict.fromkeys(requested) if name != 'id']
+
+def json_body():
+    body = request.get_json(silent=True)
+    if body is None:
+        raise ApiError("Request body must be JSON (Content-Type: application/json).")
+    return body
+
+def _is_task_id(value):
+    """An int, or a string of digits (JSON clients may send ids as strings)."""
+    if isinstance(value, bool):
+        return False
+    return isinstance(value, int) or (isinstance(value, str) and value.strip().isdigit())
+
+def serialize(row, fields):
+    """Picks `fields` from a tasks row; completed becomes a boolean."""
+    task = {name: row[name] for name in fields}
+    if 'completed' in task:
+        task['completed'] = bool(task['completed'])
+    return task
+
+def conditional(name, user_id, *parts):
+    """
+    Returns ((etag, last_modified), 304 response or None) for a read of the user's data. The ETag
+    follows the user's data version, so any write makes every earlier ETag stale.
+    """
+    version, updated_at = task_stats.get_data_stamp(get_db(), user_id)
+    key = fragment_cache.fragment_key(name, user_id, version, *parts)
+    etag = fragment_cache.make_etag(key)
+    last_modified = fragment_cache.last_modified_from(updated_at)
+    return (etag, last_modified), fragment_cache.not_modified(etag, last_modified, weak=True)
+
+def fetch_task(db, user_id, task_id, fields):
+    row = db.execute(
+        f'SELECT {task_fields.select_columns(fields)} FROM tasks WHERE id = ? AND user_id = ?',
+        (task_id, user_id)
+    ).fetchone()
+    if row is None:
+        raise ApiError("Task not found.", 404)
+    return row
+
+
+# --- Session ---
+@api.route('/session', methods=['POST'])
+def create_session():
+    """Logs in with {"username", "password"} and sets the session cookie."""
+    body = json_body()
+    if not isinstance(body, dict):
+        raise ApiError("Request body must be a JSON object with username and password.")
+    username = str(body.get('username', '')).strip()
+    password = str(body.get('password', ''))
+    if not username or not password:
+        raise ApiError("username and password are required.")
+    try:
+        user = auth.authenticate(get_directory_db(), username, password, request.remote_addr)
+    except auth.LoginRateLimited as e:
+        response = jsonify(error=str(e))
+        response.status_code = 429
+        response.headers['Retry-After'] = str(int(e.retry_after) + 1)
+        return response
+    except auth.LoginBusy as e:
+        raise ApiError(str(e), 503)
+    if not user:
+        raise ApiError("Invalid username or password.", 401)
+    session.clear()
+    session['user'] = {'id': user['id'], 'username': user['username']}
+    return jsonify(id=user['id'], username=user['username'])
+
+@api.route('/session', methods=['DELETE'])
+def delete_session():
+    session.clear()
+    return '', 204
+
+
+# --- Tasks ---
+@api.route('/tasks', methods=['GET'])
+@api_login_required
+def list_tasks():
+    """
+    One page of tasks: ?status=pending|completed (default pending), category=,
+    due_after=, due_before= (YYYY-MM-DD, inclusive), limit= (max 200), cursor=, fields=.
+    Responds {"tasks": [...], "next_cursor": "..." or null}.
+    """
+    user_id = session['user']['id']
+    status = request.args.get('status', 'pending')
+    if status not in STATUS_VIEWS:
+        raise ApiError("status must be 'pending' or 'completed'.")
+    view = STATUS_VIEWS[status]
+    try:
+        limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        raise ApiError("limit must be a number.")
+    cursor = pagination.decode_cursor(request.args.get('cursor'))
+    if request.args.get('cursor') and cursor is None:
+        raise ApiError("cursor is not valid.")
+    fields = parse_fields()
+
+    filters = []
+    if request.args.get('category'):
+        filters.append((f'category_id = {task_fields.CATEGORY_ID_SQL}', [request.args['category']]))
+    for name, operator in (('due_after', '>='), ('due_before', '<=')):
+        value = request.args.get(name)
+        if value:
+            if recurrence.parse_iso_date(value) is None:
+                raise ApiError(f"{name} must be a YYYY-MM-DD date.")
+            filters.append((f'due_date {operator} ?', [value]))
+
+    db = get_db()
+    task_pages.reopen_due_tasks(db, user_id) # Same view of recurring tasks as the dashboard
+    validators, unchanged = conditional('api_tasks', user_id, request.query_string.decode('utf-8', 'replace'))
+    if unchanged:
+        return unchanged
+
+    # The sort columns are always selected (the cursor is built from them), then trimmed to `fields`
+    columns = list(dict.fromkeys(fields + list(pagination.SORT_COLUMNS[view])))
+    rows, next_cursor = pagination.fetch_task_page(
+        db, user_id, view, cursor, limit, columns=task_fields.select_columns(columns), filters=filters
+    )
+    response = jsonify(tasks=[serialize(row, fields) for row in rows], next_cursor=next_cursor)
+    return fragment_cache.add_validators(response, *validators, weak=True)
+
+@api.route('/tasks/<int:task_id>', methods=['GET'])
+@api_login_required
+def get_task(task_id):
+    user_id = session['user']['id']
+    fields = parse_fields()
+    validators, unchanged = conditional('api_task', user_id, task_id, ','.join(fields))
+    if unchanged:
+        return unchanged
+    row = fetch_task(get_db(), user_id, task_id, fields)
+    return fragment_cache.add_validators(jsonify(serialize(row, fields)), *validators, weak=True)
+
+@api.route('/tasks', methods=['POST'])
+@api_login_required
+def create_tasks():
+    """
+    Creates one task from a JSON object (201 with the task), or many from a JSON
+    array (201 with {"imported", "skipped", "errors"}), validated like an import.
+    """
+    user_id = session['user']['id']
+    body = json_body()
+    db = get_db()
+
+    if isinstance(body, list):
+        records = [record if isinstance(record, dict) else {'__error__': "each item must be a JSON object"}
+                   for record in body]
+        imported, skipped, errors = task_io.import_tasks(run_write, user_id, records)
+        return jsonify(imported=imported, skipped=skipped, errors=errors), 201
+
+    if not isinstance(body, dict):
+        raise ApiError("Request body must be a JSON object or array.")
+    unknown = set(body) - set(WRITABLE_FIELDS)
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(sorted(unknown))}.")
+    values, error = task_io.validate_row(body)
+    if error:
+        raise ApiError(error, 422)
+    def create(db):
+        task_id = task_io.insert_task(db, user_id, values)
+        task_stats.bump_data_version(db, user_id)
+        return task_id
+    task_id = run_write(create)
+
+    fields = parse_fields()
+    response = jsonify(serialize(fetch_task(db, user_id, task_id, fields), fields))
+    response.status_code = 201
+    response.headers['Location'] = url_for('api.get_task', task_id=task_id)
+    return response
+
+@api.route('/tasks/<int:task_id>', methods=['PATCH'])
+@api_login_required
+def update_task(task_id):
+    """
+    Changes only the fields sent. Setting completed goes through the same logic as
+    the Complete/Undo buttons, so recurring tasks get their history and next date.
+    """
+    user_id = session['user']['id']
+    body = json_body()
+    if not isinstance(body, dict) or not body:
+        raise ApiError("Request body must be a JSON object with the fields to change.")
+    unknown = set(body) - set(WRITABLE_FIELDS)
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(sorted(unknown))}.")
+
+    db = get_db()
+    # Only the text estimate is merged in, so a sent estimated_minutes wins over it
+    current = fetch_task(db, user_id, task_id, task_io.TASK_FIELDS)
+    merged = dict(zip(task_io.TASK_FIELDS, current))
+    merged.update(body)
+    values, error = task_io.validate_row(merged)
+    if error:
+        raise ApiError(error, 422)
+    completed = values[8]
+
+    def update(db):
+        # Written with the old completed flag; a change goes through task_ops below
+        task_io.update_task(db, user_id, task_id, values[:8] + (current['completed'],) + values[9:])
+        if completed != current['completed']:
+            if completed:
+                task_ops.complete_tasks(db, user_id, [task_id])
+            else:
+                task_ops.uncomplete_tasks(db, user_id, [task_id])
+        task_stats.bump_data_version(db, user_id)
+    run_write(update)
+
+    fields = parse_fields()
+    return jsonify(serialize(fetch_task(db, user_id, task_id, fields), fields))
+
+@api.route('/tasks/<int:task_id>', methods=['DELETE'])
+@api_login_required
+def delete_task(task_id):
+    changed = run_write(task_ops.apply_action, session['user']['id'], 'delete', [task_id])
+    if not changed:
+        raise ApiError("Task not found.", 404)
+    return '', 204
+
+@api.route('/tasks/batch', methods=['POST'])
+@api_login_required
+def batch_tasks():
+    """{"action": "complete"|"uncomplete"|"delete", "ids": [...]} -> {"changed": n}"""
+    body = json_body()
+    action = body.get('action') if isinstance(body, dict) else None
+    if action not in task_ops.BATCH_ACTIONS:
+        raise ApiError(f"action must be one of: {', '.join(task_ops.BATCH_ACTIONS)}.")
+    ids = body.get('ids')
+    # A string would be read one digit at a time ("23" -> tasks 2 and 3)
+    if not isinstance(ids, list) or not all(_is_task_id(value) for value in ids):
+        raise ApiError("ids must be a non-empty list of task ids.")
+    ids = task_ops.parse_ids(ids)
+    if not ids:
+        raise ApiError("ids must be a non-empty list of task ids.")
+    changed = run_write(task_ops.apply_action, session['user']['id'], action, ids)
+    return jsonify(changed=changed)
+
+
+# --- Calendar ---
+@api.route('/calendar', methods=['GET'])
+@api_login_required
+def calendar_window():
+    """
+    Tasks dated ?start=..&end= (YYYY-MM-DD, inclusive, at most 93 days), in date order,
+    plus upcoming occurrences of recurring tasks in that range ("projected": true).
+    Responds {"start", "end", "entries": [{"id", "title", "category", "date", "completed", "projected"}]}.
+    """
+    user_id = session['user']['id']
+    try:
+        start, end = task_calendar.parse_window(request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        raise ApiError(f"{e}.")
+    db = get_db()
+    task_pages.reopen_due_tasks(db, user_id)
+    today = date.today()
+    validators, unchanged = conditional('api_calendar', user_id, start.isoformat(), end.isoformat(),
+                                        today.isoformat())
+    if unchanged:
+        return unchanged
+    entries = list(task_calendar.iter_window(db, user_id, start, end, today))
+    response = jsonify(start=start.isoformat(), end=end.isoformat(), entries=entries)
+    return fragment_cache.add_validators(response, *validators, weak=True)
+
+
+# --- Compression ---
+@api.after_request
+def compress(response):
+    """Gzips JSON bodies for clients that accept it (lists of tasks shrink a lot)."""
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers
+            or 'gzip' not in request.headers.get('Accept-Encoding', '').lower()):
+        return response
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < GZIP_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=6))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
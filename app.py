@@ -1,38 +1,137 @@
 # --- Imports ---
 from flask import (
     Flask, render_template, redirect, url_for,
-    request, session, g, flash # Added request here
+    request, session, g, flash, # Added request here
+    Response, stream_with_context
 )
+import os
 import sqlite3
+import time
+import contextlib
+import csv
+import click
 from functools import wraps
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timezone # Added timezone for utcnow fix
+from datetime import date, datetime, timedelta, timezone # Added timezone for utcnow fix
+
+from db import get_db, get_directory_db, get_app_pool, shard_count, shard_paths, init_app as init_db_pool
+from metrics import init_app as init_metrics
+from fragment_cache import init_app as init_fragment_cache
+from auth import init_app as init_auth
+from sessions import init_app as init_sessions
+from assets import init_app as init_assets
+from write_queue import init_app as init_write_queue, run_write
+import task_stats
+import task_io
+import task_ops
+import task_pages
+import task_calendar
+import recurrence
+import migrations
+import auth
+import fragment_cache
+from pagination import fetch_task_page
+from api import api as api_blueprint
+import reminders
+import search as search_module # Module name would clash with the search() route
+import sessions
+import assets
+import shards
+import replica
+import analytics_export
 
 # --- App Initialization ---
 app = Flask(__name__)
-# IMPORTANT: Replace with your own secret key! Use a long, random string.
+# IMPORTANT: Set your own secret key in the FIXMATE_SECRET_KEY environment variable (see below).
 # You can generate one using: python -c 'import secrets; print(secrets.token_hex())'
-app.secret_key = 'replace_this_with_your_own_secret_string_now!' # <-- CHANGE THIS!
+# This placeholder is only for local development; serve.py refuses to start with it.
+DEV_SECRET_KEY = 'replace_this_with_your_own_secret_string_now!'
+app.secret_key = DEV_SECRET_KEY
 DATABASE = 'fixmate.db'
 
+# --- Database Settings ---
+# Connections come from a per-process pool (see db.py) instead of being opened per request
+app.config.from_mapping(
+    DATABASE=DATABASE,
+    DB_POOL_SIZE=8,              # Max open connections per worker process
+    DB_BUSY_TIMEOUT_MS=5000,     # Writers wait this long for SQLite's lock
+    DB_STATEMENT_CACHE_SIZE=128, # Prepared statements cached per connection
+    DB_SHARDS=1,                 # Database files users' tasks are spread over (see shards.py)
+    # --- Write Queue (see write_queue.py) ---
+    WRITE_QUEUE=False,           # Apply writes on one thread per database file, group-committed
+    WRITE_QUEUE_MAX_BATCH=64,    # Writes committed together at most
+    WRITE_QUEUE_MAX_DELAY_MS=2,  # How long the writer waits to fill a batch
+    # --- Instrumentation (see metrics.py) ---
+    SQL_TRACING=False,           # Time every SQL statement (adds a little to each one)
+    SLOW_QUERY_MS=100,           # Log statements slower than this
+    SQL_EXPLAIN_SLOW=False,      # Also log the query plan of slow statements (debugging)
+    METRICS_ENDPOINT=None,       # e.g. '/metrics' (Prometheus text format); None to disable
+    METRICS_TOKEN=None,          # Bearer token the metrics page requires; None: localhost only
+    # --- Fragment Cache (see fragment_cache.py) ---
+    FRAGMENT_CACHE_ENABLED=True,
+    FRAGMENT_CACHE_MAX_ENTRIES=2000, # Rendered fragments kept per worker process
+    FRAGMENT_CACHE_TTL=300,          # Seconds before a fragment is re-rendered anyway
+    # --- Due-Date Reminders (`flask send-reminders`, see reminders.py) ---
+    REMINDER_SINK='outbox',          # 'outbox' (reminder_outbox table) or 'file'
+    REMINDER_FILE='reminders.jsonl', # Used by the 'file' sink
+    REMINDER_HOUR=8,                 # Local hour reminders go out
+    REMINDER_LEAD_DAYS=0,            # Days before the due date
+    REMINDER_HORIZON_DAYS=7,         # Days of upcoming reminders kept in memory
+    # --- Login (see auth.py) ---
+    PASSWORD_HASH_METHOD='scrypt:32768:8:1', # Changing this rehashes each password at its next login
+    LOGIN_HASH_WORKERS=4,            # Password hashes computed at once per process
+    LOGIN_MAX_PENDING=32,            # Logins that may wait for a hash worker; more get "busy"
+    LOGIN_RATE_PER_USER=(5, 12.0),   # Burst of 5 attempts per username, then 1 every 12 s
+    LOGIN_RATE_PER_IP=(20, 3.0),     # Burst of 20 attempts per address, then 1 every 3 s
+    SESSION_USER_CACHE_TTL=60,       # Seconds a logged-in user's row is cached
+    # --- Sessions (see sessions.py) ---
+    SESSION_BACKEND='cookie',        # 'cookie' (signed cookie), 'sqlite' (sessions table) or 'memory' (one process only)
+    SESSION_COMPACT_INTERVAL=3600,   # Seconds between sweeps of expired sessions
+    # --- Startup (see serve.py) ---
+    DB_POOL_WARM=2,                  # Connections each worker opens before taking traffic
+    # --- Async Server (see asgi.py) ---
+    ASYNC_DB_WORKERS=4,              # Threads running SQLite calls for the async views
+    ASYNC_SYNC_THREADS=4,            # Threads serving the remaining (sync) Flask routes
+    # --- Analytics Replica (`flask refresh-replica`, see replica.py) ---
+    ANALYTICS_REPLICA=False,         # Read /analytics from the snapshot files, not the live ones
+    ANALYTICS_REPLICA_MAX_AGE=3600,  # Seconds; an older (or missing) snapshot falls back to live data
+    REPLICA_PAGES_PER_STEP=1024,     # Pages the backup copies per step
+    REPLICA_STEP_PAUSE_MS=0,         # Pause between steps (more room for the app's writers)
+    # --- Columnar Export (`flask export-analytics`, see analytics_export.py) ---
+    ANALYTICS_EXPORT_DIR=None,       # Parquet files for fleet-wide reports (default: instance/analytics)
+    ANALYTICS_EXPORT_CHUNK_IDS=50000, # Task ids per file; a change rewrites only the file holding it
+    # --- Templates and Static Files (see assets.py) ---
+    TEMPLATE_BYTECODE_CACHE=True,    # Compiled templates kept in instance/jinja_cache
+    ASSET_FINGERPRINTING=True        # /static/<name>.<hash>.css, cached by browsers for a year
+)
+# Any setting can be overridden from the environment with a FIXMATE_ prefix, e.g.
+# FIXMATE_SECRET_KEY=..., FIXMATE_DATABASE=/srv/fixmate/fixmate.db, FIXMATE_DB_POOL_SIZE=16.
+# Values are parsed as JSON when possible (numbers, true/false, lists), else kept as strings.
+app.config.from_prefixed_env('FIXMATE')
+
+# --- Request/SQL/Template Metrics ---
+# Set up before the pool is first used so pooled connections are traced
+init_metrics(app)
+
+# --- Template Bytecode Cache, Fingerprinted/Precompressed Static Files ---
+# Before the fragment cache, whose namespace follows the asset URLs
+init_assets(app)
+
+# --- Rendered-Fragment Cache (dashboard list, task detail) ---
+init_fragment_cache(app)
+
+# --- Password Hashing, Login Rate Limits, Session-User Cache ---
+init_auth(app)
+
+# --- Server-Side Sessions (the cookie only carries an id) ---
+init_sessions(app)
+
+# --- Optional Group-Committing Writer Thread ---
+init_write_queue(app)
+
 # --- Database Helper Functions ---
-def get_db():
-    """Connects to the specific database."""
-    if 'db' not in g:
-        # Get absolute path to ensure correctness, especially for CLI commands
-        import os
-        db_path = os.path.abspath(DATABASE)
-        # print(f"Connecting to DB at: {db_path}") # Optional: for debugging path issues
-        g.db = sqlite3.connect(db_path)
-        g.db.row_factory = sqlite3.Row # Return rows that behave like dictionaries
-    return g.db
-
-@app.teardown_appcontext
-def close_db(error):
-    """Closes the database again at the end of the request."""
-    db = g.pop('db', None)
-    if db:
-        db.close()
+# get_db() borrows a pooled connection to the logged-in user's shard (get_directory_db()
+# for users and sessions); connections are handed back automatically at teardown
+init_db_pool(app)
 
 # --- Template Context Processor ---
 @app.context_processor
@@ -42,16 +141,31 @@ def inject_now():
     return {'now': datetime.now(timezone.utc)}
 
 # --- Login Decorator ---
+def check_login():
+    """
+    Puts the logged-in user on g. Returns None if the request may go ahead, else a
+    redirect to the login page. Also used by the async views (see async_views.py).
+    """
+    if 'user' not in session:
+        flash("Please log in to access this page.", "warning")
+        return redirect(url_for('login'))
+    # Confirm the account still exists (cached briefly, see auth.py) and keep it on g
+    try:
+        g.user = auth.load_session_user(get_directory_db(), session['user']['id'])
+    except sqlite3.Error as e:
+        app.logger.error(f"Session User DB Error: {e}")
+        g.user = session['user'] # Don't log people out over a transient error
+    if g.user is None:
+        session.clear()
+        flash("Your account could not be found. Please log in again.", "warning")
+        return redirect(url_for('login'))
+    return None
+
 def login_required(f):
     """Decorator to ensure user is logged in before accessing a route."""
     @wraps(f)
     def wrapped(*args, **kwargs):
-        if 'user' not in session:
-            flash("Please log in to access this page.", "warning")
-            return redirect(url_for('login'))
-        # Store user info in g for easy access during request if needed
-        # g.user = session.get('user') # Optional convenience
-        return f(*args, **kwargs)
+        return check_login() or f(*args, **kwargs)
     return wrapped
 
 # --- Basic Routes (Home, Login, Register, Logout) ---
@@ -63,7 +177,7 @@ def home():
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     """Handles user registration."""
-    db = get_db()
+    db = get_directory_db()
     if 'user' in session:
         return redirect(url_for('dashboard')) # Don't show register page if logged in
 
@@ -77,16 +191,23 @@ def register():
             return render_template('register.html')
         # Add more checks? e.g., password length
 
-        # --- Hash Password ---
-        hashed_password = generate_password_hash(password)
+        # --- Hash Password (configured method, on the bounded hash pool) ---
+        try:
+            hashed_password = auth.hash_password(password)
+        except auth.LoginBusy as e:
+            flash(str(e), 'warning')
+            return render_template('register.html'), 503
 
         # --- Insert into Database ---
-        try:
-            db.execute(
+        def create_user(db):
+            cursor = db.execute(
                 'INSERT INTO users (username, password_hash) VALUES (?, ?)',
                 (username, hashed_password)
             )
-            db.commit()
+            shards.assign_user(db, cursor.lastrowid, username) # Picks the database file for their tasks
+
+        try:
+            run_write(create_user, shard=0)
         except sqlite3.IntegrityError: # Specific error for UNIQUE constraint
             flash('Username already taken. Please choose another.', 'danger')
             return render_template('register.html')
@@ -122,7 +243,7 @@ def register():
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     """Handles user login."""
-    db = get_db()
+    db = get_directory_db()
     if 'user' in session:
         return redirect(url_for('dashboard')) # Don't show login page if logged in
 
@@ -136,19 +257,24 @@ def login():
             flash('Username and password are required.', 'danger')
             return render_template('login.html')
 
-        # --- Fetch User ---
+        # --- Verify Password (rate limited, hashed off the request thread) ---
         try:
-            user = db.execute(
-                'SELECT id, username, password_hash FROM users WHERE username = ?',
-                (username,)
-            ).fetchone()
+            user = auth.authenticate(db, username, password, request.remote_addr)
+        except auth.LoginRateLimited as e:
+            flash(str(e), 'danger')
+            response = app.make_response((render_template('login.html'), 429))
+            response.headers['Retry-After'] = str(int(e.retry_after) + 1)
+            return response
+        except auth.LoginBusy as e:
+            flash(str(e), 'warning')
+            return render_template('login.html'), 503
         except sqlite3.Error as e:
             flash(f'An error occurred during login: {e}', 'danger')
             app.logger.error(f"Login DB Error (Fetch User): {e}")
             return render_template('login.html')
 
-        # --- Verify Password and Create Session ---
-        if user and check_password_hash(user['password_hash'], password):
+        # --- Create Session ---
+        if user:
             session.clear() # Ensure clean session
             session['user'] = {
                 'id': user['id'],
@@ -178,158 +304,78 @@ def logout():
 
 # --- Core Application Routes (Dashboard, Tasks) ---
 
-# !!! THIS IS THE UPDATED DASHBOARD FUNCTION !!!
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    """Displays the user's task dashboard, toggling between views."""
-    # --- Determine which view to show based on query parameter ---
-    requested_view = request.args.get('view', 'incomplete') # Default to 'incomplete'
-    if requested_view not in ['incomplete', 'completed']:
-        current_view = 'incomplete' # Fallback for invalid values
-    else:
-        current_view = requested_view
-    # --- End view determination ---
-
+    """Displays one page of the user's task dashboard for the requested view."""
+    current_view, cursor, position = task_pages.dashboard_args()
     db = get_db()
     user_id = session['user']['id']
-    incomplete = []
-    completed = []
     try:
-        # Fetch both lists regardless of view; template will handle display
-        incomplete = db.execute(
-            'SELECT * FROM tasks WHERE user_id = ? AND completed = 0 ORDER BY due_date ASC, title ASC',
-            (user_id,)
-        ).fetchall()
-        completed = db.execute(
-            'SELECT * FROM tasks WHERE user_id = ? AND completed = 1 ORDER BY title ASC',
-            (user_id,)
-        ).fetchall()
+        # Read the version before the tasks: a write committing in between only makes this copy newer
+        stamp, due = task_pages.dashboard_stamp(db, user_id)
+        if due: # Bring back recurring tasks whose next occurrence has arrived
+            run_write(task_ops.reopen_due_recurring, user_id)
+            stamp = task_stats.get_data_stamp(db, user_id)
+        key, etag, last_modified = task_pages.page_validators('dashboard', user_id, stamp, current_view, position)
+        unchanged = fragment_cache.not_modified(etag, last_modified)
+        if unchanged:
+            return unchanged # Browser's copy is current (304)
+
+        def render_list():
+            # Only the list for the current view is fetched
+            tasks, next_cursor = fetch_task_page(db, user_id, current_view, cursor)
+            return task_pages.render_task_list(tasks, next_cursor, cursor, current_view)
+        task_list = fragment_cache.cached_fragment('dashboard', key, render_list)
     except sqlite3.Error as e:
-        flash(f"Error fetching tasks: {e}", "danger")
-        app.logger.error(f"Dashboard DB Error: {e}")
-        # Render dashboard even if tasks can't be fetched, but pass current_view
-        return render_template(
-            'dashboard.html',
-            incomplete_tasks=[],
-            completed_tasks=[],
-            current_view=current_view # Pass current view even on error
-        )
-
-    # Pass the task lists and current view to the template
-    return render_template(
-        'dashboard.html',
-        incomplete_tasks=incomplete,
-        completed_tasks=completed,
-        current_view=current_view # Pass the current view to the template
-    )
-# !!! END OF UPDATED DASHBOARD FUNCTION !!!
+        return task_pages.dashboard_failed(e, current_view)
+
+    # The rendered task list (fresh or cached) goes into the page template
+    return task_pages.with_validators(task_pages.render_dashboard(task_list, current_view), etag, last_modified)
 
 
 @app.route('/task/add', methods=['GET','POST'])
 @login_required
 def add_task():
     """Handles adding a new task."""
-    if request.method == 'POST':
-        form = request.form
-        db = get_db()
-        # Basic validation - ensure title is present
-        if not form.get('title','').strip():
-            flash("Task title cannot be empty.", "danger")
-            # Re-render form, potentially passing back other entered data if needed
-            return render_template('task_form.html', task=form, form_action=url_for('add_task'))
-
-        try:
-            db.execute(
-                '''INSERT INTO tasks
-                   (user_id, title, category, due_date, frequency, cost,
-                    estimated_time, guide, completed)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)''',
-                (
-                    session['user']['id'],
-                    form['title'].strip(), # Ensure title is stripped
-                    form.get('category'), form.get('due_date'), # Store dates as YYYY-MM-DD strings
-                    form.get('frequency'), form.get('cost'), # Store cost as number (REAL)
-                    form.get('estimated_time'), form.get('guide'),
-                    # video_url - not currently in form, could be added
-                )
-            )
-            db.commit()
-            flash("Task added successfully!", "success")
-        except sqlite3.Error as e:
-            flash(f"Error adding task: {e}", "danger")
-            app.logger.error(f"Add Task DB Error: {e}")
-            # Return to form on error, possibly pre-filling with form data
-            return render_template('task_form.html', task=form, form_action=url_for('add_task'))
-
-        return redirect(url_for('dashboard')) # Redirect to dashboard on success
+    if request.method != 'POST':
+        return task_pages.task_form()
 
-    # --- Show Add Task Form (GET request) ---
-    # Pass action URL for clarity in template
-    return render_template('task_form.html', task=None, form_action=url_for('add_task'))
+    user_id = session['user']['id']
+    values, invalid = task_pages.validate_task_form()
+    if invalid:
+        return invalid # The form again, with the entered data and the error
+    try:
+        run_write(task_pages.add_task, user_id, values)
+    except sqlite3.Error as e:
+        return task_pages.save_failed(e, request.form)
+    return task_pages.task_saved()
 
 
 @app.route('/task/edit/<int:id>', methods=['GET','POST'])
 @login_required
 def edit_task(id):
     """Handles editing an existing task."""
-    db = get_db()
     user_id = session['user']['id']
-    task = None # Initialize task
-
-    # --- Fetch Task (used for both GET and initial POST validation) ---
     try:
-        task = db.execute(
-            'SELECT * FROM tasks WHERE id = ? AND user_id = ?',
-            (id, user_id)
-        ).fetchone()
+        task = task_pages.fetch_task(get_db(), user_id, id)
     except sqlite3.Error as e:
-        flash(f"Error fetching task for edit: {e}", "danger")
-        app.logger.error(f"Edit Task Fetch DB Error: {e}")
+        task_pages.db_error("Error fetching task for edit", "Edit Task Fetch", e)
         return redirect(url_for('dashboard'))
-
-    # --- Handle Task Not Found or Access Denied ---
     if not task:
-        flash("Task not found or access denied.", "warning")
-        return redirect(url_for('dashboard'))
+        return task_pages.task_not_found()
 
-    # --- Handle Form Submission (POST request) ---
-    if request.method == 'POST':
-        form = request.form
-        # Basic validation - ensure title is present
-        if not form.get('title','').strip():
-            flash("Task title cannot be empty.", "danger")
-            # Re-render form with current task data and error
-            return render_template('task_form.html', task=task, form_action=url_for('edit_task', id=id))
+    if request.method != 'POST':
+        return task_pages.task_form(task, id) # Pre-filled with the stored values
 
-        try:
-            db.execute(
-                '''UPDATE tasks SET
-                      title=?, category=?, due_date=?, frequency=?,
-                      cost=?, estimated_time=?, guide=?
-                   WHERE id=? AND user_id=?''',
-                (
-                    form['title'].strip(), form.get('category'), form.get('due_date'),
-                    form.get('frequency'), form.get('cost'),
-                    form.get('estimated_time'), form.get('guide'),
-                    # video_url - not currently in form
-                    id, user_id
-                )
-            )
-            db.commit()
-            flash("Task updated successfully!", "success")
-        except sqlite3.Error as e:
-            flash(f"Error updating task: {e}", "danger")
-            app.logger.error(f"Edit Task Update DB Error: {e}")
-            # Return to form on error, maintaining existing task data in form
-            return render_template('task_form.html', task=task, form_action=url_for('edit_task', id=id))
-
-        # Redirect to dashboard after successful POST
-        return redirect(url_for('dashboard'))
-
-    # --- Show Edit Task Form (GET request) ---
-    # Render the form pre-filled with existing task data
-    return render_template('task_form.html', task=task, form_action=url_for('edit_task', id=id))
+    values, invalid = task_pages.validate_task_form(task)
+    if invalid:
+        return invalid
+    try:
+        run_write(task_pages.update_task, user_id, id, values)
+    except sqlite3.Error as e:
+        return task_pages.save_failed(e, task, id)
+    return task_pages.task_saved(id)
 
 
 @app.route('/task/<int:id>')
@@ -337,226 +383,493 @@ def edit_task(id):
 def task_detail(id):
     """Displays the details of a single task."""
     db = get_db()
-    task = None
+    user_id = session['user']['id']
+
+    def render_detail():
+        return task_pages.render_task_body(*task_pages.fetch_task_detail(db, user_id, id))
+
     try:
-        task = db.execute(
-            'SELECT * FROM tasks WHERE id = ? AND user_id = ?',
-            (id, session['user']['id'])
-        ).fetchone()
+        stamp = task_stats.get_data_stamp(db, user_id)
+        key, etag, last_modified = task_pages.page_validators('task_detail', user_id, stamp, id)
+        unchanged = fragment_cache.not_modified(etag, last_modified)
+        if unchanged:
+            return unchanged # Browser's copy is current (304)
+        task_body = fragment_cache.cached_fragment('task_detail', key, render_detail)
     except sqlite3.Error as e:
-        flash(f"Error fetching task details: {e}", "danger")
-        app.logger.error(f"Task Detail DB Error: {e}")
+        task_pages.db_error("Error fetching task details", "Task Detail", e)
         return redirect(url_for('dashboard'))
+    return task_pages.render_task_detail(task_body, etag, last_modified)
 
-    if not task:
-        flash("Task not found or access denied.", "warning")
-        return redirect(url_for('dashboard'))
-
-    return render_template('task_detail.html', task=task)
-
-@app.route('/task/complete/<int:id>', methods=['POST'])
-@login_required
-def complete_task(id):
-    """Marks a task as complete."""
-    db = get_db()
+def _apply_action(id, action):
+    """Shared body of the complete/uncomplete/delete buttons."""
     user_id = session['user']['id']
     try:
-        # Ensure the task belongs to the user before updating
-        result = db.execute(
-            'UPDATE tasks SET completed = 1 WHERE id = ? AND user_id = ?',
-            (id, user_id)
-        )
-        db.commit()
-        if result.rowcount == 0: # Check if any row was actually updated
-             flash("Task not found or access denied.", "warning")
-        else:
-             flash("Task marked as complete.", "success")
+        # apply_action only touches the user's own tasks; 0 changed means not found or not theirs
+        changed = run_write(task_ops.apply_action, user_id, action, [id])
     except sqlite3.Error as e:
-        flash(f"Error completing task: {e}", "danger")
-        app.logger.error(f"Complete Task DB Error: {e}")
+        return task_pages.action_failed(action, e)
+    return task_pages.action_done(action, changed)
 
-    # Redirect back to the default dashboard view (Tasks)
-    return redirect(url_for('dashboard'))
+@app.route('/task/complete/<int:id>', methods=['POST'])
+@login_required
+def complete_task(id):
+    """Marks a task as complete (recurring tasks are scheduled to reopen)."""
+    return _apply_action(id, 'complete')
 
 @app.route('/task/uncomplete/<int:id>', methods=['POST'])
 @login_required
 def uncomplete_task(id):
-    """Marks a task as incomplete."""
-    db = get_db()
-    user_id = session['user']['id']
-    try:
-         # Ensure the task belongs to the user before updating
-        result = db.execute(
-            'UPDATE tasks SET completed = 0 WHERE id = ? AND user_id = ?',
-            (id, user_id)
-        )
-        db.commit()
-        if result.rowcount == 0: # Check if any row was actually updated
-             flash("Task not found or access denied.", "warning")
-        else:
-             flash("Task marked as incomplete.", "info")
-    except sqlite3.Error as e:
-        flash(f"Error marking task as incomplete: {e}", "danger")
-        app.logger.error(f"Uncomplete Task DB Error: {e}")
-
-    # Redirect back to the completed view after uncompleting
-    return redirect(url_for('dashboard', view='completed'))
+    """Marks a task as incomplete (then shows the completed view again)."""
+    return _apply_action(id, 'uncomplete')
 
 @app.route('/task/delete/<int:id>', methods=['POST'])
 @login_required
 def delete_task(id):
     """Deletes a task."""
-    db = get_db()
+    return _apply_action(id, 'delete')
+
+
+# --- Search Route ---
+@app.route('/search')
+@login_required
+def search():
+    """Full-text search over the user's task titles, categories and guides."""
+    query = request.args.get('q', '').strip()
+    try:
+        page = int(request.args.get('page', 1))
+    except ValueError:
+        page = 1
+
+    results, has_more = [], False
+    if query:
+        try:
+            results, has_more = search_module.search_tasks(get_db(), session['user']['id'], query, page)
+        except sqlite3.Error as e:
+            flash(f"Error searching tasks: {e}", "danger")
+            app.logger.error(f"Search DB Error: {e}")
+
+    return render_template(
+        'search.html',
+        query=query,
+        results=results,
+        page=page,
+        has_more=has_more
+    )
+
+
+# --- Batch Actions (multi-select on the dashboard) ---
+@app.route('/tasks/batch', methods=['POST'])
+@login_required
+def batch_tasks():
+    """Completes, uncompletes or deletes all selected tasks in one transaction."""
+    action = request.form.get('action')
+    view = request.form.get('view', 'incomplete')
+    if view not in ['incomplete', 'completed']:
+        view = 'incomplete'
+    ids = task_ops.parse_ids(request.form.getlist('ids'))
+
+    if action not in task_ops.BATCH_ACTIONS:
+        flash("Unknown batch action.", "danger")
+        return redirect(url_for('dashboard', view=view))
+    if not ids:
+        flash("Select at least one task first.", "warning")
+        return redirect(url_for('dashboard', view=view))
+
     user_id = session['user']['id']
     try:
-         # Ensure the task belongs to the user before deleting
-        result = db.execute(
-            'DELETE FROM tasks WHERE id = ? AND user_id = ?',
-            (id, user_id)
-        )
-        db.commit()
-        if result.rowcount == 0: # Check if any row was actually deleted
-             flash("Task not found or access denied.", "warning")
+        changed = run_write(task_ops.apply_action, user_id, action, ids)
+        verb = task_ops.BATCH_ACTIONS[action]
+        if changed == 0:
+            flash("No matching tasks were changed.", "warning")
         else:
-             flash("Task deleted.", "info")
+            flash(f"{changed} task(s) {verb}.", "success" if action == 'complete' else "info")
     except sqlite3.Error as e:
-        flash(f"Error deleting task: {e}", "danger")
-        app.logger.error(f"Delete Task DB Error: {e}")
+        flash(f"Error applying batch action: {e}", "danger")
+        app.logger.error(f"Batch Tasks DB Error: {e}")
 
-    # Determine which view to redirect back to
-    # A bit tricky - maybe check referrer? Simpler to just go to default dashboard.
-    # Or maybe check if the task *was* completed before deleting? Requires fetching first.
-    # For now, just redirect to default dashboard view.
-    return redirect(url_for('dashboard'))
+    # Stay on the list the user was looking at
+    return redirect(url_for('dashboard', view=view))
 
 
-# --- Analytics Route ---
-@app.route('/analytics')
+# --- Bulk Import / Export Routes ---
+@app.route('/tasks/import', methods=['GET', 'POST'])
 @login_required
-def analytics():
-    """Displays simple task count analytics."""
+def import_tasks():
+    """Imports many tasks at once from an uploaded CSV or JSON Lines file."""
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash("Please choose a CSV or JSON Lines file to import.", "danger")
+            return render_template('task_import.html')
+
+        try:
+            fmt = task_io.detect_format(upload.filename, request.form.get('format'))
+            # Rows are parsed, validated and inserted in batches straight off the upload stream
+            rows = task_io.iter_upload_rows(upload.stream, fmt)
+            imported, skipped, errors = task_io.import_tasks(run_write, session['user']['id'], rows)
+        except task_io.ImportFormatError as e:
+            flash(str(e), "danger")
+            return render_template('task_import.html')
+        except (UnicodeDecodeError, csv.Error) as e:
+            flash(f"Could not read the file (it must be UTF-8 CSV or JSON Lines): {e}", "danger")
+            return render_template('task_import.html')
+        except sqlite3.Error as e:
+            flash(f"Error importing tasks: {e}. Rows saved before the error were kept.", "danger")
+            app.logger.error(f"Import Tasks DB Error: {e}")
+            return render_template('task_import.html')
+
+        if imported:
+            flash(f"Imported {imported} task(s).", "success")
+        if skipped:
+            flash(f"Skipped {skipped} invalid row(s): " + "; ".join(errors), "warning")
+        if not imported and not skipped:
+            flash("The file did not contain any tasks.", "info")
+        return redirect(url_for('dashboard'))
+
+    # --- Show Import Form (GET request) ---
+    return render_template('task_import.html')
+
+@app.route('/tasks/export/<any(csv, jsonl):fmt>')
+@login_required
+def export_tasks(fmt):
+    """Streams all of the user's tasks as CSV or JSON Lines."""
     db = get_db()
     user_id = session['user']['id']
-    total_tasks = 0
-    completed_tasks = 0
+    if fmt == 'csv':
+        chunks = task_io.iter_export_csv(db, user_id)
+        mimetype = 'text/csv'
+    else:
+        chunks = task_io.iter_export_jsonl(db, user_id)
+        mimetype = 'application/x-ndjson'
+
+    # stream_with_context keeps the request (and its DB connection) alive while the generator runs
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="fixmate-tasks.{fmt}"'}
+    )
 
-    try:
-        # Query to count total tasks for the user
-        total_result = db.execute(
-            'SELECT COUNT(id) FROM tasks WHERE user_id = ?',
-            (user_id,)
-        ).fetchone()
-        if total_result:
-            total_tasks = total_result[0] # COUNT returns one row, first column is the count
 
-        # Query to count completed tasks for the user
-        completed_result = db.execute(
-            'SELECT COUNT(id) FROM tasks WHERE user_id = ? AND completed = 1',
-            (user_id,)
-        ).fetchone()
-        if completed_result:
-            completed_tasks = completed_result[0]
+# --- Calendar ---
+@app.route('/calendar')
+@login_required
+def calendar_view():
+    """Shows the user's tasks on a month grid or a week timeline, including upcoming repeats."""
+    view = request.args.get('view', 'month')
+    if view not in ('month', 'week'):
+        view = 'month' # Fallback for invalid values
+    today = date.today()
+    day = recurrence.parse_iso_date(request.args.get('date')) or today
+
+    if view == 'month':
+        weeks = task_calendar.month_weeks(day)
+        first_of_month = day.replace(day=1)
+        prev_date = recurrence.add_interval(first_of_month, recurrence.MONTH, -1)
+        next_date = recurrence.add_interval(first_of_month, recurrence.MONTH, 1)
+    else:
+        weeks = [task_calendar.week_days(day)]
+        prev_date, next_date = day - timedelta(days=7), day + timedelta(days=7)
+    start, end = weeks[0][0], weeks[-1][-1] # Only this window is read (and projected)
+    page = dict(view=view, day=day, start=start, prev_date=prev_date, next_date=next_date)
 
+    db = get_db()
+    user_id = session['user']['id']
+    try:
+        task_pages.reopen_due_tasks(db, user_id)
+        version, updated_at = task_stats.get_data_stamp(db, user_id)
+        # Projections depend on today's date, so it is part of the key
+        key = fragment_cache.fragment_key('calendar', user_id, version, view, start.isoformat(), today.isoformat())
+        etag, last_modified = fragment_cache.make_etag(key), fragment_cache.last_modified_from(updated_at)
+        unchanged = fragment_cache.not_modified(etag, last_modified)
+        if unchanged:
+            return unchanged
+
+        def render_grid():
+            entries = task_calendar.iter_window(db, user_id, start, end, today)
+            return render_template('calendar_body.html', view=view, weeks=weeks, month=day.month,
+                                   today=today.isoformat(), days=task_calendar.entries_by_day(entries))
+        grid = fragment_cache.cached_fragment('calendar', key, render_grid)
     except sqlite3.Error as e:
-        flash(f"Error fetching analytics data: {e}", "danger")
-        app.logger.error(f"Analytics DB Error: {e}")
-        # Render with default values on error
-        return render_template('analytics.html', total=0, done=0)
-
-    # Pass the counts to the template
-    return render_template(
-        'analytics.html',
-        total=total_tasks,
-        done=completed_tasks
-    )
+        flash(f"Error fetching calendar: {e}", "danger")
+        app.logger.error(f"Calendar DB Error: {e}")
+        return render_template('calendar.html', grid='', **page)
 
+    response = app.make_response(render_template('calendar.html', grid=grid, **page))
+    return fragment_cache.add_validators(response, etag, last_modified)
 
-# --- Database Initialization Function and CLI command ---
-def init_db():
-    """Initializes the database schema."""
-    # Use try-except blocks for robustness during table creation
+@app.route('/calendar.ics')
+@login_required
+def calendar_feed():
+    """Streams the user's tasks, with upcoming repeats of recurring ones, as an iCalendar file."""
     db = get_db()
-    schema_version = 0 # Track schema version if needed later
-
-    # Get absolute path for clarity
-    import os
-    db_path = os.path.abspath(DATABASE)
-    print(f"Initializing database schema in: {db_path}")
+    user_id = session['user']['id']
+    task_pages.reopen_due_tasks(db, user_id)
+    chunks = task_calendar.iter_ical(
+        db, user_id, task_url=lambda task_id: url_for('task_detail', id=task_id, _external=True)
+    )
+    return Response(
+        stream_with_context(chunks),
+        mimetype='text/calendar',
+        headers={'Content-Disposition': 'attachment; filename="fixmate-tasks.ics"'}
+    )
 
+# --- Analytics Route ---
+@app.route('/analytics')
+@login_required
+def analytics():
+    """Displays task analytics: counts by status and category, costs, and due-date alerts."""
     try:
-        print("Checking/Creating 'users' table...")
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL
-            );
-        ''')
-        print(" -> 'users' table checked/created.")
-        schema_version = 1 # Or increment if tracking versions
+        summary, snapshot_at = task_pages.analytics_summary(session['user']['id'])
     except sqlite3.Error as e:
-        print(f" -> Error creating/checking 'users' table: {e}")
-        app.logger.error(f"Init DB Users Error: {e}") # Log error
+        return task_pages.analytics_failed(e)
+    return task_pages.render_analytics(summary, snapshot_at)
+
+
+# --- Health Checks (for load balancers / orchestrators) ---
+@app.route('/healthz')
+def healthz():
+    """Liveness: the worker is up and answering. Touches nothing else."""
+    return {'status': 'ok'}
 
-    try:
-        print("Checking/Creating 'tasks' table...")
-        db.execute('''
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                title TEXT NOT NULL,
-                category TEXT,
-                due_date TEXT,    -- Store dates as ISO 8601 strings (YYYY-MM-DD)
-                frequency TEXT,
-                cost REAL,        -- Use REAL for currency/decimal values
-                estimated_time TEXT, -- e.g., "30 minutes", "2 hours"
-                guide TEXT,       -- Text instructions
-                video_url TEXT,   -- Optional: URL to a video guide (set to NULL if not needed)
-                completed INTEGER DEFAULT 0 CHECK(completed IN (0, 1)), -- 0=False, 1=True
-                created_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, -- Track creation time
-                -- completed_timestamp DATETIME, -- Optional: track completion time
-                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
-            );
-        ''')
-        print(" -> 'tasks' table checked/created.")
-    except sqlite3.Error as e:
-        print(f" -> Error creating/checking 'tasks' table: {e}")
-        app.logger.error(f"Init DB Tasks Error: {e}") # Log error
 
+@app.route('/readyz')
+def readyz():
+    """
+    Readiness: a pooled connection can reach every database file and its schema is current.
+    Reads only PRAGMA user_version, so it is cheap enough to poll every few seconds.
+    """
     try:
-        # Add indexes for performance if they don't exist
-        print("Checking/Creating indexes...")
-        db.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_id ON tasks (user_id);')
-        db.execute('CREATE INDEX IF NOT EXISTS idx_tasks_completed ON tasks (user_id, completed);')
-        print(" -> Indexes checked/created.")
+        versions = []
+        for shard in range(shard_count()):
+            with get_app_pool(shard).connection() as db:
+                versions.append(migrations.get_version(db))
+        version = min(versions)
     except sqlite3.Error as e:
-        print(f" -> Error creating/checking indexes: {e}")
-        app.logger.error(f"Init DB Indexes Error: {e}") # Log error
+        app.logger.error(f"Readiness DB Error: {e}")
+        return {'status': 'unavailable', 'error': 'database unreachable'}, 503
+    if version < migrations.LATEST_VERSION:
+        return {'status': 'unavailable', 'error': 'migrations pending',
+                'schema_version': version, 'latest': migrations.LATEST_VERSION}, 503
+    return {'status': 'ready', 'schema_version': version}
+
 
-    # Add schema version tracking or migration logic here if needed in the future
-    # Example: db.execute('PRAGMA user_version = ?', (schema_version,))
+# --- JSON API (/api/v1, see api.py) ---
+app.register_blueprint(api_blueprint)
 
-    db.commit()
+
+# --- Database Initialization Function and CLI command ---
+def init_db():
+    """Creates or upgrades the database schema (every shard file) by applying pending migrations."""
+    for shard, path in enumerate(shard_paths()):
+        # Get absolute path for clarity
+        db_path = os.path.abspath(path)
+        print(f"Initializing database schema in: {db_path}")
+
+        # All table/index/trigger definitions live in migrations.py, tracked by PRAGMA user_version
+        with get_app_pool(shard).connection() as db:
+            try:
+                applied = migrations.migrate(db)
+            except sqlite3.Error as e:
+                print(f" -> Error applying migrations: {e}")
+                app.logger.error(f"Init DB Migration Error ({path}): {e}") # Log error
+                raise
+
+            if applied:
+                print(f"Applied migration(s) {', '.join(map(str, applied))}.")
+            else:
+                print(f"Schema already up to date (version {migrations.get_version(db)}).")
     print("Database initialization process completed.")
 
 
 @app.cli.command('init-db')
 def init_db_command():
     """
-    CLI command to clear existing data and create new tables.
-    Run using: flask init-db
+    CLI command to create the database or upgrade it to the latest schema version.
+    Existing data is kept. Run using: flask init-db
     """
     import click # For CLI echo
-    click.echo("WARNING: This will delete existing data if tables are recreated!")
-    # Consider adding a --force option or prompt? For now, rely on manual deletion if needed.
-    # It's safer to manually delete the .db file if a schema *change* requires it,
-    # as 'CREATE TABLE IF NOT EXISTS' won't modify existing tables.
-
     with app.app_context():
-        # Connect using get_db to ensure correct path and context handling
-        # init_db() function already handles the connection via get_db()
+        # init_db() borrows a pooled connection to each database file itself
         init_db()
-    click.echo('Initialized the database based on current app.py schema.')
+    click.echo(f'Database is at schema version {migrations.LATEST_VERSION}.')
+
+
+@app.cli.command('roll-recurring')
+def roll_recurring_command():
+    """
+    Reopens every completed recurring task whose next occurrence is due.
+    Run daily from cron/a scheduler: flask roll-recurring
+    """
+    import click # For CLI echo
+    with app.app_context():
+        reopened = 0
+        for shard in range(shard_count()):
+            with get_app_pool(shard).connection() as db:
+                reopened += task_ops.roll_due_recurring(db)
+    click.echo(f'Reopened {reopened} recurring task(s).')
+
+
+@app.cli.command('compact-sessions')
+def compact_sessions_command():
+    """
+    Deletes expired server-side sessions. The app also does this on its own every
+    SESSION_COMPACT_INTERVAL seconds; run it from cron if traffic is very light.
+    """
+    with app.app_context():
+        removed = sessions.compact_sessions(app)
+    click.echo(f'Removed {removed} expired session(s).')
+
+
+@app.cli.command('build-assets')
+@click.option('--vendor', is_flag=True, help="Download Bootstrap into static/vendor/ to serve it locally instead of from the CDN.")
+def build_assets_command(vendor):
+    """Precompiles templates and builds fingerprinted, compressed copies of static files."""
+    if vendor:
+        assets.vendor(app.static_folder, log=click.echo)
+    build_dir = app.config.get('ASSET_BUILD_DIR') or os.path.join(app.instance_path, 'assets')
+    manifest = assets.build(app.static_folder, build_dir)
+    click.echo(f'Built {len(manifest)} static file(s) into {build_dir}.')
+    click.echo(f'Compiled {assets.precompile_templates(app)} template(s).')
+
+
+@app.cli.command('shards')
+def shards_command():
+    """Lists the database files with their users, tasks and size, and the totals across them."""
+    with app.app_context():
+        summary = shards.fleet_summary()
+    for info in summary['shards']:
+        click.echo(f"Shard {info['shard']}: {info['users']} user(s), {info['tasks']} task(s) "
+                   f"({info['done']} done), ${info['cost']:.2f}, {info['size_bytes'] / 1e6:.1f} MB - {info['path']}")
+    total = summary['total']
+    click.echo(f"Total: {total['users']} user(s), {total['tasks']} task(s) ({total['done']} done), ${total['cost']:.2f}")
+    for category in summary['categories'][:10]:
+        click.echo(f"  {category['name']}: {category['tasks']} task(s), ${category['cost']:.2f}")
+
+
+@app.cli.command('move-user')
+@click.argument('user_id', type=int)
+@click.argument('shard', type=int)
+def move_user_command(user_id, shard):
+    """Moves one user's tasks to another shard while the app keeps running (task ids change)."""
+    with app.app_context():
+        try:
+            shards.move_user(user_id, shard, log=click.echo)
+        except (ValueError, shards.ShardMoveConflict) as e:
+            raise click.ClickException(str(e))
+
+
+@app.cli.command('rebalance-shards')
+@click.option('--limit', type=int, default=None, help="Move at most this many users.")
+@click.option('--dry-run', is_flag=True, help="Only list the moves.")
+def rebalance_shards_command(limit, dry_run):
+    """Moves users to the shard their id hashes to (run after changing DB_SHARDS and `flask init-db`)."""
+    with app.app_context():
+        moved = shards.rebalance(limit=limit, dry_run=dry_run, log=click.echo)
+    click.echo(f"{'Would move' if dry_run else 'Moved'} {moved} user(s).")
+
+
+@app.cli.command('refresh-replica')
+@click.option('--every', type=float, default=None,
+              help="Keep refreshing, waiting this many seconds between refreshes (default: refresh once and exit).")
+def refresh_replica_command(every):
+    """Snapshots each database file into its read-only analytics replica (see replica.py)."""
+    with app.app_context():
+        if every is None:
+            try:
+                replica.refresh_all(log=click.echo)
+            except (sqlite3.Error, OSError) as e:
+                raise click.ClickException(f"Refresh failed: {e}")
+            return
+        try:
+            while True:
+                try:
+                    replica.refresh_all(log=click.echo)
+                except (sqlite3.Error, OSError) as e:
+                    click.echo(f"Refresh failed: {e}") # Tried again next round
+                time.sleep(every)
+        except KeyboardInterrupt:
+            pass
+
+
+def analytics_export_dir():
+    return app.config['ANALYTICS_EXPORT_DIR'] or os.path.join(app.instance_path, 'analytics')
+
+
+@app.cli.command('export-analytics')
+@click.option('--full', is_flag=True, help="Rewrite every file instead of only those holding changed tasks.")
+def export_analytics_command(full):
+    """Brings the Parquet files for fleet-wide reports up to date (see analytics_export.py)."""
+    export_dir = analytics_export_dir()
+    with app.app_context():
+        for shard in range(shard_count()):
+            with get_app_pool(shard).connection() as db:
+                try:
+                    mode, files, tasks = analytics_export.export_shard(
+                        db, export_dir, shard=shard, chunk_ids=app.config['ANALYTICS_EXPORT_CHUNK_IDS'], full=full)
+                except (RuntimeError, sqlite3.Error, OSError) as e:
+                    raise click.ClickException(f"Export of shard {shard} failed: {e}")
+            click.echo(f"Shard {shard}: {mode} export, {tasks} task(s) read, {files} file(s) written.")
+    click.echo(f"Exported to {export_dir}.")
+
+
+@app.cli.command('fleet-trends')
+@click.option('--months', type=int, default=12, help="Months of costs to list (default: 12, newest first).")
+def fleet_trends_command(months):
+    """Cost by category per month and completion rates across all users, from the export."""
+    export_dir = analytics_export_dir()
+    try:
+        tasks = analytics_export.load_tasks(export_dir, ['id', 'category', 'due_date', 'completed', 'cost_cents'])
+    except (RuntimeError, OSError) as e: # pyarrow missing, or nothing exported yet
+        raise click.ClickException(f"{e} (run `flask export-analytics` first)")
+    click.echo(f"{tasks.num_rows} task(s) in {export_dir}")
+    click.echo("Cost by category per due month:")
+    shown = []
+    for row in analytics_export.monthly_costs(tasks):
+        if row['month'] not in shown:
+            if len(shown) == months:
+                break
+            shown.append(row['month'])
+        click.echo(f"  {row['month']}  {row['category']}: {row['tasks']} task(s), ${row['cost']:,.2f}")
+    click.echo("Completion rate by category:")
+    for row in analytics_export.completion_rates(tasks):
+        click.echo(f"  {row['category']}: {row['done']}/{row['tasks']} done ({row['rate']:.0%})")
+
+
+@app.cli.command('send-reminders')
+@click.option('--once', is_flag=True, help="Send what is due now and exit (for cron) instead of running continuously.")
+@click.option('--sink', type=click.Choice(['outbox', 'file']), default=None,
+              help="Where reminders go (default: REMINDER_SINK setting).")
+@click.option('--file', 'file_path', default=None, help="File for --sink file (default: REMINDER_FILE setting).")
+def send_reminders_command(once, sink, file_path):
+    """Sends due-date reminders (see reminders.py)."""
+    config = app.config
+    sink = sink or config['REMINDER_SINK']
+    if sink == 'file':
+        reminder_sink = reminders.FileSink(file_path or config['REMINDER_FILE'])
+    else:
+        reminder_sink = reminders.OutboxSink()
+    with app.app_context(), contextlib.ExitStack() as stack:
+        # One scheduler per database file; each only sees the tasks stored in it
+        schedulers = [
+            reminders.ReminderScheduler(
+                stack.enter_context(get_app_pool(shard).connection()), reminder_sink,
+                remind_hour=config['REMINDER_HOUR'],
+                lead_days=config['REMINDER_LEAD_DAYS'],
+                horizon_days=config['REMINDER_HORIZON_DAYS'],
+                log=click.echo,
+            )
+            for shard in range(shard_count())
+        ]
+        if once:
+            click.echo(f'Sent {sum(scheduler.run_once() for scheduler in schedulers)} reminder(s).')
+            return
+        threads = [scheduler.start() for scheduler in schedulers]
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            for scheduler in schedulers:
+                scheduler.stop()
 
 
 # --- Run the App ---
@@ -565,7 +878,6 @@ if __name__ == '__main__':
     import logging
     logging.basicConfig(level=logging.INFO) # Log INFO level and above
 
-    # Set debug=True for development (auto-reload, interactive debugger)
-    # Set debug=False for production deployment
-    # Consider using environment variable: debug=os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
+    # Development server only (auto-reload, interactive debugger).
+    # For production use `python serve.py` (multi-process WSGI server, see serve.py).
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,287 @@
+"""
+ASGI entry point for FixMate (asyncio request path).
+
+    python asgi.py                                         # uvicorn, FIXMATE_WORKERS processes
+    python asgi.py --workers 4 --bind 0.0.0.0:8000
+    uvicorn --factory asgi:create_application --port 8000  # same app under your own uvicorn settings
+
+The dashboard, task add/edit/detail/complete/uncomplete/delete and analytics pages are
+served by the coroutines in async_views.py, whose SQLite calls run on a small bounded
+thread pool (ASYNC_DB_WORKERS, see async_db.py). Open client connections (including
+idle keep-alive ones) cost the event loop a coroutine each rather than a thread, so one
+process can hold thousands of them. Every other URL (login, register, the API, search,
+import/export, calendar, static files) goes to the normal Flask views on a separate
+pool of ASYNC_SYNC_THREADS threads.
+
+Needs an ASGI server: pip install -r requirements-server.txt (uvicorn). Settings come
+from the environment exactly as for serve.py (FIXMATE_SECRET_KEY is required).
+"""
+import argparse
+import asyncio
+import contextvars
+import logging
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from werkzeug.exceptions import HTTPException
+
+import async_db
+import serve
+import write_queue
+from db import close_all_pools
+
+DEFAULT_BIND = '127.0.0.1:8000'
+DEFAULT_SYNC_THREADS = 4           # Threads serving the Flask (sync) routes per process
+BODY_MEMORY_LIMIT = 1024 * 1024    # Request bodies larger than this are spooled to a temp file
+STREAM_QUEUE_CHUNKS = 16           # Response chunks a Flask view may run ahead of the client
+STREAM_POLL_SECONDS = 1.0          # How often a view waiting on a slow client checks it is still there
+
+
+# --- ASGI <-> WSGI Plumbing ---
+async def read_body(receive):
+    """Reads the whole request body into a (spooled) file. Returns (file, length)."""
+    body = tempfile.SpooledTemporaryFile(max_size=BODY_MEMORY_LIMIT)
+    length = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        body.write(chunk)
+        length += len(chunk)
+        more_body = message.get('more_body', False)
+    body.seek(0)
+    return body, length
+
+def build_environ(scope, body, length):
+    """The WSGI environ Flask expects, built from an ASGI HTTP scope (PEP 3333 encodings)."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(length),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+            continue
+        if name == 'CONTENT_LENGTH':
+            continue # The real length of what was read is set above
+        key = f'HTTP_{name}'
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+async def send_start(send, status, headers):
+    await send({
+        'type': 'http.response.start',
+        'status': int(status.split(' ', 1)[0]),
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+    })
+
+
+# --- Application ---
+class FixMateASGI:
+    """Routes each request to an async view (async_views.ROUTES) or to the Flask app on a thread."""
+
+    def __init__(self, app, sync_threads=DEFAULT_SYNC_THREADS):
+        import async_views # Imports app.py's views; load the app first
+        self.app = app
+        self.routes, self.views = async_views.ROUTES, async_views.VIEWS
+        if 'async_db' not in app.extensions:
+            async_db.init_app(app)
+        self.adb = app.extensions['async_db']
+        self.sync_executor = ThreadPoolExecutor(sync_threads, thread_name_prefix='fixmate-sync')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return # No websockets
+
+        body, length = await read_body(receive)
+        environ = build_environ(scope, body, length)
+        try:
+            try:
+                endpoint, kwargs = self.routes.bind_to_environ(environ).match()
+            except HTTPException:
+                await self._call_flask(environ, send) # Flask answers everything else, 404s included
+                return
+            await self._call_async(self.views[endpoint], kwargs, environ, send)
+        finally:
+            body.close()
+
+    async def _call_async(self, view, kwargs, environ, send):
+        """
+        Runs one async view the way Flask runs a normal one: before_request hooks, the view,
+        after_request hooks and the session save (those touch the database, so they run on
+        the async DB threads), then teardown.
+        """
+        app = self.app
+        ctx = app.request_context(environ)
+        ctx.push()
+        error = None
+        try:
+            try:
+                rv = await self.adb.call(app.preprocess_request)
+                if rv is None:
+                    rv = await view(**kwargs)
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            response = await self.adb.call(app.finalize_request, rv)
+        except Exception as e:
+            error = e
+            response = app.handle_exception(e)
+        try:
+            app_iter, status, headers = response.get_wsgi_response(environ)
+            await send_start(send, status, headers)
+            for chunk in app_iter: # Async views return complete bodies
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+            if hasattr(app_iter, 'close'):
+                app_iter.close() # Runs call_on_close callbacks (request metrics)
+        finally:
+            ctx.pop(error)
+
+    async def _call_flask(self, environ, send):
+        """
+        Calls the WSGI app on the sync pool. The call, the iteration of its body and close()
+        run as one job in one copied context: Flask keeps its app and request contexts in
+        context variables, and stream_with_context bodies (CSV export, calendar feed) pop
+        them at the end. The chunks reach the event loop through a small queue, so a slow
+        client holds the job back instead of filling memory.
+        """
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue(STREAM_QUEUE_CHUNKS)
+        abandoned = threading.Event() # Set when the client went away mid-stream
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+            return lambda data: None # The legacy write() callable isn't used by Flask
+
+        def put(item):
+            """Hands one chunk to the event loop, waiting while the queue is full. False once abandoned."""
+            if abandoned.is_set():
+                return False
+            future = asyncio.run_coroutine_threadsafe(chunks.put(item), loop)
+            while not abandoned.is_set():
+                try:
+                    future.result(timeout=STREAM_POLL_SECONDS)
+                    return True
+                except FutureTimeout:
+                    continue
+            future.cancel()
+            return False
+
+        def run():
+            try:
+                app_iter = self.app(environ, start_response)
+                try:
+                    for chunk in app_iter:
+                        if chunk and not put(chunk):
+                            break
+                finally:
+                    if hasattr(app_iter, 'close'):
+                        app_iter.close() # Pops Flask's contexts, runs call_on_close callbacks
+            finally:
+                put(None)
+
+        job = loop.run_in_executor(self.sync_executor, contextvars.copy_context().run, run)
+        try:
+            chunk = await chunks.get()
+            if chunk is None:
+                await job # Raises if the app failed before producing a body
+            await send_start(send, *started) # A WSGI app may call start_response as late as its first chunk
+            while chunk is not None:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await chunks.get()
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            abandoned.set() # Once the body is sent this changes nothing; otherwise the job stops at its next chunk
+        await job
+
+    async def _lifespan(self, receive, send):
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await loop.run_in_executor(self.sync_executor, serve.warm_up, self.app)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await loop.run_in_executor(None, self.close)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def close(self):
+        """Finishes queued work and closes every thread pool and database connection."""
+        self.sync_executor.shutdown(wait=True)
+        self.adb.close()
+        write_queue.close_queues(self.app)
+        close_all_pools()
+
+
+def create_application():
+    """Returns the ASGI app for one server process (uvicorn --factory asgi:create_application)."""
+    app = serve.load_app()
+    return FixMateASGI(app, app.config.get('ASYNC_SYNC_THREADS', DEFAULT_SYNC_THREADS))
+
+
+# --- Server ---
+def main(argv=None):
+    env = os.environ
+    parser = argparse.ArgumentParser(description="Run FixMate under an ASGI server (uvicorn).")
+    parser.add_argument('--bind', default=env.get('FIXMATE_BIND', DEFAULT_BIND),
+                        help=f"address:port to listen on (default: {DEFAULT_BIND})")
+    parser.add_argument('--workers', type=int, default=int(env.get('FIXMATE_WORKERS', serve.default_workers())),
+                        help="worker processes (default: CPU count, at most 8)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    # Check the settings up front so a bad config fails here, not in every worker
+    try:
+        config = serve.load_app().config
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return 1
+    threads = config['ASYNC_DB_WORKERS'] + config['ASYNC_SYNC_THREADS']
+    if threads > config['DB_POOL_SIZE']:
+        print(f"Warning: {threads} database threads per worker (ASYNC_DB_WORKERS + ASYNC_SYNC_THREADS) "
+              f"but DB_POOL_SIZE is {config['DB_POOL_SIZE']}; requests will wait for connections.")
+    if args.workers > 1 and config['SESSION_BACKEND'] == 'memory':
+        print("Warning: SESSION_BACKEND 'memory' is per process; use 'sqlite' with several workers.")
+
+    try:
+        import uvicorn
+    except ImportError:
+        print("Install an ASGI server first: pip install uvicorn (or use serve.py for the threaded server).")
+        return 1
+    host, _, port = args.bind.rpartition(':')
+    uvicorn.run('asgi:create_application', factory=True, host=host or '127.0.0.1', port=int(port),
+                workers=args.workers, timeout_graceful_shutdown=serve.GRACEFUL_TIMEOUT)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+# --- Imports ---
+import base64
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import urllib.request
+
+from flask import current_app, request, send_from_directory, url_for
+from jinja2 import FileSystemBytecodeCache
+
+try:
+    import brotli # Optional: pip install brotli for .br copies (gzip is always built)
+except ImportError:
+    brotli = None
+
+# --- Default Asset Settings (override via app.config) ---
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600 # Fingerprinted URLs never change content, so cache for a year
+COMPRESSIBLE_TYPES = ('.css', '.js', '.svg', '.json', '.txt', '.map')
+MIN_COMPRESS_SIZE = 512             # Smaller files aren't worth a compressed copy
+FINGERPRINT_LENGTH = 12             # Hex digits of the content hash kept in the file name
+
+# Third-party files base.html needs: served from static/vendor/ once `flask build-assets --vendor`
+# has downloaded them, else straight from the CDN. Downloads are checked against the SRI hash.
+VENDOR_ASSETS = {
+    'bootstrap.min.css': (
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+        'sha384-9ndCyUaIbzAi2FUVXJi0CjmCapSmO7SnpJef0486qhLnuZ2cdeRhO02iuK6FUUVM',
+    ),
+    'bootstrap.bundle.min.js': (
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+        'sha384-geWF76RCwLtnZ8qwWowPQNguL3RmwHVBC9FhGdlKrxdiJJigb/j/68SIy3Te4Bkz',
+    ),
+}
+VENDOR_DIR = 'vendor' # Under static/
+
+
+# --- Building (fingerprinted + precompressed copies) ---
+def hashed_name(filename, digest):
+    """'css/site.css' -> 'css/site.<digest>.css'"""
+    root, ext = os.path.splitext(filename)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+def _write_atomic(path, data):
+    # Several workers may build at once; each writes its own temp file and renames it into place
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def build(static_folder, build_dir):
+    """
+    Copies every file under `static_folder` into `build_dir` under a content-hashed
+    name, plus .gz (and .br with brotli installed) copies of text assets. Copies are
+    named by content, so unchanged files are not rewritten. Returns {filename: hashed}.
+    """
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for name in files:
+            if name.startswith('.'):
+                continue
+            source = os.path.join(root, name)
+            filename = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+            target_name = hashed_name(filename, hashlib.sha256(data).hexdigest())
+            manifest[filename] = target_name
+
+            target = os.path.join(build_dir, target_name)
+            if os.path.exists(target):
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            _write_atomic(target, data)
+            if not name.endswith(COMPRESSIBLE_TYPES) or len(data) < MIN_COMPRESS_SIZE:
+                continue
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                _write_atomic(target + '.gz', compressed)
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=11)
+                if len(compressed) < len(data):
+                    _write_atomic(target + '.br', compressed)
+
+    os.makedirs(build_dir, exist_ok=True)
+    _write_atomic(os.path.join(build_dir, 'manifest.json'),
+                  json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return manifest
+
+def vendor(static_folder, log=print):
+    """Downloads VENDOR_ASSETS into static/vendor/, refusing any file whose hash doesn't match."""
+    folder = os.path.join(static_folder, VENDOR_DIR)
+    os.makedirs(folder, exist_ok=True)
+    for name, (url, integrity) in VENDOR_ASSETS.items():
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        algorithm, _, expected = integrity.partition('-')
+        actual = base64.b64encode(hashlib.new(algorithm, data).digest()).decode('ascii')
+        if actual != expected:
+            raise ValueError(f"{url} does not match its pinned hash; not vendored.")
+        _write_atomic(os.path.join(folder, name), data)
+        log(f"Vendored {name} ({len(data)} bytes).")
+
+def precompile_templates(app):
+    """Compiles every template (filling the bytecode cache, if enabled). Returns the count."""
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+# --- Serving ---
+def vendor_url(name):
+    """URL for a third-party asset: the vendored copy if present, else the CDN."""
+    if name in current_app.extensions['vendored_assets']:
+        return url_for('static', filename=f'{VENDOR_DIR}/{name}')
+    return VENDOR_ASSETS[name][0]
+
+def asset_digest(manifest, vendored):
+    """Short hash of every static URL the templates can produce (hashed names, vendored or CDN files)."""
+    raw = json.dumps([manifest, sorted(vendored)], sort_keys=True).encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()[:FINGERPRINT_LENGTH]
+
+def _fingerprint_url(endpoint, values):
+    """url_defaults hook: url_for('static', filename='x.css') -> /static/x.<hash>.css"""
+    if endpoint != 'static' or 'filename' not in values:
+        return
+    state = current_app.extensions.get('assets')
+    if state:
+        values['filename'] = state['manifest'].get(values['filename'], values['filename'])
+
+def _serve_static(filename):
+    """
+    Fingerprinted names are served from the build directory as immutable for a year,
+    as the precompressed copy when the browser accepts it. Anything else falls back
+    to Flask's normal static handling (revalidated on each use).
+    """
+    state = current_app.extensions['assets']
+    if filename not in state['built']:
+        return current_app.send_static_file(filename)
+
+    build_dir = state['build_dir']
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    served, encoding = filename, None
+    for candidate in ('br', 'gzip'):
+        suffix = '.br' if candidate == 'br' else '.gz'
+        if request.accept_encodings[candidate] > 0 and os.path.exists(os.path.join(build_dir, filename + suffix)):
+            served, encoding = filename + suffix, candidate
+            break
+
+    response = send_from_directory(build_dir, served, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+# --- Flask Integration ---
+def init_app(app):
+    """
+    Sets up the Jinja bytecode cache and static asset fingerprinting.
+    Config:
+      TEMPLATE_BYTECODE_CACHE  directory for compiled templates (True: instance/jinja_cache, False: off)
+      ASSET_FINGERPRINTING     serve static files under content-hashed, immutable URLs
+                               (off in debug mode so edits show up without a restart)
+      ASSET_BUILD_DIR          where hashed and precompressed copies go (default instance/assets)
+    """
+    cache_dir = app.config.get('TEMPLATE_BYTECODE_CACHE', True)
+    if cache_dir is True:
+        cache_dir = os.path.join(app.instance_path, 'jinja_cache')
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+    # Checked once at startup; run `flask build-assets --vendor` and restart to switch off the CDN
+    vendor_folder = os.path.join(app.static_folder or '', VENDOR_DIR)
+    app.extensions['vendored_assets'] = {name for name in VENDOR_ASSETS
+                                         if os.path.exists(os.path.join(vendor_folder, name))}
+    app.jinja_env.globals['vendor_url'] = vendor_url
+    # Part of the fragment cache namespace: cached pages and ETags must not outlive the URLs they link to
+    app.extensions['asset_digest'] = asset_digest({}, app.extensions['vendored_assets'])
+    if not app.config.get('ASSET_FINGERPRINTING', True) or app.debug or not app.has_static_folder:
+        return
+    build_dir = app.config.get('ASSET_BUILD_DIR') or os.path.join(app.instance_path, 'assets')
+    manifest = build(app.static_folder, build_dir)
+    app.extensions['asset_digest'] = asset_digest(manifest, app.extensions['vendored_assets'])
+    app.extensions['assets'] = {
+        'manifest': manifest,
+        'built': set(manifest.values()),
+        'build_dir': build_dir,
+    }
+    app.url_defaults(_fingerprint_url)
+    app.view_functions['static'] = _serve_static
@@ -0,0 +1,112 @@
+# --- Imports ---
+import asyncio
+import contextvars
+import functools
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+
+import write_queue
+from db import close_db, get_app_pool, is_user_moved, shard_count, user_shard
+
+# --- Default Async Settings (override via app.config) ---
+DEFAULT_WORKERS = 4 # Threads running SQLite calls for the async views (per process)
+
+
+# --- Async SQLite Access ---
+class AsyncDatabase:
+    """
+    Awaitable access to the app's SQLite files for the async views (see async_views.py).
+    sqlite3 itself only blocks, so every call runs on a small, fixed pool of threads
+    and the event loop awaits the result: thousands of open (mostly idle) client
+    connections cost a coroutine each, and at most `workers` threads ever touch the
+    database. A pooled connection is borrowed for one call and handed straight back,
+    so none is held while a request waits on the network.
+
+    Calls run with a copy of the caller's context, so current_app, request, session
+    and g work inside them as they do in a normal view.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='fixmate-async-db')
+
+    async def call(self, function, *args, **kwargs):
+        """
+        Runs any blocking function(*args, **kwargs) on the pool (e.g. code that reads the
+        session). Connections it borrows through get_db() are handed back when it returns.
+        """
+        def run():
+            try:
+                return function(*args, **kwargs)
+            finally:
+                if has_app_context():
+                    close_db()
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(context.run, run))
+
+    async def read(self, function, *args, shard=0, **kwargs):
+        """Returns function(db, *args, **kwargs) run on a pooled connection to `shard`."""
+        def run():
+            with get_app_pool(shard).connection() as db:
+                return function(db, *args, **kwargs)
+        return await self.call(run)
+
+    async def write(self, function, *args, shard=0):
+        """
+        Runs function(db, *args) (which must not commit) and commits it: through the
+        write queue when WRITE_QUEUE is on, else on a pooled connection. Returns its result.
+        """
+        config = current_app.config
+        if config.get('WRITE_QUEUE', False):
+            timeout = config.get('WRITE_QUEUE_TIMEOUT', write_queue.DEFAULT_TIMEOUT)
+            return await write_queue.get_queue(shard).submit_async(function, *args, timeout=timeout)
+
+        def run():
+            with get_app_pool(shard).connection() as db:
+                try:
+                    result = function(db, *args)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
+                return result
+        return await self.call(run)
+
+    async def write_for(self, user_id, function, *args):
+        """
+        write() on the shard holding `user_id`'s tasks. If the user moved to another
+        shard after this request looked theirs up, the write is refused there (see
+        migration 13) and runs again on the new one, like run_write() does.
+        """
+        try:
+            return await self.write(function, *args, shard=await self.user_shard(user_id))
+        except sqlite3.IntegrityError as e:
+            if not is_user_moved(e):
+                raise
+            return await self.write(function, *args, shard=await self.user_shard(user_id, refresh=True))
+
+    async def user_shard(self, user_id, refresh=False):
+        """The shard holding `user_id`'s tasks (no thread hop when there is only one)."""
+        if shard_count() == 1:
+            return 0
+        return await self.call(user_shard, user_id, refresh)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+# --- Flask Integration ---
+def get_async_db():
+    return current_app.extensions['async_db']
+
+def init_app(app):
+    """
+    Creates the async database layer for `app`.
+    Config:
+      ASYNC_DB_WORKERS  threads running SQLite calls for the async views (default 4);
+                        keep DB_POOL_SIZE at least this plus the threads serving sync routes
+    """
+    app.extensions['async_db'] = AsyncDatabase(app.config.get('ASYNC_DB_WORKERS', DEFAULT_WORKERS))
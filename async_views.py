@@ -0,0 +1,184 @@
+# --- Imports ---
+import sqlite3
+from functools import wraps
+
+from flask import redirect, request, session, url_for
+from werkzeug.routing import Map, Rule
+
+import fragment_cache
+import task_ops
+import task_pages
+import task_stats
+from app import check_login
+from async_db import get_async_db
+from pagination import fetch_task_page
+
+# --- Async Views (served by asgi.py) ---
+# Coroutine versions of the busiest pages: the dashboard, task add/edit/detail/complete/
+# uncomplete/delete and analytics. They use the same helpers as the views in app.py
+# (task_pages.py: same endpoint names, templates, flashes and caching, so url_for() and
+# the templates don't know the difference) but do every database call through
+# AsyncDatabase, so a request waiting on SQLite or on the client holds no thread. Every
+# other URL is served by the normal Flask views (see asgi.py).
+
+def async_login_required(f):
+    """login_required for coroutines (the session and user lookups run off the event loop)."""
+    @wraps(f)
+    async def wrapped(**kwargs):
+        return await get_async_db().call(check_login) or await f(**kwargs)
+    return wrapped
+
+
+# --- Dashboard ---
+@async_login_required
+async def dashboard():
+    """Displays one page of the user's task dashboard for the requested view."""
+    current_view, cursor, position = task_pages.dashboard_args()
+    adb = get_async_db()
+    user_id = session['user']['id']
+    try:
+        shard = await adb.user_shard(user_id)
+        # Read the version before the tasks: a write committing in between only makes this copy newer
+        stamp, due = await adb.read(task_pages.dashboard_stamp, user_id, shard=shard)
+        if due: # Bring back recurring tasks whose next occurrence has arrived
+            await adb.write_for(user_id, task_ops.reopen_due_recurring, user_id)
+            stamp = await adb.read(task_stats.get_data_stamp, user_id, shard=shard)
+        key, etag, last_modified = task_pages.page_validators('dashboard', user_id, stamp, current_view, position)
+        unchanged = fragment_cache.not_modified(etag, last_modified)
+        if unchanged:
+            return unchanged # Browser's copy is current (304)
+
+        async def render_list():
+            tasks, next_cursor = await adb.read(fetch_task_page, user_id, current_view, cursor, shard=shard)
+            return task_pages.render_task_list(tasks, next_cursor, cursor, current_view)
+        task_list = await fragment_cache.cached_fragment_async('dashboard', key, render_list)
+    except sqlite3.Error as e:
+        return task_pages.dashboard_failed(e, current_view)
+    return task_pages.with_validators(task_pages.render_dashboard(task_list, current_view), etag, last_modified)
+
+
+# --- Tasks ---
+@async_login_required
+async def add_task():
+    """Handles adding a new task."""
+    if request.method != 'POST':
+        return task_pages.task_form()
+
+    user_id = session['user']['id']
+    values, invalid = task_pages.validate_task_form()
+    if invalid:
+        return invalid
+    adb = get_async_db()
+    try:
+        await adb.write_for(user_id, task_pages.add_task, user_id, values)
+    except sqlite3.Error as e:
+        return task_pages.save_failed(e, request.form)
+    return task_pages.task_saved()
+
+@async_login_required
+async def edit_task(id):
+    """Handles editing an existing task."""
+    adb = get_async_db()
+    user_id = session['user']['id']
+    try:
+        shard = await adb.user_shard(user_id)
+        task = await adb.read(task_pages.fetch_task, user_id, id, shard=shard)
+    except sqlite3.Error as e:
+        task_pages.db_error("Error fetching task for edit", "Edit Task Fetch", e)
+        return redirect(url_for('dashboard'))
+    if not task:
+        return task_pages.task_not_found()
+
+    if request.method != 'POST':
+        return task_pages.task_form(task, id)
+
+    values, invalid = task_pages.validate_task_form(task)
+    if invalid:
+        return invalid
+    try:
+        await adb.write_for(user_id, task_pages.update_task, user_id, id, values)
+    except sqlite3.Error as e:
+        return task_pages.save_failed(e, task, id)
+    return task_pages.task_saved(id)
+
+@async_login_required
+async def task_detail(id):
+    """Displays the details of a single task."""
+    adb = get_async_db()
+    user_id = session['user']['id']
+
+    async def render_detail():
+        return task_pages.render_task_body(*await adb.read(task_pages.fetch_task_detail, user_id, id, shard=shard))
+
+    try:
+        shard = await adb.user_shard(user_id)
+        stamp = await adb.read(task_stats.get_data_stamp, user_id, shard=shard)
+        key, etag, last_modified = task_pages.page_validators('task_detail', user_id, stamp, id)
+        unchanged = fragment_cache.not_modified(etag, last_modified)
+        if unchanged:
+            return unchanged # Browser's copy is current (304)
+        task_body = await fragment_cache.cached_fragment_async('task_detail', key, render_detail)
+    except sqlite3.Error as e:
+        task_pages.db_error("Error fetching task details", "Task Detail", e)
+        return redirect(url_for('dashboard'))
+    return task_pages.render_task_detail(task_body, etag, last_modified)
+
+async def _apply_action(id, action):
+    """Shared body of the complete/uncomplete/delete buttons."""
+    adb = get_async_db()
+    user_id = session['user']['id']
+    try:
+        changed = await adb.write_for(user_id, task_ops.apply_action, user_id, action, [id])
+    except sqlite3.Error as e:
+        return task_pages.action_failed(action, e)
+    return task_pages.action_done(action, changed)
+
+@async_login_required
+async def complete_task(id):
+    """Marks a task as complete (recurring tasks are scheduled to reopen)."""
+    return await _apply_action(id, 'complete')
+
+@async_login_required
+async def uncomplete_task(id):
+    """Marks a task as incomplete (then shows the completed view again)."""
+    return await _apply_action(id, 'uncomplete')
+
+@async_login_required
+async def delete_task(id):
+    """Deletes a task."""
+    return await _apply_action(id, 'delete')
+
+
+# --- Analytics ---
+@async_login_required
+async def analytics():
+    """Displays task analytics: counts by status and category, costs, and due-date alerts."""
+    try:
+        summary, snapshot_at = await get_async_db().call(task_pages.analytics_summary, session['user']['id'])
+    except sqlite3.Error as e:
+        return task_pages.analytics_failed(e)
+    return task_pages.render_analytics(summary, snapshot_at)
+
+
+# --- URL Map ---
+# Same paths and endpoint names as app.py; anything not matched here goes to Flask
+ROUTES = Map([
+    Rule('/dashboard', endpoint='dashboard', methods=['GET']),
+    Rule('/task/add', endpoint='add_task', methods=['GET', 'POST']),
+    Rule('/task/edit/<int:id>', endpoint='edit_task', methods=['GET', 'POST']),
+    Rule('/task/<int:id>', endpoint='task_detail', methods=['GET']),
+    Rule('/task/complete/<int:id>', endpoint='complete_task', methods=['POST']),
+    Rule('/task/uncomplete/<int:id>', endpoint='uncomplete_task', methods=['POST']),
+    Rule('/task/delete/<int:id>', endpoint='delete_task', methods=['POST']),
+    Rule('/analytics', endpoint='analytics', methods=['GET']),
+])
+VIEWS = {
+    'dashboard': dashboard,
+    'add_task': add_task,
+    'edit_task': edit_task,
+    'task_detail': task_detail,
+    'complete_task': complete_task,
+    'uncomplete_task': uncomplete_task,
+    'delete_task': delete_task,
+    'analytics': analytics,
+}
@@ -0,0 +1,207 @@
+# --- Imports ---
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from fragment_cache import MemoryCache
+
+# --- Default Login Settings (override via app.config) ---
+DEFAULT_HASH_METHOD = 'scrypt:32768:8:1' # Werkzeug's default; 'pbkdf2:sha256:600000' is cheaper on memory
+DEFAULT_HASH_WORKERS = 4          # Password hashes computed at the same time, per process
+DEFAULT_MAX_PENDING = 32          # Logins waiting for a hash worker before new ones are turned away
+DEFAULT_VERIFY_TIMEOUT = 10.0     # Seconds a login waits for its hash
+DEFAULT_USER_RATE = (5, 12.0)     # Per username: burst of 5, then one attempt every 12 s
+DEFAULT_IP_RATE = (20, 3.0)       # Per client IP: burst of 20, then one attempt every 3 s
+DEFAULT_USER_CACHE_TTL = 60       # Seconds a session's user row is trusted without re-reading it
+MAX_TRACKED_KEYS = 10000          # Rate-limit buckets kept in memory (least recently used dropped)
+
+
+class LoginRateLimited(Exception):
+    """Too many attempts for this username or address; retry_after is in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Too many login attempts. Try again in {int(retry_after) + 1} seconds.")
+        self.retry_after = retry_after
+
+
+class LoginBusy(Exception):
+    """Every hash worker is busy and the queue is full; the login was not attempted."""
+
+    def __init__(self):
+        super().__init__("The server is busy. Please try logging in again in a moment.")
+
+
+# --- Rate Limiting ---
+class RateLimiter:
+    """
+    Token buckets keyed by a string (e.g., 'user:demo' or 'ip:10.0.0.1'). Each key
+    starts with `capacity` tokens and regains one every `refill_seconds`; an attempt
+    spends one. Per process, in memory, bounded to MAX_TRACKED_KEYS buckets.
+    """
+
+    def __init__(self, capacity, refill_seconds, max_keys=MAX_TRACKED_KEYS):
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+        self.max_keys = max_keys
+        self._buckets = OrderedDict() # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Spends a token for `key`. Returns 0 if allowed, else seconds until the next token."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated_at) / self.refill_seconds)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) * self.refill_seconds
+            self._buckets[key] = (tokens, now) # Re-inserted as most recently used
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+# --- Password Hashing ---
+class PasswordHasher:
+    """
+    Hashes and verifies passwords on a small thread pool. Request threads wait for
+    their result, but at most `max_pending` logins queue up; beyond that they fail
+    fast with LoginBusy instead of tying up every worker while the rest of the app
+    (dashboard, API) still has threads to serve.
+    """
+
+    def __init__(self, method=DEFAULT_HASH_METHOD, workers=DEFAULT_HASH_WORKERS,
+                 max_pending=DEFAULT_MAX_PENDING, timeout=DEFAULT_VERIFY_TIMEOUT):
+        self.method = method
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fixmate-hash')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        # Hash of a throwaway password: unknown usernames are checked against it so they take as long as real ones
+        self._dummy_hash = generate_password_hash('not-a-real-password', method)
+        self.method_prefix = self._dummy_hash.split('$', 1)[0] # e.g. 'scrypt:32768:8:1'
+
+    def needs_rehash(self, stored_hash):
+        """True if `stored_hash` was made with different parameters than the configured ones."""
+        return stored_hash.split('$', 1)[0] != self.method_prefix
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored_hash, password):
+        """
+        Checks `password` against `stored_hash` (None means an unknown user).
+        Returns (ok, new_hash); new_hash is set when the password is right but the
+        stored hash uses old parameters and should be replaced.
+        """
+        return self._run(self._verify, stored_hash, password)
+
+    def _verify(self, stored_hash, password):
+        if stored_hash is None:
+            check_password_hash(self._dummy_hash, password)
+            return False, None
+        if not check_password_hash(stored_hash, password):
+            return False, None
+        if self.needs_rehash(stored_hash):
+            return True, generate_password_hash(password, self.method)
+        return True, None
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise LoginBusy()
+        try:
+            future = self._executor.submit(func, *args)
+        except RuntimeError: # Executor shut down
+            self._slots.release()
+            raise LoginBusy()
+        # The slot is freed when the hash finishes, even if this request gave up waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise LoginBusy()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# --- Login / Session Helpers ---
+def _state():
+    return current_app.extensions['auth']
+
+def hash_password(password):
+    """Hashes a new password with the configured method (on the hash pool)."""
+    return _state()['hasher'].hash(password)
+
+def authenticate(db, username, password, remote_addr):
+    """
+    Verifies a username/password. Returns the user row (id, username) or None.
+    Raises LoginRateLimited or LoginBusy without checking the password. When the
+    stored hash uses outdated parameters it is replaced and committed.
+    """
+    state = _state()
+    retry_after = max(state['user_limiter'].take(f'user:{username.lower()}'),
+                      state['ip_limiter'].take(f'ip:{remote_addr}'))
+    if retry_after:
+        raise LoginRateLimited(retry_after)
+
+    user = db.execute(
+        'SELECT id, username, password_hash FROM users WHERE username = ?', (username,)
+    ).fetchone()
+    ok, new_hash = state['hasher'].verify(user['password_hash'] if user else None, password)
+    if not ok:
+        return None
+    if new_hash:
+        db.execute('UPDATE users SET password_hash = ? WHERE id = ?', (new_hash, user['id']))
+        db.commit()
+        current_app.logger.info(f"Rehashed password for user {user['id']} with {state['hasher'].method_prefix}")
+    return user
+
+def load_session_user(db, user_id):
+    """
+    Returns {'id', 'username'} for a logged-in session, or None if the account no
+    longer exists. Cached for a short time so ordinary page loads don't re-read users.
+    """
+    cache = _state()['user_cache']
+    user = cache.get(user_id)
+    if user is None:
+        row = db.execute('SELECT id, username FROM users WHERE id = ?', (user_id,)).fetchone()
+        if row is None:
+            return None
+        user = {'id': row['id'], 'username': row['username']}
+        cache.set(user_id, user)
+    return user
+
+
+# --- Flask Integration ---
+def init_app(app):
+    """
+    Sets up password hashing, login rate limits and the session-user cache.
+    Config:
+      PASSWORD_HASH_METHOD   werkzeug method string; changing it rehashes each user at next login
+      LOGIN_HASH_WORKERS     concurrent hashes per process
+      LOGIN_MAX_PENDING      logins allowed to wait for a hash worker
+      LOGIN_RATE_PER_USER    (burst, seconds per extra attempt) per username
+      LOGIN_RATE_PER_IP      (burst, seconds per extra attempt) per client address
+      SESSION_USER_CACHE_TTL seconds a session's user row is cached
+    """
+    config = app.config
+    user_rate = config.get('LOGIN_RATE_PER_USER', DEFAULT_USER_RATE)
+    ip_rate = config.get('LOGIN_RATE_PER_IP', DEFAULT_IP_RATE)
+    app.extensions['auth'] = {
+        'hasher': PasswordHasher(
+            config.get('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD),
+            config.get('LOGIN_HASH_WORKERS', DEFAULT_HASH_WORKERS),
+            config.get('LOGIN_MAX_PENDING', DEFAULT_MAX_PENDING),
+            config.get('LOGIN_VERIFY_TIMEOUT', DEFAULT_VERIFY_TIMEOUT),
+        ),
+        'user_limiter': RateLimiter(*user_rate),
+        'ip_limiter': RateLimiter(*ip_rate),
+        'user_cache': MemoryCache(max_entries=MAX_TRACKED_KEYS,
+                                  ttl=config.get('SESSION_USER_CACHE_TTL', DEFAULT_USER_CACHE_TTL)),
+    }
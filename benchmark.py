@@ -0,0 +1,256 @@
+"""
+Drives the main Flask routes through the test client and reports latency percentiles.
+
+    python generate_data.py                              # once: build fixmate_bench.db
+    python benchmark.py                                  # run, print p50/p95/p99 and throughput
+    python benchmark.py --save-baseline bench_baseline.json
+    python benchmark.py --compare bench_baseline.json    # exit status 1 on a regression
+
+The benchmark works on a temporary copy of the database, so the generated data is
+the same for every run. A scenario counts as a regression when its p95 is more than
+--tolerance (default 25%) slower than the baseline's. Baselines depend on the machine;
+compare runs made on the same one.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import generate_data
+from db import close_all_pools
+
+DEFAULT_BASELINE = 'bench_baseline.json'
+PERCENTILES = (50, 95, 99)
+
+
+# --- Scenarios ---
+# Each scenario gets a logged-in test client and the user's id, and makes one request.
+# Returning the response lets the harness check the status code.
+class Scenarios:
+    """The routes being measured. Completion uses each user's pending task ids in turn."""
+
+    def __init__(self, db_path, rng):
+        self.rng = rng
+        conn = sqlite3.connect(db_path)
+        try:
+            self.pending = {}
+            self.task_ids = {}
+            for user_id, task_id, completed in conn.execute('SELECT user_id, id, completed FROM tasks'):
+                self.task_ids.setdefault(user_id, []).append(task_id)
+                if not completed:
+                    self.pending.setdefault(user_id, []).append(task_id)
+        finally:
+            conn.close()
+
+    def dashboard(self, client, user_id):
+        return client.get('/dashboard')
+
+    def analytics(self, client, user_id):
+        return client.get('/analytics')
+
+    def task_detail(self, client, user_id):
+        return client.get(f"/task/{self.rng.choice(self.task_ids[user_id])}")
+
+    def add_task(self, client, user_id):
+        return client.post('/task/add', data={
+            'title': 'Benchmark task', 'category': 'HVAC & Heating',
+            'due_date': '2030-01-01', 'frequency': 'Monthly', 'cost': '12.50',
+        })
+
+    def complete_task(self, client, user_id):
+        pending = self.pending.get(user_id)
+        task_id = pending.pop() if pending else self.rng.choice(self.task_ids[user_id])
+        return client.post(f"/task/complete/{task_id}")
+
+    ALL = ('dashboard', 'analytics', 'task_detail', 'add_task', 'complete_task')
+
+
+# --- Statistics ---
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-pct * len(sorted_values) // 100)) # ceil(pct/100 * n)
+    return sorted_values[int(rank) - 1]
+
+def summarize(latencies, elapsed):
+    values = sorted(latencies)
+    result = {f'p{pct}_ms': round(percentile(values, pct) * 1000, 3) for pct in PERCENTILES}
+    result['mean_ms'] = round(sum(values) / len(values) * 1000, 3) if values else 0.0
+    result['requests'] = len(values)
+    result['rps'] = round(len(values) / elapsed, 1) if elapsed else 0.0
+    return result
+
+
+# --- Harness ---
+def copy_database(source, target):
+    """Copies a (possibly WAL-mode) database consistently with the backup API."""
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+def login_clients(app, db_path, count, password):
+    """Logs in the first `count` bench users; returns [(client, user_id)]."""
+    conn = sqlite3.connect(db_path)
+    try:
+        users = conn.execute(
+            "SELECT id, username FROM users WHERE username LIKE ? ESCAPE '\\' ORDER BY id LIMIT ?",
+            ('bench\\_%', count)
+        ).fetchall()
+    finally:
+        conn.close()
+    clients = []
+    for user_id, username in users:
+        client = app.test_client()
+        response = client.post('/login', data={'username': username, 'password': password})
+        if response.status_code != 302:
+            raise RuntimeError(f"Could not log in as {username} (status {response.status_code})")
+        clients.append((client, user_id))
+    return clients
+
+def run_scenario(func, clients, requests, warmup):
+    """Runs `func` round-robin over the clients; returns (latencies, elapsed, errors)."""
+    for i in range(warmup):
+        client, user_id = clients[i % len(clients)]
+        func(client, user_id).close()
+
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for i in range(requests):
+        client, user_id = clients[i % len(clients)]
+        t0 = time.perf_counter()
+        response = func(client, user_id)
+        response.get_data() # Include streaming/rendering of the body
+        response.close()
+        latencies.append(time.perf_counter() - t0)
+        if response.status_code >= 400:
+            errors += 1
+    return latencies, time.perf_counter() - started, errors
+
+def compare(results, baseline, tolerance):
+    """Returns a list of "scenario: ..." regression messages."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            continue
+        limit = base['p95_ms'] * (1 + tolerance)
+        if result['p95_ms'] > limit:
+            regressions.append(
+                f"{name}: p95 {result['p95_ms']:.2f} ms vs baseline {base['p95_ms']:.2f} ms "
+                f"(limit {limit:.2f} ms)"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the FixMate routes with the Flask test client.")
+    parser.add_argument('--db', default=generate_data.DEFAULT_DB,
+                        help=f"generated database to benchmark (default: {generate_data.DEFAULT_DB})")
+    parser.add_argument('--scenario', action='append', choices=Scenarios.ALL,
+                        help="scenario to run (repeatable; default: all)")
+    parser.add_argument('--requests', type=int, default=200, help="measured requests per scenario (default: 200)")
+    parser.add_argument('--warmup', type=int, default=20, help="unmeasured requests first (default: 20)")
+    parser.add_argument('--clients', type=int, default=10, help="bench users to spread requests over (default: 10)")
+    parser.add_argument('--password', default='bench', help="bench user password (default: bench)")
+    parser.add_argument('--seed', type=int, default=1, help="random seed for picking tasks (default: 1)")
+    parser.add_argument('--no-tracing', action='store_true', help="use plain connections (no SQL timing)")
+    parser.add_argument('--save-baseline', metavar='PATH', help="write the results as a baseline")
+    parser.add_argument('--compare', metavar='PATH', nargs='?', const=DEFAULT_BASELINE,
+                        help=f"compare with a saved baseline (default path: {DEFAULT_BASELINE})")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed p95 slowdown (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"ERROR: {args.db} not found. Create it with `python generate_data.py` first.")
+        return 1
+
+    workdir = tempfile.mkdtemp(prefix='fixmate-bench-')
+    db_path = os.path.join(workdir, 'bench.db')
+    try:
+        copy_database(args.db, db_path)
+
+        import app as fixmate # Imported here so --help works without building the app
+        fixmate.app.config['DATABASE'] = db_path # Read when the pool is first created
+        if args.no_tracing:
+            fixmate.app.config['DB_CONNECTION_FACTORY'] = sqlite3.Connection
+        fixmate.app.logger.setLevel(logging.ERROR) # Keep slow-query warnings out of the report
+
+        clients = login_clients(fixmate.app, db_path, args.clients, args.password)
+        if not clients:
+            print(f"ERROR: no bench users in {args.db}.")
+            return 1
+        scenarios = Scenarios(db_path, random.Random(args.seed))
+
+        names = args.scenario or Scenarios.ALL
+        print(f"Benchmarking {len(clients)} users, {args.requests} requests per scenario\n")
+        print(f"{'scenario':<15}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'errors':>8}")
+        results = {}
+        for name in names:
+            latencies, elapsed, errors = run_scenario(
+                getattr(scenarios, name), clients, args.requests, args.warmup
+            )
+            result = results[name] = summarize(latencies, elapsed)
+            result['errors'] = errors
+            print(f"{name:<15}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+                  f"{result['p99_ms']:>10.2f}{result['rps']:>10.1f}{errors:>8}")
+    finally:
+        close_all_pools() # Let go of the copy before deleting it
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'machine': {
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+        },
+        'settings': {
+            'db': os.path.basename(args.db), 'clients': len(clients), 'requests': args.requests,
+            'warmup': args.warmup, 'tracing': not args.no_tracing,
+        },
+        'scenarios': results,
+    }
+
+    status = 0
+    if any(result['errors'] for result in results.values()):
+        print("\nSome requests failed (status >= 400).")
+        status = 1
+
+    if args.compare:
+        try:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"\nERROR: could not read baseline {args.compare}: {e}")
+            return 1
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressions against {args.compare}:")
+            for message in regressions:
+                print(f" - {message}")
+            status = 1
+        else:
+            print(f"\nNo regressions against {args.compare} (tolerance {args.tolerance:.0%}).")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote baseline to {os.path.abspath(args.save_baseline)}")
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
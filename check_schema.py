@@ -1,38 +1,219 @@
-import sqlite3
+"""
+Checks fixmate.db against the schema the app expects.
+
+    python check_schema.py                 # report version, tables, indexes and query plans
+    python check_schema.py --db other.db   # check a different database file
+    python check_schema.py --dump-schema   # also rewrite schema.sql from the database
+
+Each hot query the app runs is passed through EXPLAIN QUERY PLAN. A query is flagged
+when SQLite would scan a whole table or build a temporary b-tree to sort, which
+usually means an index is missing. Exits with status 1 if anything is flagged.
+"""
+import argparse
 import os
+import sqlite3
+import sys
+import textwrap
 
 DATABASE_FILENAME = 'fixmate.db'
-TABLE_TO_CHECK = 'users'
+SCHEMA_FILENAME = 'schema.sql'
+
+# Indexes created by migrations.py that the hot queries below rely on
+EXPECTED_INDEXES = (
+    'idx_tasks_user_status_due',
+    'idx_tasks_user_status_title',
+    'idx_tasks_next_due',
+    'idx_task_completions_task',
+    'idx_tasks_pending_due',
+    'idx_sessions_expires',
+    'idx_tasks_user_category',
+    'idx_tasks_user_due',
+    'idx_tasks_user_recurring',
+    'idx_task_changes_seq',
+)
+
+
+def hot_queries():
+    """
+    (name, sql, params[, allowed]) for every query on the request path, built from the
+    app's own SQL. `allowed` lists plan fragments that are acceptable for that query.
+    """
+    import analytics_export
+    import pagination
+    import reminders
+    from db import SHARD_LOOKUP_SQL
+    import search
+    import task_calendar
+    import task_fields
+    import task_io
+    import task_stats
+
+    user_id, task_id = 1, 1
+    pending_first = pagination.build_task_page_query(user_id, 'incomplete')
+    pending_next = pagination.build_task_page_query(user_id, 'incomplete', ['2025-01-01', 'Title', 10])
+    pending_next_null = pagination.build_task_page_query(user_id, 'incomplete', [None, 'Title', 10])
+    completed_first = pagination.build_task_page_query(user_id, 'completed')
+    completed_next = pagination.build_task_page_query(user_id, 'completed', ['Title', 10])
+    return [
+        ('dashboard: pending, first page', *pending_first),
+        ('dashboard: pending, next page', *pending_next),
+        ('dashboard: pending, next page after undated', *pending_next_null),
+        ('dashboard: completed, first page', *completed_first),
+        ('dashboard: completed, next page', *completed_next),
+        ('task detail / edit fetch',
+         f'SELECT {task_fields.select_columns(task_fields.DETAIL_FIELDS)} FROM tasks '
+         'WHERE id = ? AND user_id = ?', [task_id, user_id]),
+        ('task completion history',
+         'SELECT due_date, completed_on FROM task_completions WHERE task_id = ? '
+         'ORDER BY completed_on DESC, id DESC LIMIT 10', [task_id]),
+        ('complete/uncomplete/delete by id',
+         'UPDATE tasks SET completed = 1 WHERE user_id = ? AND completed = 0 AND id IN (?, ?)',
+         [user_id, 1, 2]),
+        ('recurring roll (everyone)',
+         'SELECT user_id FROM tasks WHERE next_due_date IS NOT NULL AND next_due_date <= ?',
+         ['2025-01-01']),
+        ('analytics: summary rows',
+         'SELECT c.name AS category, s.completed, s.task_count, s.cost_cents '
+         'FROM task_summary s LEFT JOIN categories c ON c.id = s.category_id '
+         'WHERE s.user_id = ?', [user_id]),
+        # Groups/sorts a handful of summary rows per user, so the temp b-tree is fine
+        ('analytics: category counts', task_stats.CATEGORY_COUNTS_SQL, [user_id], ('USE TEMP B-TREE',)),
+        ('analytics: cost stats', task_stats.COST_STATS_SQL, [user_id]),
+        ('analytics: overdue/upcoming list', task_stats.DUE_TASKS_SQL, [user_id, '0', '2025-01-01']),
+        ('data version lookup',
+         'SELECT version, updated_at FROM user_data_version WHERE user_id = ?', [user_id]),
+        ('export', task_io.EXPORT_TASKS_SQL, [user_id]),
+        ('api: category filter',
+         'SELECT id FROM tasks WHERE user_id = ? AND category_id = '
+         f'{task_fields.CATEGORY_ID_SQL}', [user_id, 'Plumbing & Water']),
+        # FTS5 reports its own lookups as a "SCAN ... VIRTUAL TABLE INDEX"; that is the index
+        ('search', search.SEARCH_SQL, [search.build_match_query('hvac filt', user_id), 20, 0],
+         ('VIRTUAL TABLE',)),
+        ('calendar window', task_calendar.WINDOW_SQL, [user_id, '2025-01-01', '2025-01-31']),
+        ('calendar recurring tasks', task_calendar.RECURRING_SQL, [user_id, '2025-01-31', '2025-01-31']),
+        ('reminder window (everyone)', reminders.WINDOW_SQL, ['2025-01-01', 0, '2025-01-08', 1000]),
+        ('reminder claim', reminders.CLAIM_SQL, [task_id, '2025-01-01']),
+        ('session load',
+         'SELECT data, expires_at FROM sessions WHERE id = ? AND expires_at >= ?', ['sid', 0]),
+        ('session compaction',
+         'SELECT id FROM sessions WHERE expires_at < ? LIMIT ?', [0, 1000]),
+        ('login user lookup',
+         'SELECT id, username, password_hash FROM users WHERE username = ?', ['demo']),
+        ('shard lookup', SHARD_LOOKUP_SQL, [user_id]),
+        # The export reads every pending change; the log only holds tasks changed since the last one
+        ('analytics export: changed tasks', analytics_export.CHANGED_IDS_SQL, [100], ('SCAN task_changes',)),
+        ('analytics export: changed rows', analytics_export.CHANGED_ROWS_SQL, [0, 50000, 100]),
+        ('analytics export: file rows', analytics_export.CHUNK_ROWS_SQL, [0, 50000]),
+        ('change counter (trigger)', 'SELECT COALESCE(MAX(seq), 0) + 1 FROM task_changes', []),
+    ]
+
+
+def plan_problems(plan_rows, allowed=()):
+    """Returns the plan lines that indicate a missing index."""
+    problems = []
+    for row in plan_rows:
+        detail = row[3]
+        if any(fragment in detail for fragment in allowed):
+            continue
+        # "SCAN x" reads the whole table (or a whole index); "SEARCH x USING INDEX" seeks into it
+        if detail.startswith('SCAN ') or 'USE TEMP B-TREE' in detail:
+            problems.append(detail)
+    return problems
+
 
-# Construct the absolute path to the database file
-db_path = os.path.abspath(DATABASE_FILENAME)
-print(f"Attempting to check schema for table '{TABLE_TO_CHECK}' in database:")
-print(f"'{db_path}'\n")
+def dump_schema(conn, path):
+    """Writes the live schema (tables, indexes, triggers) to schema.sql for reference."""
+    rows = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+        "ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END, name"
+    ).fetchall()
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    with open(path, 'w') as f:
+        f.write(f"-- FixMate schema at migration version {version}.\n")
+        f.write("-- Reference only: generated by `python check_schema.py --dump-schema`.\n")
+        f.write("-- Create/upgrade a database with `flask init-db` (see migrations.py).\n\n")
+        for (sql,) in rows:
+            # Stored SQL keeps the indentation it had inside migrations.py; even it out
+            first, _, rest = sql.strip().partition('\n')
+            f.write(first + ('\n' + textwrap.dedent(rest) if rest else '') + ";\n\n")
 
-if not os.path.exists(db_path):
-    print(f"ERROR: Database file not found at the expected location.")
-else:
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the FixMate database schema and query plans.")
+    parser.add_argument('--db', default=DATABASE_FILENAME, help="database file (default: fixmate.db)")
+    parser.add_argument('--dump-schema', action='store_true', help="rewrite schema.sql from the database")
+    args = parser.parse_args(argv)
+
+    # Construct the absolute path to the database file
+    db_path = os.path.abspath(args.db)
+    print(f"Checking schema in database:\n'{db_path}'\n")
+    if not os.path.exists(db_path):
+        print("ERROR: Database file not found at the expected location.")
+        return 1
+
+    import migrations
     conn = None # Initialize connection variable
+    issues = 0
     try:
         conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
 
-        print(f"Columns in table '{TABLE_TO_CHECK}':")
-        # Use PRAGMA table_info to get column details
-        cursor.execute(f"PRAGMA table_info({TABLE_TO_CHECK});")
-        columns = cursor.fetchall()
+        # --- Schema version ---
+        version = migrations.get_version(conn)
+        print(f"Schema version: {version} (latest: {migrations.LATEST_VERSION})")
+        if version < migrations.LATEST_VERSION:
+            print(" -> Out of date. Run `flask init-db` to apply pending migrations.")
+            issues += 1
 
-        if not columns:
-            print(f" -> Table '{TABLE_TO_CHECK}' not found or is empty.")
-        else:
+        # --- Tables and columns ---
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )]
+        for table in tables:
             # The column name is the second item (index 1) in each row returned by PRAGMA table_info
-            for column in columns:
-                print(f" -> {column[1]}") # column[1] is the column name
+            columns = [column[1] for column in conn.execute(f"PRAGMA table_info({table});")]
+            print(f"Table '{table}': {', '.join(columns)}")
+
+        # --- Expected indexes ---
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        missing = [name for name in EXPECTED_INDEXES if name not in existing]
+        print()
+        if missing:
+            print(f"Missing indexes: {', '.join(missing)}")
+            issues += 1
+        else:
+            print("All expected indexes present.")
+
+        # --- Query plans ---
+        print("\nQuery plans:")
+        for name, sql, params, *allowed in hot_queries():
+            try:
+                plan = conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+            except sqlite3.Error as e:
+                print(f" [ERROR] {name}: {e}")
+                issues += 1
+                continue
+            problems = plan_problems(plan, allowed[0] if allowed else ())
+            if problems:
+                issues += 1
+                print(f" [WARN]  {name}: {'; '.join(problems)}")
+            else:
+                print(f" [OK]    {name}: {'; '.join(row[3] for row in plan)}")
+
+        if args.dump_schema:
+            dump_schema(conn, SCHEMA_FILENAME)
+            print(f"\nWrote {os.path.abspath(SCHEMA_FILENAME)}")
 
     except sqlite3.Error as e:
         print(f"An error occurred while accessing the database: {e}")
+        return 1
 
     finally:
         if conn:
             conn.close()
-            # print("\nDatabase connection closed.")
\ No newline at end of file
+
+    print(f"\n{issues} issue(s) found." if issues else "\nNo issues found.")
+    return 1 if issues else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
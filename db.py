@@ -0,0 +1,256 @@
+# --- Imports ---
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from flask import current_app, g, session
+
+# --- Default Pool Settings (override via app.config) ---
+DEFAULT_POOL_SIZE = 8              # Max open connections per database file
+DEFAULT_BUSY_TIMEOUT_MS = 5000     # How long a writer waits for SQLite's lock before erroring
+DEFAULT_STATEMENT_CACHE_SIZE = 128 # Prepared statements kept per connection
+DEFAULT_ACQUIRE_TIMEOUT = 10.0     # Seconds a request waits for a free connection
+DEFAULT_SHARDS = 1                 # Database files tasks are spread over (1 = just DATABASE)
+
+
+class ConnectionPool:
+    """
+    A small thread-safe pool of SQLite connections for one database file.
+
+    Connections are created lazily up to `size` and handed back out after use, so
+    the PRAGMAs below run once per connection instead of once per request:
+      - journal_mode=WAL lets readers keep going while a writer commits
+      - synchronous=NORMAL is durable enough under WAL and skips an fsync per commit
+      - busy_timeout makes writers wait for the lock instead of failing immediately
+      - foreign_keys=ON so ON DELETE CASCADE actually fires
+    """
+
+    def __init__(self, path, size=DEFAULT_POOL_SIZE, busy_timeout_ms=DEFAULT_BUSY_TIMEOUT_MS,
+                 statement_cache_size=DEFAULT_STATEMENT_CACHE_SIZE,
+                 acquire_timeout=DEFAULT_ACQUIRE_TIMEOUT, connection_factory=sqlite3.Connection):
+        self.path = os.path.abspath(path)
+        self.size = max(1, int(size))
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self.statement_cache_size = int(statement_cache_size)
+        self.acquire_timeout = acquire_timeout
+        self.connection_factory = connection_factory # e.g. metrics.TracingConnection
+        self._idle = queue.LifoQueue() # LIFO keeps the "hot" connections in use
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def _connect(self):
+        """Opens and configures a brand-new connection."""
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            cached_statements=self.statement_cache_size,
+            check_same_thread=False, # Connections move between worker threads (one at a time)
+            factory=self.connection_factory,
+        )
+        conn.row_factory = sqlite3.Row # Return rows that behave like dictionaries
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        conn.execute(f'PRAGMA busy_timeout = {self.busy_timeout_ms}')
+        conn.execute('PRAGMA foreign_keys = ON')
+        return conn
+
+    def acquire(self):
+        """Borrows a connection, opening a new one if the pool is not full yet."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._connect()
+            except sqlite3.Error:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        # Pool is at capacity: wait for another request to give one back
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            # Raised as a sqlite3 error so existing `except sqlite3.Error` handlers catch it
+            raise sqlite3.OperationalError(
+                f"Timed out waiting for a database connection (pool size {self.size})"
+            )
+
+    def release(self, conn):
+        """Returns a connection to the pool, discarding any uncommitted work."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row # Undo any per-use override
+        except sqlite3.Error:
+            # Connection is unusable; drop it so a fresh one gets opened next time
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """Context manager version of acquire()/release()."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def warm(self, count):
+        """Opens up to `count` connections ahead of time so the first requests don't pay for it."""
+        conns = []
+        try:
+            for _ in range(min(count, self.size)):
+                conns.append(self.acquire())
+        finally:
+            for conn in conns:
+                self.release(conn)
+        return len(conns)
+
+    def close_all(self):
+        """Closes every idle connection (e.g., at shutdown or after a fork)."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+# --- Pool Registry (one pool per database file, per process) ---
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(path, **settings):
+    """Returns the shared pool for `path`, creating it with `settings` on first use."""
+    key = os.path.abspath(path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(key, **settings)
+        return pool
+
+def close_all_pools():
+    """Closes all idle pooled connections in this process."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
+
+
+# --- Shards ---
+# With DB_SHARDS > 1, each user's tasks (and everything hanging off them) live in one of
+# several database files, so users on different shards never wait for the same write lock.
+# Shard 0 is DATABASE itself, which also holds the directory: the real users rows, sessions
+# and shard_directory (user_id -> shard). Other shards keep a stub users row per resident
+# user so their foreign keys and cascades work. Users without a directory row are on shard 0.
+SHARD_LOOKUP_SQL = 'SELECT shard FROM shard_directory WHERE user_id = ?'
+USER_MOVED_ERROR = 'user moved to another shard' # Raised by trg_tasks_moved_user (migration 13)
+
+def shard_file_paths(database, count):
+    """[DATABASE, 'fixmate.shard1.db', 'fixmate.shard2.db', ...] for `count` shards."""
+    root, ext = os.path.splitext(database)
+    return [database] + [f"{root}.shard{n}{ext or '.db'}" for n in range(1, max(1, int(count)))]
+
+def lookup_shard(directory_db, user_id):
+    """Which shard holds `user_id`'s tasks, from the directory (shard 0 if unlisted)."""
+    row = directory_db.execute(SHARD_LOOKUP_SQL, (user_id,)).fetchone()
+    return row[0] if row else 0
+
+def is_user_moved(error):
+    """True if a write failed because its user moved off that shard after it was looked up."""
+    return isinstance(error, sqlite3.IntegrityError) and USER_MOVED_ERROR in str(error)
+
+
+# --- Flask Integration ---
+def shard_count():
+    return max(1, int(current_app.config.get('DB_SHARDS', DEFAULT_SHARDS)))
+
+def shard_paths():
+    """The current app's database files, in shard order (shard 0 = DATABASE)."""
+    return shard_file_paths(current_app.config['DATABASE'], shard_count())
+
+def get_app_pool(shard=0):
+    """Returns the pool for one of the current Flask app's database files (default: DATABASE)."""
+    config = current_app.config
+    return get_pool(
+        shard_paths()[shard],
+        size=config.get('DB_POOL_SIZE', DEFAULT_POOL_SIZE),
+        busy_timeout_ms=config.get('DB_BUSY_TIMEOUT_MS', DEFAULT_BUSY_TIMEOUT_MS),
+        statement_cache_size=config.get('DB_STATEMENT_CACHE_SIZE', DEFAULT_STATEMENT_CACHE_SIZE),
+        acquire_timeout=config.get('DB_ACQUIRE_TIMEOUT', DEFAULT_ACQUIRE_TIMEOUT),
+        connection_factory=config.get('DB_CONNECTION_FACTORY', sqlite3.Connection),
+    )
+
+def get_directory_db():
+    """Borrows a connection to DATABASE (users, sessions, shard directory) for the request."""
+    if 'db' not in g:
+        pool = get_app_pool()
+        g.db = pool.acquire()
+        g.db_pool = pool
+    return g.db
+
+def get_shard_db(shard):
+    """Borrows a connection to one shard for the request (at most one per shard)."""
+    if not shard:
+        return get_directory_db()
+    borrowed = g.setdefault('shard_dbs', {})
+    if shard not in borrowed:
+        pool = get_app_pool(shard)
+        borrowed[shard] = (pool, pool.acquire())
+    return borrowed[shard][1]
+
+def user_shard(user_id, refresh=False):
+    """The shard holding `user_id`'s tasks (looked up once per request, or again with refresh)."""
+    if shard_count() == 1:
+        return 0
+    known = g.setdefault('user_shards', {})
+    if refresh or user_id not in known:
+        known[user_id] = lookup_shard(get_directory_db(), user_id)
+    return known[user_id]
+
+def get_db(user_id=None):
+    """
+    Borrows a pooled connection for the duration of the request: the shard holding
+    `user_id`'s tasks (default: the logged-in user's). Without sharding, or without a
+    user, that is DATABASE itself.
+    """
+    if shard_count() == 1:
+        return get_directory_db()
+    if user_id is None:
+        user = session.get('user')
+        if not user:
+            return get_directory_db()
+        user_id = user['id']
+    return get_shard_db(user_shard(user_id))
+
+def close_db(error=None):
+    """Hands the request's connections back to their pools at the end of the request."""
+    db = g.pop('db', None)
+    pool = g.pop('db_pool', None)
+    if db is not None and pool is not None:
+        pool.release(db)
+    for pool, conn in g.pop('shard_dbs', {}).values():
+        pool.release(conn)
+
+def init_app(app):
+    """Registers the pool teardown with the Flask app."""
+    app.teardown_appcontext(close_db)
@@ -0,0 +1,214 @@
+# --- Imports ---
+import hashlib
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import Response, current_app, request, session
+from werkzeug.http import is_resource_modified
+
+import metrics
+
+# --- Default Cache Settings (override via app.config) ---
+DEFAULT_MAX_ENTRIES = 2000 # Rendered fragments kept per process
+DEFAULT_TTL = 300          # Seconds a fragment may be served before it is re-rendered
+
+CACHE_REQUESTS = metrics.REGISTRY.register(metrics.Counter(
+    'fixmate_fragment_cache_requests_total', 'Fragment cache lookups, by fragment and result.',
+    ('fragment', 'result')))
+
+
+# --- Backends ---
+class CacheBackend(ABC):
+    """
+    Interface for fragment storage. Values are rendered HTML strings.
+    Implement get/set/clear to plug in another store (e.g., Redis) through
+    app.config['FRAGMENT_CACHE_BACKEND'].
+    """
+
+    @abstractmethod
+    def get(self, key):
+        """Returns the cached value, or None if it is missing or expired."""
+
+    @abstractmethod
+    def set(self, key, value, ttl=None):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache with a size bound and a per-entry TTL. Thread-safe."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self._entries = OrderedDict() # key -> (expires_at, value); oldest first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key) # Most recently used
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False) # Evict the least recently used
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class NullCache(CacheBackend):
+    """Caches nothing (FRAGMENT_CACHE_ENABLED = False)."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def clear(self):
+        pass
+
+
+# --- Keys ---
+# Every key includes the user's data version (see task_stats.bump_data_version). Write routes
+# bump that version in the same transaction as the change, so the moment a write commits
+# the old fragments can no longer be looked up; they just age out of the LRU.
+def fragment_key(name, user_id, version, *parts):
+    """Cache key (and ETag seed) for one rendered fragment."""
+    today = datetime.now().date().isoformat() # Rolling recurring tasks and the footer depend on the date
+    return ':'.join(str(part) for part in (current_app.config['FRAGMENT_CACHE_NAMESPACE'],
+                                           name, user_id, version, today) + parts)
+
+def _templates_namespace(app):
+    """
+    Changes whenever a template file or a static asset changes, so a deploy never serves
+    old markup, nor markup linking to fingerprinted files that are no longer served
+    (assets.init_app must run first to set the asset digest).
+    """
+    folder = os.path.join(app.root_path, app.template_folder or 'templates')
+    try:
+        stamp = max(os.stat(os.path.join(folder, name)).st_mtime_ns for name in os.listdir(folder))
+    except (OSError, ValueError):
+        stamp = 0
+    return f"{stamp:x}-{app.extensions.get('asset_digest', '')}"
+
+
+def get_cache():
+    return current_app.extensions['fragment_cache']
+
+def cached_fragment(name, key, render):
+    """
+    Returns the cached HTML for `key`, calling render() and storing the result on a miss.
+    render() may return None (e.g., not found); that is passed through and not cached.
+    """
+    cache = get_cache()
+    html = cache.get(key)
+    if html is not None:
+        CACHE_REQUESTS.inc(name, 'hit')
+        return html
+    CACHE_REQUESTS.inc(name, 'miss')
+    html = render()
+    if html is not None:
+        cache.set(key, html)
+    return html
+
+async def cached_fragment_async(name, key, render):
+    """cached_fragment() for the async views: render is a coroutine function."""
+    cache = get_cache()
+    html = cache.get(key)
+    if html is not None:
+        CACHE_REQUESTS.inc(name, 'hit')
+        return html
+    CACHE_REQUESTS.inc(name, 'miss')
+    html = await render()
+    if html is not None:
+        cache.set(key, html)
+    return html
+
+
+
+# --- Conditional Requests (ETag / Last-Modified) ---
+def make_etag(key):
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def last_modified_from(updated_at):
+    """Parses user_data_version.updated_at ('YYYY-MM-DD HH:MM:SS', UTC). None if unknown."""
+    if not updated_at:
+        return None
+    try:
+        stamp = datetime.fromisoformat(updated_at).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    # The page also changes at midnight (see fragment_key), so never report older than today
+    midnight = datetime.now().astimezone().replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(stamp, midnight.astimezone(timezone.utc))
+
+def not_modified(etag, last_modified=None, weak=False):
+    """
+    Returns a 304 response if the browser's copy is still current, else None.
+    Never answers 304 while flash messages are waiting, since those are part of the page.
+    """
+    if session.get('_flashes'):
+        return None
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    response = Response(status=304)
+    return add_validators(response, etag, last_modified, weak)
+
+def add_validators(response, etag, last_modified=None, weak=False):
+    """
+    Adds ETag/Last-Modified; the browser must revalidate and shared caches must not store it.
+    Use a weak ETag when the body may be re-encoded (e.g., gzip) on the way out.
+    """
+    response.set_etag(etag, weak=weak)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+# --- Flask Integration ---
+def init_app(app):
+    """
+    Creates the fragment cache for `app`.
+    Config:
+      FRAGMENT_CACHE_ENABLED      False to disable caching (ETags are still sent)
+      FRAGMENT_CACHE_BACKEND      a CacheBackend instance to use instead of MemoryCache
+      FRAGMENT_CACHE_MAX_ENTRIES  LRU size bound (default 2000)
+      FRAGMENT_CACHE_TTL          seconds per entry (default 300)
+    """
+    app.config.setdefault('FRAGMENT_CACHE_NAMESPACE', _templates_namespace(app))
+    backend = app.config.get('FRAGMENT_CACHE_BACKEND')
+    if backend is None:
+        if app.config.get('FRAGMENT_CACHE_ENABLED', True):
+            backend = MemoryCache(
+                app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+                app.config.get('FRAGMENT_CACHE_TTL', DEFAULT_TTL),
+            )
+        else:
+            backend = NullCache()
+    app.extensions['fragment_cache'] = backend
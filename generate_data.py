@@ -0,0 +1,188 @@
+"""
+Fills a database with synthetic users and tasks for load testing.
+
+    python generate_data.py                                # 50 users x 200 tasks into fixmate_bench.db
+    python generate_data.py --users 500 --tasks 1000       # bigger
+    python generate_data.py --db other.db --seed 7 --today 2025-06-01
+
+The same --seed and --today always produce the same data, so benchmark runs are
+comparable. Users are named bench_0001, bench_0002, ... and share one password
+(default "bench"). Existing bench users in the target database are left alone.
+"""
+import argparse
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+from werkzeug.security import generate_password_hash
+
+import migrations
+import recurrence
+import task_fields
+import task_io
+import task_stats
+
+DEFAULT_DB = 'fixmate_bench.db'
+USERNAME_FORMAT = 'bench_{:04d}'
+INSERT_BATCH_SIZE = 5000
+
+# --- Distributions ---
+# (value, weight) pairs; the weights are rough guesses at how people actually use the app
+CATEGORIES = (
+    ("HVAC & Heating", 16), ("Cleaning & General Maintenance", 22), ("Safety Equipment", 8),
+    ("Plumbing & Water", 14), ("Roof & Exterior", 10), ("Doors & Windows", 8),
+    ("Garden & Yard", 14), ("Appliances & Interior", 8),
+)
+FREQUENCIES = (
+    ("One-time", 35), ("As Needed", 10), ("Weekly", 8), ("Biweekly", 4), ("Monthly", 18),
+    ("Quarterly", 12), ("Yearly", 10), ("every 6 months", 3),
+)
+ESTIMATED_MINUTES = (10, 15, 30, 45, 60, 120, 240) # Up to half a working day
+COMPLETED_SHARE = 0.35   # Fraction of tasks already done
+UNDATED_SHARE = 0.15     # Fraction of tasks with no due date
+FREE_SHARE = 0.40        # Fraction of tasks that cost nothing
+
+# Words the titles and guides are built from
+TASK_VERBS = ("Replace", "Clean", "Inspect", "Test", "Flush", "Service", "Check", "Seal", "Repaint", "Lubricate")
+TASK_OBJECTS = (
+    "HVAC filter", "gutters", "smoke detector", "water heater", "dryer vent", "window seals",
+    "garage door", "sump pump", "fridge coils", "deck boards", "faucet aerators", "lawn mower",
+    "fire extinguisher", "chimney", "caulking in bathroom", "sprinkler heads", "attic insulation",
+)
+GUIDE_WORDS = (
+    "turn off the power first", "use a ladder safely", "wear gloves", "check the manual",
+    "replace if damaged", "vacuum the area", "tighten the screws", "look for leaks",
+    "note the model number", "buy spares", "wipe with a damp cloth", "let it dry",
+    "test afterwards", "call a professional if unsure", "record the date",
+)
+
+
+def _weighted(rng, pairs):
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights)[0]
+
+def random_due_date(rng, today):
+    """Most tasks are due within a few months; some are overdue, some far out, some undated."""
+    roll = rng.random()
+    if roll < UNDATED_SHARE:
+        return None
+    if roll < UNDATED_SHARE + 0.20:
+        offset = -rng.randint(1, 120)   # Overdue
+    elif roll < UNDATED_SHARE + 0.35:
+        offset = rng.randint(0, 7)      # Due this week
+    else:
+        offset = int(rng.expovariate(1 / 60)) + 8
+    return (today + timedelta(days=offset)).isoformat()
+
+def random_cost(rng):
+    """Cost in cents. Many tasks are free; the rest follow a long tail (a few very expensive ones)."""
+    if rng.random() < FREE_SHARE:
+        return None if rng.random() < 0.5 else 0
+    return round(min(rng.lognormvariate(3.3, 1.1), 5000.0) * 100)
+
+def random_guide(rng):
+    """Guides range from empty to a few paragraphs."""
+    sentences = int(rng.expovariate(1 / 4))
+    if not sentences:
+        return None
+    return ' '.join(rng.choice(GUIDE_WORDS).capitalize() + '.' for _ in range(sentences))
+
+def random_task(rng, today):
+    """One task as a tuple matching task_io.INSERT_TASK_SQL minus the user_id."""
+    frequency = _weighted(rng, FREQUENCIES)
+    recur_unit, recur_every = recurrence.parse_frequency(frequency) or (None, None)
+    return (
+        f"{rng.choice(TASK_VERBS)} {rng.choice(TASK_OBJECTS)}",
+        _weighted(rng, CATEGORIES),
+        random_due_date(rng, today),
+        frequency,
+        random_cost(rng),
+        rng.choice(ESTIMATED_MINUTES),
+        random_guide(rng),
+        None, # video_url
+        1 if rng.random() < COMPLETED_SHARE else 0,
+        recur_unit,
+        recur_every,
+    )
+
+
+# --- Generation ---
+def generate(conn, users, tasks_per_user, seed=42, today=None, password='bench', log=print):
+    """
+    Creates `users` bench users with `tasks_per_user` tasks each. Tasks are inserted
+    with executemany() in large batches inside one transaction per batch; the
+    summary/search triggers keep the derived tables up to date as usual.
+    Returns (users_created, tasks_created).
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    password_hash = generate_password_hash(password) # One hash shared by every bench user (hashing is slow)
+
+    users_created = tasks_created = 0
+    batch = []
+    task_fields.ensure_categories(conn, [name for name, _ in CATEGORIES])
+
+    def flush():
+        nonlocal tasks_created
+        if batch:
+            conn.executemany(task_io.INSERT_TASK_SQL, batch)
+            conn.commit()
+            tasks_created += len(batch)
+            batch.clear()
+
+    for number in range(1, users + 1):
+        username = USERNAME_FORMAT.format(number)
+        cursor = conn.execute(
+            'INSERT OR IGNORE INTO users (username, password_hash) VALUES (?, ?)',
+            (username, password_hash)
+        )
+        # Draw the tasks even for existing users so the random sequence (and the rest of the data) stays the same
+        user_tasks = [random_task(rng, today) for _ in range(tasks_per_user)]
+        if not cursor.rowcount:
+            continue
+        user_id = cursor.lastrowid
+        users_created += 1
+        task_stats.bump_data_version(conn, user_id)
+        batch.extend((user_id,) + task for task in user_tasks)
+        if len(batch) >= INSERT_BATCH_SIZE:
+            flush()
+            log(f"  {number}/{users} users...")
+    flush()
+    conn.commit()
+    return users_created, tasks_created
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic FixMate users and tasks.")
+    parser.add_argument('--db', default=DEFAULT_DB, help=f"database file (default: {DEFAULT_DB})")
+    parser.add_argument('--users', type=int, default=50, help="number of users (default: 50)")
+    parser.add_argument('--tasks', type=int, default=200, help="tasks per user (default: 200)")
+    parser.add_argument('--seed', type=int, default=42, help="random seed (default: 42)")
+    parser.add_argument('--today', type=date.fromisoformat, default=None,
+                        help="date the due dates are spread around, YYYY-MM-DD (default: today)")
+    parser.add_argument('--password', default='bench', help="password for every bench user (default: bench)")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.execute('PRAGMA journal_mode = WAL')
+    try:
+        migrations.migrate(conn)
+        started = time.perf_counter()
+        users, tasks = generate(conn, args.users, args.tasks, args.seed, args.today, args.password)
+        conn.execute('ANALYZE') # Fresh statistics for the planner after a bulk load
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"An error occurred while generating data: {e}")
+        return 1
+    finally:
+        conn.close()
+    print(f"✔ Created {users} users and {tasks} tasks in {args.db} "
+          f"({time.perf_counter() - started:.1f}s). Log in as {USERNAME_FORMAT.format(1)}/{args.password}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
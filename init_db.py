@@ -1,12 +1,14 @@
 import sqlite3
 
+import migrations
+
 def init_db():
+    # Same versioned migrations as `flask init-db` (schema.sql is only a reference dump)
     conn = sqlite3.connect('fixmate.db')
-    with open('schema.sql', 'r') as f:
-        conn.executescript(f.read())
-    conn.commit()
+    conn.execute('PRAGMA foreign_keys = ON')
+    migrations.migrate(conn)
     conn.close()
-    print("✔ Initialized fixmate.db")
+    print(f"✔ Initialized fixmate.db (schema version {migrations.LATEST_VERSION})")
 
 if __name__ == '__main__':
     init_db()
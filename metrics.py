@@ -0,0 +1,299 @@
+# --- Imports ---
+import bisect
+import functools
+import hmac
+import re
+import sqlite3
+import threading
+import time
+
+from flask import Response, abort, current_app, g, request, template_rendered, before_render_template
+
+# --- Histogram Buckets (seconds) ---
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+TEMPLATE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+DEFAULT_SLOW_QUERY_MS = 100 # Statements slower than this are logged as warnings
+MAX_STATEMENT_LABEL = 200   # Normalized SQL is cut to this length for the metric label
+LOCAL_ADDRESSES = ('127.0.0.1', '::1') # Who may read the metrics page when no METRICS_TOKEN is set
+
+
+# --- Metric Types ---
+def _escape(value):
+    """Escapes a label value for the Prometheus text format."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing count per label set."""
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {_format_number(value)}'
+
+
+class Histogram:
+    """
+    Cumulative bucket counts plus sum/count per label set, the same shape the
+    Prometheus client libraries expose (so histogram_quantile() works on it).
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=REQUEST_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {} # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value) # First bucket with upper bound >= value
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for label_values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, [('le', _format_number(bound))])
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labels, label_values)
+            yield f'{self.name}_sum{labels} {series[-1]!r}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class Registry:
+    """Holds every metric of this process and renders them as Prometheus text."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+# --- Metrics Collected by FixMate ---
+# Per process: with several worker processes each one keeps (and serves) its own numbers
+REGISTRY = Registry()
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    'fixmate_http_request_duration_seconds', 'Time spent handling a request, by route.',
+    ('method', 'endpoint', 'status'), REQUEST_BUCKETS))
+QUERY_DURATION = REGISTRY.register(Histogram(
+    'fixmate_sql_query_duration_seconds', 'Time spent executing a SQL statement, by normalized statement.',
+    ('statement',), QUERY_BUCKETS))
+SLOW_QUERIES = REGISTRY.register(Counter(
+    'fixmate_sql_slow_queries_total', 'Statements that took longer than SLOW_QUERY_MS.',
+    ('statement',)))
+QUERIES_PER_REQUEST = REGISTRY.register(Histogram(
+    'fixmate_sql_queries_per_request', 'Number of SQL statements executed per request.',
+    ('endpoint',), (1, 2, 5, 10, 20, 50, 100)))
+TEMPLATE_DURATION = REGISTRY.register(Histogram(
+    'fixmate_template_render_duration_seconds', 'Time spent rendering a template.',
+    ('template',), TEMPLATE_BUCKETS))
+
+
+# --- SQL Tracing ---
+_IN_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+
+@functools.lru_cache(maxsize=512)
+def normalize_statement(sql):
+    """
+    Collapses whitespace and `IN (?, ?, ?...)` lists so every call of the same
+    statement lands in one series. Values are always bound parameters, so the
+    label never contains user data.
+    """
+    text = ' '.join(sql.split())
+    text = _IN_LIST.sub('?, ...', text)
+    return text[:MAX_STATEMENT_LABEL]
+
+
+class _Tracer:
+    """Slow-query settings shared by every traced connection (set by init_app)."""
+    enabled = False # SQL_TRACING; without it no statement is counted
+    slow_query_seconds = DEFAULT_SLOW_QUERY_MS / 1000
+    explain_slow = False
+    logger = None
+
+TRACER = _Tracer()
+
+
+def _record_query(conn, sql, parameters, elapsed, explain=True):
+    statement = normalize_statement(sql)
+    QUERY_DURATION.observe(elapsed, statement)
+    try:
+        stats = g.get('request_stats')
+    except RuntimeError:
+        stats = None # Outside a request (CLI commands, scripts)
+    if stats is not None:
+        stats.queries += 1
+
+    if elapsed < TRACER.slow_query_seconds:
+        return
+    SLOW_QUERIES.inc(statement)
+    if TRACER.logger is None:
+        return
+    message = f"Slow query ({elapsed * 1000:.1f} ms): {statement}"
+    if explain and TRACER.explain_slow and not statement.upper().startswith(('PRAGMA', 'BEGIN', 'COMMIT', 'EXPLAIN')):
+        try:
+            # A plain cursor so the EXPLAIN itself isn't traced
+            plan = sqlite3.Cursor(conn).execute(f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()
+            message += ''.join(f"\n    {row[3]}" for row in plan)
+        except sqlite3.Error as e:
+            message += f"\n    (no query plan: {e})"
+    TRACER.logger.warning(message)
+
+
+class TracingCursor(sqlite3.Cursor):
+    """Cursor that times execute()/executemany() and records them (see _record_query)."""
+
+    def execute(self, sql, parameters=(), /):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_query(self.connection, sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            # One plan for many parameter sets, so don't try to EXPLAIN it
+            _record_query(self.connection, sql, (), time.perf_counter() - start, explain=False)
+
+
+class TracingConnection(sqlite3.Connection):
+    """
+    Connection whose cursors are TracingCursors. Pass it as the pool's
+    connection_factory; db.execute(...) and db.cursor() are both covered.
+    Time is measured around execute(), which for a SELECT includes finding the
+    first row but not fetching the rest.
+    """
+
+    def cursor(self, factory=TracingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=(), /):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# --- Flask Integration ---
+class _RequestStats:
+    """Per-request numbers, kept on g and closed over by the response's close callback."""
+    __slots__ = ('started', 'queries')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+
+def _start_request_timer():
+    g.request_stats = _RequestStats()
+
+def _observe_on_close(response):
+    # Recorded when the server closes the response, so a streamed export is timed in full
+    stats = g.get('request_stats') # Left on g: a streamed body keeps counting queries
+    if stats is None:
+        return response
+    labels = (request.method, request.endpoint or 'unmatched', str(response.status_code))
+
+    def observe():
+        REQUEST_DURATION.observe(time.perf_counter() - stats.started, *labels)
+        if TRACER.enabled:
+            QUERIES_PER_REQUEST.observe(stats.queries, labels[1])
+
+    response.call_on_close(observe)
+    return response
+
+def _start_template_timer(sender, template, context, **extra):
+    g.setdefault('template_timers', []).append(time.perf_counter())
+
+def _observe_template(sender, template, context, **extra):
+    timers = g.get('template_timers')
+    if timers:
+        TEMPLATE_DURATION.observe(time.perf_counter() - timers.pop(), template.name or 'string')
+
+def _may_read_metrics():
+    """With METRICS_TOKEN set, the scraper must send it as a bearer token; otherwise only local clients."""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        sent = request.headers.get('Authorization', '')
+        return hmac.compare_digest(sent.encode('utf-8'), f'Bearer {token}'.encode('utf-8'))
+    return request.remote_addr in LOCAL_ADDRESSES
+
+def metrics_view():
+    """Prometheus text exposition of this process's metrics."""
+    if not _may_read_metrics():
+        abort(403)
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+def init_app(app):
+    """
+    Hooks request/template timing into `app` and adds the metrics page (if METRICS_ENDPOINT is set).
+    Must run before the first get_db() so the pool is created with TracingConnection.
+    Config:
+      SQL_TRACING         time every statement on pooled connections (default False)
+      SLOW_QUERY_MS       log statements slower than this (default 100)
+      SQL_EXPLAIN_SLOW    also log EXPLAIN QUERY PLAN for slow statements (debugging)
+      METRICS_ENDPOINT    URL of the metrics page, or None (default) to not expose it
+      METRICS_TOKEN       bearer token the page requires; without one it only answers localhost
+    """
+    TRACER.enabled = bool(app.config.get('SQL_TRACING', False))
+    if TRACER.enabled:
+        app.config.setdefault('DB_CONNECTION_FACTORY', TracingConnection)
+    TRACER.slow_query_seconds = app.config.get('SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS) / 1000
+    TRACER.explain_slow = bool(app.config.get('SQL_EXPLAIN_SLOW', False))
+    TRACER.logger = app.logger
+
+    app.before_request(_start_request_timer)
+    app.after_request(_observe_on_close)
+    before_render_template.connect(_start_template_timer, app)
+    template_rendered.connect(_observe_template, app)
+
+    endpoint = app.config.get('METRICS_ENDPOINT')
+    if endpoint:
+        app.add_url_rule(endpoint, 'metrics', metrics_view)
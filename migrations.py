@@ -0,0 +1,628 @@
+# --- Imports ---
+import sqlite3
+
+from werkzeug.security import generate_password_hash
+
+import recurrence
+import task_fields
+
+# --- Versioned Schema Migrations ---
+# The database's schema version lives in SQLite's built-in PRAGMA user_version.
+# migrate() applies every migration newer than that number, in order, each one in
+# its own transaction together with the version bump, so a failure leaves the
+# database at the last good version.
+#
+# Migrations are written against the schema *as it was at that version*. Never edit
+# one that has shipped; add a new one instead. They are also idempotent, because
+# databases created by older `flask init-db` / schema.sql runs already have some of
+# these tables at user_version 0.
+
+
+def _split_statements(script):
+    """Splits a SQL script into complete statements (trigger bodies stay intact)."""
+    statements = []
+    current = ''
+    for line in script.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            if current.strip():
+                statements.append(current.strip())
+            current = ''
+    if current.strip():
+        statements.append(current.strip())
+    return statements
+
+def _run_script(db, script):
+    """Like executescript(), but stays inside the caller's transaction."""
+    for statement in _split_statements(script):
+        db.execute(statement)
+
+def _columns(db, table):
+    return {row[1] for row in db.execute(f'PRAGMA table_info({table})')}
+
+def _looks_hashed(value):
+    """Werkzeug hashes look like 'method$salt$hash'; legacy seed rows stored plain text."""
+    return bool(value) and value.count('$') >= 2
+
+
+# --- Version 1: reconcile the three original schemas ---
+def _v1_baseline(db):
+    """
+    Brings databases created by schema.sql, seed_db.py or the old init_db() to one shape:
+    users.password_hash (hashing any plain-text seed passwords) and tasks.created_timestamp.
+    """
+    _run_script(db, '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            category TEXT,
+            due_date TEXT,
+            frequency TEXT,
+            cost REAL,
+            estimated_time TEXT,
+            guide TEXT,
+            video_url TEXT,
+            completed INTEGER DEFAULT 0 CHECK(completed IN (0, 1)),
+            created_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        );
+    ''')
+
+    # schema.sql / seed_db.py named the column `password` and stored it unhashed
+    if 'password' in _columns(db, 'users') and 'password_hash' not in _columns(db, 'users'):
+        db.execute('ALTER TABLE users RENAME COLUMN password TO password_hash')
+    for row in db.execute('SELECT id, password_hash FROM users').fetchall():
+        if not _looks_hashed(row[1]):
+            db.execute('UPDATE users SET password_hash = ? WHERE id = ?',
+                       (generate_password_hash(row[1] or ''), row[0]))
+
+    # ALTER TABLE can't add a column with a non-constant default, so old rows get NULL
+    if 'created_timestamp' not in _columns(db, 'tasks'):
+        db.execute('ALTER TABLE tasks ADD COLUMN created_timestamp DATETIME')
+
+
+# --- Version 2: recurrence engine ---
+def _v2_recurrence(db):
+    existing = _columns(db, 'tasks')
+    for column, column_type in (('recur_unit', 'TEXT'), ('recur_every', 'INTEGER'),
+                                ('next_due_date', 'TEXT')):
+        if column not in existing:
+            db.execute(f'ALTER TABLE tasks ADD COLUMN {column} {column_type}')
+    _run_script(db, '''
+        CREATE TABLE IF NOT EXISTS task_completions (
+            id           INTEGER PRIMARY KEY,
+            task_id      INTEGER NOT NULL,
+            due_date     TEXT,
+            completed_on TEXT    NOT NULL,
+            FOREIGN KEY (task_id) REFERENCES tasks (id) ON DELETE CASCADE
+        );
+        CREATE INDEX IF NOT EXISTS idx_task_completions_task ON task_completions (task_id, completed_on);
+        CREATE INDEX IF NOT EXISTS idx_tasks_next_due ON tasks (next_due_date) WHERE next_due_date IS NOT NULL;
+    ''')
+    recurrence.backfill_recurrence(db)
+
+
+# --- Version 3: analytics summary table and per-user data version ---
+def _v3_summary(db):
+    _run_script(db, '''
+        CREATE TABLE IF NOT EXISTS task_summary (
+            user_id    INTEGER NOT NULL,
+            category   TEXT    NOT NULL,
+            completed  INTEGER NOT NULL,
+            task_count INTEGER NOT NULL DEFAULT 0,
+            cost_total REAL    NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, category, completed),
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+
+        DROP TRIGGER IF EXISTS trg_task_summary_insert;
+        CREATE TRIGGER trg_task_summary_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO task_summary (user_id, category, completed, task_count, cost_total)
+            VALUES (NEW.user_id, COALESCE(NEW.category, ''), NEW.completed, 1, COALESCE(NEW.cost, 0))
+            ON CONFLICT (user_id, category, completed) DO UPDATE SET
+                task_count = task_count + 1,
+                cost_total = cost_total + excluded.cost_total;
+        END;
+
+        DROP TRIGGER IF EXISTS trg_task_summary_delete;
+        CREATE TRIGGER trg_task_summary_delete AFTER DELETE ON tasks
+        BEGIN
+            UPDATE task_summary SET
+                task_count = task_count - 1,
+                cost_total = cost_total - COALESCE(OLD.cost, 0)
+            WHERE user_id = OLD.user_id AND category = COALESCE(OLD.category, '')
+              AND completed = OLD.completed;
+            DELETE FROM task_summary WHERE user_id = OLD.user_id AND task_count <= 0;
+        END;
+
+        DROP TRIGGER IF EXISTS trg_task_summary_update;
+        CREATE TRIGGER trg_task_summary_update
+        AFTER UPDATE OF user_id, category, completed, cost ON tasks
+        BEGIN
+            UPDATE task_summary SET
+                task_count = task_count - 1,
+                cost_total = cost_total - COALESCE(OLD.cost, 0)
+            WHERE user_id = OLD.user_id AND category = COALESCE(OLD.category, '')
+              AND completed = OLD.completed;
+            INSERT INTO task_summary (user_id, category, completed, task_count, cost_total)
+            VALUES (NEW.user_id, COALESCE(NEW.category, ''), NEW.completed, 1, COALESCE(NEW.cost, 0))
+            ON CONFLICT (user_id, category, completed) DO UPDATE SET
+                task_count = task_count + 1,
+                cost_total = cost_total + excluded.cost_total;
+            DELETE FROM task_summary WHERE user_id = OLD.user_id AND task_count <= 0;
+        END;
+
+        DELETE FROM task_summary;
+        INSERT INTO task_summary (user_id, category, completed, task_count, cost_total)
+        SELECT user_id, COALESCE(category, ''), completed, COUNT(*), COALESCE(SUM(cost), 0)
+        FROM tasks
+        GROUP BY user_id, COALESCE(category, ''), completed;
+
+        CREATE TABLE IF NOT EXISTS user_data_version (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        );
+    ''')
+
+
+# --- Version 4: indexes matched to the hot queries ---
+def _v4_indexes(db):
+    """
+    Replaces the two original single-purpose indexes with ones that match the
+    dashboard ORDER BY clauses, so both list views are an index range walk with
+    no sort step:
+      pending:   WHERE user_id, completed=0 ORDER BY due_date, title, id
+      completed: WHERE user_id, completed=1 ORDER BY title, id
+    (the rowid/id is implicitly the last column of every index)
+    """
+    _run_script(db, '''
+        DROP INDEX IF EXISTS idx_tasks_user_id;
+        DROP INDEX IF EXISTS idx_tasks_completed;
+        CREATE INDEX IF NOT EXISTS idx_tasks_user_status_due
+            ON tasks (user_id, completed, due_date, title);
+        CREATE INDEX IF NOT EXISTS idx_tasks_user_status_title
+            ON tasks (user_id, completed, title);
+    ''')
+
+
+# --- Version 5: full-text search ---
+def _v5_search(db):
+    """
+    FTS5 index over title, category and guide, kept in sync by triggers.
+    It is an external-content table (the text is read back from tasks through the
+    tasks_search_source view, not stored twice). The view adds an `owner` column
+    ('u<user_id>') so a search can be narrowed to one user inside the FTS index
+    itself instead of matching everyone's tasks and filtering afterwards.
+    """
+    _run_script(db, '''
+        CREATE VIEW IF NOT EXISTS tasks_search_source AS
+            SELECT id, title, category, guide, 'u' || user_id AS owner FROM tasks;
+
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            title, category, guide, owner,
+            content = 'tasks_search_source',
+            content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        );
+
+        DROP TRIGGER IF EXISTS trg_tasks_fts_insert;
+        CREATE TRIGGER trg_tasks_fts_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (rowid, title, category, guide, owner)
+            VALUES (NEW.id, NEW.title, NEW.category, NEW.guide, 'u' || NEW.user_id);
+        END;
+
+        DROP TRIGGER IF EXISTS trg_tasks_fts_delete;
+        CREATE TRIGGER trg_tasks_fts_delete AFTER DELETE ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, category, guide, owner)
+            VALUES ('delete', OLD.id, OLD.title, OLD.category, OLD.guide, 'u' || OLD.user_id);
+        END;
+
+        DROP TRIGGER IF EXISTS trg_tasks_fts_update;
+        CREATE TRIGGER trg_tasks_fts_update AFTER UPDATE OF title, category, guide, user_id ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, category, guide, owner)
+            VALUES ('delete', OLD.id, OLD.title, OLD.category, OLD.guide, 'u' || OLD.user_id);
+            INSERT INTO tasks_fts (rowid, title, category, guide, owner)
+            VALUES (NEW.id, NEW.title, NEW.category, NEW.guide, 'u' || NEW.user_id);
+        END;
+
+        -- Title matches count most, then category, then guide text; owner never affects rank
+        INSERT INTO tasks_fts (tasks_fts, rank) VALUES ('rank', 'bm25(10.0, 2.0, 1.0, 0.0)');
+        INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild');
+    ''')
+
+
+# --- Version 6: when each user's data last changed ---
+def _v6_data_version_timestamp(db):
+    """
+    Adds user_data_version.updated_at (UTC, set by task_stats.bump_data_version),
+    used as the Last-Modified of cached pages. Existing rows stay NULL until the
+    user's next write.
+    """
+    if 'updated_at' not in _columns(db, 'user_data_version'):
+        db.execute('ALTER TABLE user_data_version ADD COLUMN updated_at TEXT')
+
+
+# --- Version 7: due-date reminders ---
+def _v7_reminders(db):
+    """
+    Support for the reminder worker (reminders.py):
+      - tasks.reminded_for: the due date a reminder was last sent for, so each
+        occurrence is reminded once (a new due date means a new reminder)
+      - idx_tasks_pending_due: pending dated tasks in due-date order across all users,
+        so the worker reads just the days it is scheduling, never the whole table
+      - reminder_outbox: messages waiting for a mailer (the outbox sink)
+    """
+    if 'reminded_for' not in _columns(db, 'tasks'):
+        db.execute('ALTER TABLE tasks ADD COLUMN reminded_for TEXT')
+    _run_script(db, '''
+        CREATE INDEX IF NOT EXISTS idx_tasks_pending_due
+            ON tasks (due_date) WHERE completed = 0 AND due_date IS NOT NULL;
+
+        CREATE TABLE IF NOT EXISTS reminder_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            task_id INTEGER,
+            due_date TEXT NOT NULL,
+            message TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            sent_at TEXT, -- Set by whatever delivers the message
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+            FOREIGN KEY (task_id) REFERENCES tasks (id) ON DELETE SET NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_reminder_outbox_unsent
+            ON reminder_outbox (id) WHERE sent_at IS NULL;
+        -- Deleting a task looks up its outbox rows (ON DELETE SET NULL)
+        CREATE INDEX IF NOT EXISTS idx_reminder_outbox_task ON reminder_outbox (task_id);
+    ''')
+
+
+def _v8_sessions(db):
+    """
+    Server-side sessions (sessions.py, SESSION_BACKEND = 'sqlite'). The cookie holds
+    only the opaque id; rows past expires_at (unix seconds) are deleted by compaction.
+    """
+    _run_script(db, '''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            expires_at INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at);
+    ''')
+
+
+# --- Version 9: typed task columns ---
+V9_BATCH_SIZE = 1000 # Tasks converted per UPDATE batch
+
+def _v9_convert(row):
+    """Parses one task's legacy text values. Anything unreadable is kept in the guide."""
+    notes = []
+
+    def parsed(parser, value, label):
+        try:
+            return parser(value)
+        except ValueError:
+            notes.append(f"{label}: {value}")
+            return None
+
+    due_date = parsed(task_fields.parse_due_date, row['due_date'], 'Due')
+    next_due = parsed(task_fields.parse_due_date, row['next_due_date'], 'Next due')
+    cost_cents = parsed(task_fields.parse_cost_cents, row['cost'], 'Cost')
+    minutes = parsed(task_fields.parse_minutes, row['estimated_time'], 'Estimated time')
+    guide = row['guide']
+    if notes:
+        guide = '\n'.join(filter(None, [guide, *notes]))
+    return (task_fields.normalize_category(row['category']), due_date, next_due,
+            cost_cents, minutes, guide, row['id'])
+
+def _v9_typed_columns(db):
+    """
+    Stores task values as types the database can sort and add up:
+      - categories: a lookup table; tasks.category (repeated text) becomes category_id
+      - tasks.cost (REAL, or '' from empty form fields) becomes cost_cents INTEGER
+      - tasks.estimated_time (prose such as '2 hours') becomes estimated_minutes INTEGER
+      - due_date / next_due_date are normalized to ISO 'YYYY-MM-DD' text
+    Values that can't be parsed are appended to the task's guide rather than lost.
+    task_summary is rebuilt keyed by category_id with integer cents, and the search
+    view, FTS and summary triggers are recreated against the new columns.
+    """
+    _run_script(db, '''
+        DROP TRIGGER IF EXISTS trg_task_summary_insert;
+        DROP TRIGGER IF EXISTS trg_task_summary_delete;
+        DROP TRIGGER IF EXISTS trg_task_summary_update;
+        DROP TRIGGER IF EXISTS trg_tasks_fts_insert;
+        DROP TRIGGER IF EXISTS trg_tasks_fts_delete;
+        DROP TRIGGER IF EXISTS trg_tasks_fts_update;
+        DROP VIEW IF EXISTS tasks_search_source;
+
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE COLLATE NOCASE
+        );
+    ''')
+    existing = _columns(db, 'tasks')
+    for column, column_type in (('category_id', 'INTEGER REFERENCES categories (id)'),
+                                ('cost_cents', 'INTEGER'), ('estimated_minutes', 'INTEGER')):
+        if column not in existing:
+            db.execute(f'ALTER TABLE tasks ADD COLUMN {column} {column_type}')
+
+    if 'category' in existing:
+        last_id = 0
+        while True:
+            rows = db.execute(
+                'SELECT id, category, due_date, next_due_date, cost, estimated_time, guide '
+                'FROM tasks WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, V9_BATCH_SIZE)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            converted = [_v9_convert(dict(zip(
+                ('id', 'category', 'due_date', 'next_due_date', 'cost', 'estimated_time', 'guide'), row)))
+                for row in rows]
+            task_fields.ensure_categories(db, (values[0] for values in converted))
+            db.executemany(
+                f'''UPDATE tasks SET category_id = {task_fields.CATEGORY_ID_SQL}, due_date = ?,
+                       next_due_date = ?, cost_cents = ?, estimated_minutes = ?, guide = ?
+                   WHERE id = ?''',
+                converted
+            )
+        for column in ('category', 'cost', 'estimated_time'):
+            db.execute(f'ALTER TABLE tasks DROP COLUMN {column}')
+
+    _run_script(db, '''
+        CREATE INDEX IF NOT EXISTS idx_tasks_user_category ON tasks (user_id, category_id);
+
+        -- category_id 0 is the "Uncategorized" bucket (the primary key can't hold NULL)
+        DROP TABLE IF EXISTS task_summary;
+        CREATE TABLE task_summary (
+            user_id     INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            completed   INTEGER NOT NULL,
+            task_count  INTEGER NOT NULL DEFAULT 0,
+            cost_cents  INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, category_id, completed),
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        ) WITHOUT ROWID;
+
+        CREATE TRIGGER trg_task_summary_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO task_summary (user_id, category_id, completed, task_count, cost_cents)
+            VALUES (NEW.user_id, COALESCE(NEW.category_id, 0), NEW.completed, 1, COALESCE(NEW.cost_cents, 0))
+            ON CONFLICT (user_id, category_id, completed) DO UPDATE SET
+                task_count = task_count + 1,
+                cost_cents = cost_cents + excluded.cost_cents;
+        END;
+
+        CREATE TRIGGER trg_task_summary_delete AFTER DELETE ON tasks
+        BEGIN
+            UPDATE task_summary SET
+                task_count = task_count - 1,
+                cost_cents = cost_cents - COALESCE(OLD.cost_cents, 0)
+            WHERE user_id = OLD.user_id AND category_id = COALESCE(OLD.category_id, 0)
+              AND completed = OLD.completed;
+            DELETE FROM task_summary WHERE user_id = OLD.user_id AND task_count <= 0;
+        END;
+
+        CREATE TRIGGER trg_task_summary_update
+        AFTER UPDATE OF user_id, category_id, completed, cost_cents ON tasks
+        BEGIN
+            UPDATE task_summary SET
+                task_count = task_count - 1,
+                cost_cents = cost_cents - COALESCE(OLD.cost_cents, 0)
+            WHERE user_id = OLD.user_id AND category_id = COALESCE(OLD.category_id, 0)
+              AND completed = OLD.completed;
+            INSERT INTO task_summary (user_id, category_id, completed, task_count, cost_cents)
+            VALUES (NEW.user_id, COALESCE(NEW.category_id, 0), NEW.completed, 1, COALESCE(NEW.cost_cents, 0))
+            ON CONFLICT (user_id, category_id, completed) DO UPDATE SET
+                task_count = task_count + 1,
+                cost_cents = cost_cents + excluded.cost_cents;
+            DELETE FROM task_summary WHERE user_id = OLD.user_id AND task_count <= 0;
+        END;
+
+        INSERT INTO task_summary (user_id, category_id, completed, task_count, cost_cents)
+        SELECT user_id, COALESCE(category_id, 0), completed, COUNT(*), COALESCE(SUM(cost_cents), 0)
+        FROM tasks
+        GROUP BY user_id, COALESCE(category_id, 0), completed;
+
+        -- Search still indexes the category name, read through the lookup table
+        CREATE VIEW tasks_search_source AS
+            SELECT t.id, t.title, c.name AS category, t.guide, 'u' || t.user_id AS owner
+            FROM tasks t LEFT JOIN categories c ON c.id = t.category_id;
+
+        CREATE TRIGGER trg_tasks_fts_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (rowid, title, category, guide, owner)
+            VALUES (NEW.id, NEW.title, (SELECT name FROM categories WHERE id = NEW.category_id),
+                    NEW.guide, 'u' || NEW.user_id);
+        END;
+
+        CREATE TRIGGER trg_tasks_fts_delete AFTER DELETE ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, category, guide, owner)
+            VALUES ('delete', OLD.id, OLD.title, (SELECT name FROM categories WHERE id = OLD.category_id),
+                    OLD.guide, 'u' || OLD.user_id);
+        END;
+
+        CREATE TRIGGER trg_tasks_fts_update AFTER UPDATE OF title, category_id, guide, user_id ON tasks
+        BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, category, guide, owner)
+            VALUES ('delete', OLD.id, OLD.title, (SELECT name FROM categories WHERE id = OLD.category_id),
+                    OLD.guide, 'u' || OLD.user_id);
+            INSERT INTO tasks_fts (rowid, title, category, guide, owner)
+            VALUES (NEW.id, NEW.title, (SELECT name FROM categories WHERE id = NEW.category_id),
+                    NEW.guide, 'u' || NEW.user_id);
+        END;
+
+        -- The guide may have gained notes above; reindex from the new view
+        INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild');
+    ''')
+
+
+# --- Version 10: calendar window indexes ---
+def _v10_calendar(db):
+    """
+    Indexes for the calendar (task_calendar.py):
+      - idx_tasks_user_due: a user's tasks in a date window, done or not, already in
+        (due_date, title) order
+      - idx_tasks_user_recurring: just a user's recurring tasks, whose future
+        occurrences are projected into the window
+    """
+    _run_script(db, '''
+        CREATE INDEX IF NOT EXISTS idx_tasks_user_due ON tasks (user_id, due_date, title);
+        CREATE INDEX IF NOT EXISTS idx_tasks_user_recurring
+            ON tasks (user_id) WHERE recur_unit IS NOT NULL;
+    ''')
+
+
+# --- Version 11: shard directory ---
+def _v11_shards(db):
+    """
+    shard_directory maps each user to the database file holding their tasks (see
+    shards.py). It is only read on DATABASE; on other shard files it stays empty.
+    Users without a row are on shard 0, so existing databases need no backfill.
+    """
+    _run_script(db, '''
+        CREATE TABLE IF NOT EXISTS shard_directory (
+            user_id INTEGER PRIMARY KEY,
+            shard INTEGER NOT NULL,
+            moved_at TEXT
+        );
+    ''')
+
+
+# --- Version 12: change log for the analytics export ---
+def _v12_change_log(db):
+    """
+    task_changes holds one row per task changed since the last `flask export-analytics`
+    (see analytics_export.py): its id and a change counter, bumped by triggers on
+    insert, delete and any update of an exported column. The export rewrites only the
+    files holding those ids, then removes the rows it has handled. Existing databases
+    need no backfill: the first export into a new directory reads every task.
+    """
+    _run_script(db, '''
+        CREATE TABLE IF NOT EXISTS task_changes (
+            task_id INTEGER PRIMARY KEY,
+            seq     INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_task_changes_seq ON task_changes (seq);
+
+        DROP TRIGGER IF EXISTS trg_task_changes_insert;
+        CREATE TRIGGER trg_task_changes_insert AFTER INSERT ON tasks
+        BEGIN
+            INSERT INTO task_changes (task_id, seq)
+            VALUES (NEW.id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM task_changes))
+            ON CONFLICT (task_id) DO UPDATE SET seq = excluded.seq;
+        END;
+
+        DROP TRIGGER IF EXISTS trg_task_changes_delete;
+        CREATE TRIGGER trg_task_changes_delete AFTER DELETE ON tasks
+        BEGIN
+            INSERT INTO task_changes (task_id, seq)
+            VALUES (OLD.id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM task_changes))
+            ON CONFLICT (task_id) DO UPDATE SET seq = excluded.seq;
+        END;
+
+        DROP TRIGGER IF EXISTS trg_task_changes_update;
+        CREATE TRIGGER trg_task_changes_update
+        AFTER UPDATE OF user_id, category_id, due_date, completed, cost_cents, estimated_minutes,
+                        recur_unit ON tasks
+        BEGIN
+            INSERT INTO task_changes (task_id, seq)
+            VALUES (NEW.id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM task_changes))
+            ON CONFLICT (task_id) DO UPDATE SET seq = excluded.seq;
+        END;
+    ''')
+
+
+# --- Version 13: fence users who moved to another shard ---
+def _v13_moved_users(db):
+    """
+    moved_users lists the users who have moved off this database file (see
+    shards.move_user, which adds the row in the same transaction that deletes their
+    tasks here). A request that looked up the user's shard before the move would
+    otherwise still add tasks to this file, where the user no longer reads them; the
+    trigger makes that insert fail instead, and run_write retries it on the new shard.
+    Moving a user back removes the row.
+    """
+    _run_script(db, '''
+        CREATE TABLE IF NOT EXISTS moved_users (
+            user_id  INTEGER PRIMARY KEY,
+            moved_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+
+        DROP TRIGGER IF EXISTS trg_tasks_moved_user;
+        CREATE TRIGGER trg_tasks_moved_user BEFORE INSERT ON tasks
+        WHEN EXISTS (SELECT 1 FROM moved_users WHERE user_id = NEW.user_id)
+        BEGIN
+            SELECT RAISE(ABORT, 'user moved to another shard');
+        END;
+    ''')
+
+
+# (version, description, function) - append only
+MIGRATIONS = [
+    (1, 'Reconcile original schemas (password_hash, created_timestamp)', _v1_baseline),
+    (2, 'Recurrence columns and task_completions history', _v2_recurrence),
+    (3, 'task_summary counters and user_data_version', _v3_summary),
+    (4, 'Composite indexes for dashboard queries', _v4_indexes),
+    (5, 'Full-text search index (FTS5) over tasks', _v5_search),
+    (6, 'user_data_version.updated_at for Last-Modified', _v6_data_version_timestamp),
+    (7, 'Reminder tracking, pending-by-due-date index and reminder_outbox', _v7_reminders),
+    (8, 'Server-side sessions table', _v8_sessions),
+    (9, 'Typed task columns: categories lookup, cost in cents, minutes', _v9_typed_columns),
+    (10, 'Calendar indexes: tasks by user and due date, recurring tasks', _v10_calendar),
+    (11, 'Shard directory (user -> database file)', _v11_shards),
+    (12, 'task_changes log for the incremental analytics export', _v12_change_log),
+    (13, 'moved_users fence for users moved to another shard', _v13_moved_users),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(db):
+    return db.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(db, log=print):
+    """
+    Applies all pending migrations to the connection's database, then refreshes the
+    query planner statistics. Returns the list of versions applied.
+    """
+    applied = []
+    current = get_version(db)
+    if db.in_transaction:
+        db.commit()
+
+    for version, description, function in MIGRATIONS:
+        if version <= current:
+            continue
+        log(f"Applying migration {version}: {description}...")
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            function(db)
+            db.execute(f'PRAGMA user_version = {int(version)}')
+            db.commit()
+        except Exception:
+            db.rollback()
+            log(f" -> Migration {version} failed; database left at version {get_version(db)}.")
+            raise
+        applied.append(version)
+        log(f" -> Now at version {version}.")
+
+    if applied:
+        # Fresh statistics so the planner picks the new indexes
+        db.execute('ANALYZE')
+    db.execute('PRAGMA optimize')
+    return applied
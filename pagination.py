@@ -0,0 +1,93 @@
+# --- Imports ---
+import base64
+import json
+
+from task_fields import select_columns
+
+# --- Task List Pagination (dashboard and JSON API) ---
+# Task lists use keyset ("cursor") pagination instead of OFFSET so that
+# page N costs the same as page 1: each page continues strictly after the
+# sort key of the last row shown, which the (user_id, completed, ...) indexes can seek to.
+DASHBOARD_PAGE_SIZE = 50
+
+# Only the columns the list templates actually render (the big `guide` text stays on disk)
+DASHBOARD_COLUMNS = {
+    'incomplete': select_columns(('id', 'title', 'category', 'due_date')),
+    'completed': select_columns(('id', 'title', 'category', 'next_due_date')),
+}
+
+# Columns each view's cursor is built from; they must be among the selected columns
+SORT_COLUMNS = {
+    'incomplete': ('due_date', 'title', 'id'),
+    'completed': ('title', 'id'),
+}
+
+def encode_cursor(values):
+    """Packs the sort key of the last row on a page into an opaque URL-safe token."""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """Reverses encode_cursor(). Returns None for a missing or malformed token."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return values if isinstance(values, list) else None
+
+def build_task_page_query(user_id, view, cursor=None, limit=DASHBOARD_PAGE_SIZE, columns=None, filters=()):
+    """
+    Builds the SQL and parameters for one page of a user's tasks in the given view.
+    Incomplete tasks are keyed on (due_date, title, id), completed ones on (title, id),
+    matching the idx_tasks_user_status_* indexes so no sort step is needed.
+    `columns` defaults to DASHBOARD_COLUMNS[view]; `filters` is a list of extra
+    (sql_condition, params) pairs ANDed into the WHERE clause.
+    """
+    params = [user_id, 1 if view == 'completed' else 0]
+    keyset = ''
+    if view == 'completed':
+        if cursor and len(cursor) == 2:
+            keyset = 'AND (title, id) > (?, ?)'
+            params += cursor
+        order_by = 'title ASC, id ASC'
+    else:
+        if cursor and len(cursor) == 3:
+            due_date, title, task_id = cursor
+            # SQLite sorts NULL due dates first, so a NULL cursor still has every dated task ahead of it
+            if due_date is None:
+                keyset = 'AND ((due_date IS NULL AND (title, id) > (?, ?)) OR due_date IS NOT NULL)'
+                params += [title, task_id]
+            else:
+                keyset = 'AND (due_date > ? OR (due_date = ? AND (title, id) > (?, ?)))'
+                params += [due_date, due_date, title, task_id]
+        order_by = 'due_date ASC, title ASC, id ASC'
+
+    extra = ''
+    for condition, condition_params in filters:
+        extra += f' AND {condition}'
+        params += condition_params
+
+    # Ask for one extra row to find out whether another page exists
+    params.append(limit + 1)
+    sql = (f'SELECT {columns or DASHBOARD_COLUMNS[view]} FROM tasks '
+           f'WHERE user_id = ? AND completed = ? {keyset}{extra} '
+           f'ORDER BY {order_by} LIMIT ?')
+    return sql, params
+
+def fetch_task_page(db, user_id, view, cursor=None, limit=DASHBOARD_PAGE_SIZE, columns=None, filters=()):
+    """
+    Fetches one page of a user's tasks for the given view.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    sql, params = build_task_page_query(user_id, view, cursor, limit, columns, filters)
+    rows = db.execute(sql, params).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last[column] for column in SORT_COLUMNS[view]])
+    return rows, next_cursor
@@ -0,0 +1,120 @@
+# --- Imports ---
+import calendar
+import re
+from datetime import date, timedelta
+
+# --- Normalized Intervals ---
+# Every recurring task is stored as (recur_unit, recur_every) where the unit is either
+# 'day' or 'month'. Weeks become multiples of 7 days and years multiples of 12 months,
+# so there are only two date-math cases to get right.
+DAY = 'day'
+MONTH = 'month'
+
+# Known frequency labels (lower-cased). None means "does not repeat".
+FREQUENCY_ALIASES = {
+    'one-time': None, 'one time': None, 'once': None, 'as needed': None,
+    'none': None, 'never': None,
+    'daily': (DAY, 1),
+    'weekly': (DAY, 7),
+    'biweekly': (DAY, 14), 'bi-weekly': (DAY, 14), 'fortnightly': (DAY, 14),
+    'monthly': (MONTH, 1),
+    'bimonthly': (MONTH, 2), 'bi-monthly': (MONTH, 2),
+    'quarterly': (MONTH, 3),
+    'semiannually': (MONTH, 6), 'semi-annually': (MONTH, 6), 'semiannual': (MONTH, 6),
+    'semi-annual': (MONTH, 6), 'twice a year': (MONTH, 6),
+    'annually': (MONTH, 12), 'annual': (MONTH, 12), 'yearly': (MONTH, 12),
+}
+
+# "every 3 months", "every week", "2 weeks", "every 10 days"
+_EVERY_PATTERN = re.compile(r'^(?:every\s+)?(\d+)?\s*(day|week|month|year)s?$')
+_UNIT_FACTORS = {'day': (DAY, 1), 'week': (DAY, 7), 'month': (MONTH, 1), 'year': (MONTH, 12)}
+
+
+def parse_frequency(text):
+    """
+    Turns a free-text frequency into (unit, every), or None if it doesn't repeat
+    or can't be understood.
+      parse_frequency('Monthly')         -> ('month', 1)
+      parse_frequency('every 2 weeks')   -> ('day', 14)
+      parse_frequency('As Needed')       -> None
+    """
+    if not text:
+        return None
+    key = ' '.join(str(text).strip().lower().split())
+    if key in FREQUENCY_ALIASES:
+        return FREQUENCY_ALIASES[key]
+    match = _EVERY_PATTERN.match(key)
+    if not match:
+        return None
+    count = int(match.group(1) or 1)
+    if count <= 0:
+        return None
+    unit, factor = _UNIT_FACTORS[match.group(2)]
+    return unit, count * factor
+
+
+def add_interval(start, unit, every):
+    """Adds `every` days or months to `start`, clamping to the end of shorter months."""
+    if unit == DAY:
+        return start + timedelta(days=every)
+    month_index = start.month - 1 + every
+    year = start.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(start.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+
+def parse_iso_date(value):
+    """Returns a date for a YYYY-MM-DD string, or None if it is empty/invalid."""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def next_due_date(due_date, unit, every, today=None):
+    """
+    Next occurrence after a task is completed `today`.
+    Completing early keeps the schedule (due date + interval); completing late
+    (or a task with no due date) restarts the interval from today.
+    """
+    today = today or date.today()
+    due = parse_iso_date(due_date)
+    base = due if due and due > today else today
+    return add_interval(base, unit, every)
+
+
+def occurrences(first, unit, every, start, end):
+    """
+    Lazily yields the dates of a schedule that begins on `first` and repeats every
+    `every` units, limited to start..end (inclusive). Day schedules jump straight to
+    the window; month schedules step like completing on time does (add_interval from
+    the previous date), so a date clamped to a short month stays clamped.
+    """
+    if not every or every <= 0 or first > end:
+        return
+    current = first
+    if unit == DAY and current < start:
+        steps = -(-(start - current).days // every) # ceil
+        current += timedelta(days=steps * every)
+    while current <= end:
+        if current >= start:
+            yield current
+        current = add_interval(current, unit, every)
+
+
+# --- Schema Support ---
+def backfill_recurrence(db):
+    """Parses every distinct frequency already stored and fills recur_unit/recur_every (used by migrations)."""
+    frequencies = [row[0] for row in db.execute(
+        'SELECT DISTINCT frequency FROM tasks WHERE frequency IS NOT NULL'
+    )]
+    for frequency in frequencies:
+        interval = parse_frequency(frequency)
+        unit, every = interval if interval else (None, None)
+        db.execute(
+            'UPDATE tasks SET recur_unit = ?, recur_every = ? WHERE frequency = ?',
+            (unit, every, frequency)
+        )
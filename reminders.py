@@ -0,0 +1,198 @@
+# --- Imports ---
+import heapq
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+import recurrence
+import task_stats
+
+# --- Default Reminder Settings (override via app.config / CLI options) ---
+DEFAULT_REMIND_HOUR = 8         # Local hour a reminder goes out on the day it is due
+DEFAULT_LEAD_DAYS = 0           # Remind this many days before the due date
+DEFAULT_HORIZON_DAYS = 7        # How far ahead the queue is loaded
+DEFAULT_CATCHUP_DAYS = 7        # Overdue tasks older than this are not reminded (no backlog floods)
+DEFAULT_RELOAD_SECONDS = 300    # Re-read the window this often to pick up new/edited tasks
+LOAD_CHUNK_SIZE = 1000          # Rows per keyset page while loading the window
+
+Reminder = namedtuple('Reminder', 'remind_at task_id user_id username title due_date')
+
+# Pending dated tasks whose due date falls in [start, end], in due-date order.
+# Walks idx_tasks_pending_due (partial index), so the cost is the number of tasks
+# in the window, not the size of the table. Keyset-paged on (due_date, id).
+WINDOW_SQL = '''
+    SELECT t.id, t.user_id, u.username, t.title, t.due_date
+    FROM tasks t JOIN users u ON u.id = t.user_id
+    WHERE t.completed = 0 AND t.due_date IS NOT NULL
+      AND (t.due_date, t.id) > (?, ?) AND t.due_date <= ?
+      AND t.reminded_for IS NOT t.due_date
+    ORDER BY t.due_date, t.id
+    LIMIT ?'''
+
+# Marks a reminder as sent only if the task is still pending and still due that day,
+# so edits/completions made after the queue was loaded are respected.
+CLAIM_SQL = '''
+    UPDATE tasks SET reminded_for = due_date
+    WHERE id = ? AND completed = 0 AND due_date = ? AND reminded_for IS NOT due_date'''
+
+
+def format_message(reminder, today=None):
+    """Plain-text reminder, e.g. 'Hi demo, your FixMate task "Clean gutters" is due today (2025-06-01).'"""
+    today = today or date.today()
+    due = date.fromisoformat(reminder.due_date)
+    if due < today:
+        when = f"was due {reminder.due_date}"
+    elif due == today:
+        when = f"is due today ({reminder.due_date})"
+    else:
+        when = f"is due {reminder.due_date}"
+    return f"Hi {reminder.username}, your FixMate task \"{reminder.title}\" {when}."
+
+
+# --- Sinks (where reminders are delivered) ---
+class ReminderSink(ABC):
+    """Interface: send() delivers one reminder or raises. `db` is the worker's connection."""
+
+    @abstractmethod
+    def send(self, db, reminder, message):
+        pass
+
+
+class OutboxSink(ReminderSink):
+    """
+    Queues the message in the reminder_outbox table, in the same transaction as
+    the claim. A mailer (not part of FixMate yet) would send rows where sent_at IS NULL.
+    """
+
+    def send(self, db, reminder, message):
+        db.execute(
+            'INSERT INTO reminder_outbox (user_id, task_id, due_date, message) VALUES (?, ?, ?, ?)',
+            (reminder.user_id, reminder.task_id, reminder.due_date, message)
+        )
+
+
+class FileSink(ReminderSink):
+    """Appends one JSON line per reminder to a local file (handy for development)."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, db, reminder, message):
+        record = {
+            'user_id': reminder.user_id, 'username': reminder.username, 'task_id': reminder.task_id,
+            'title': reminder.title, 'due_date': reminder.due_date, 'message': message,
+            'sent_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+# --- Scheduler ---
+class ReminderScheduler:
+    """
+    Keeps a min-heap of upcoming reminders ordered by the time they are due to go
+    out, loaded from the pending-by-due-date index for a limited window of days.
+    run_forever() sleeps until the earliest reminder (or the next reload) instead of
+    polling, then claims and delivers everything that is due.
+    """
+
+    def __init__(self, db, sink, remind_hour=DEFAULT_REMIND_HOUR, lead_days=DEFAULT_LEAD_DAYS,
+                 horizon_days=DEFAULT_HORIZON_DAYS, catchup_days=DEFAULT_CATCHUP_DAYS,
+                 reload_seconds=DEFAULT_RELOAD_SECONDS, log=print, clock=datetime.now):
+        self.db = db
+        self.sink = sink
+        self.remind_hour = remind_hour
+        self.lead_days = lead_days
+        self.horizon_days = horizon_days
+        self.catchup_days = catchup_days
+        self.reload_seconds = reload_seconds
+        self.log = log
+        self.clock = clock
+        self._heap = []
+        self._next_reload = 0.0
+        self._stop = threading.Event()
+
+    def remind_at(self, due_date):
+        """When the reminder for a task due on `due_date` (a date) should go out."""
+        day = due_date - timedelta(days=self.lead_days)
+        return datetime(day.year, day.month, day.day, self.remind_hour)
+
+    def load(self):
+        """Rebuilds the heap from the tasks due between the catch-up date and the horizon."""
+        today = self.clock().date()
+        start = (today - timedelta(days=self.catchup_days)).isoformat()
+        end = (today + timedelta(days=self.lead_days + self.horizon_days)).isoformat()
+        heap = []
+        # Start strictly after (start, 0): ids are >= 1, so tasks due on `start` are included
+        last = (start, 0)
+        while True:
+            rows = self.db.execute(WINDOW_SQL, (*last, end, LOAD_CHUNK_SIZE)).fetchall()
+            for task_id, user_id, username, title, due_date in rows:
+                due = recurrence.parse_iso_date(due_date)
+                if due is None:
+                    continue # Not a YYYY-MM-DD date (very old rows); nothing to schedule
+                heap.append(Reminder(self.remind_at(due), task_id, user_id, username, title, due_date))
+            if len(rows) < LOAD_CHUNK_SIZE:
+                break
+            last = (rows[-1][4], rows[-1][0])
+        heapq.heapify(heap)
+        self._heap = heap
+        self._next_reload = time.monotonic() + self.reload_seconds
+        return len(heap)
+
+    def next_wakeup(self):
+        """Seconds until the earliest reminder or the next reload, whichever is sooner."""
+        until_reload = max(0.0, self._next_reload - time.monotonic())
+        if not self._heap:
+            return until_reload
+        until_due = (self._heap[0].remind_at - self.clock()).total_seconds()
+        return max(0.0, min(until_due, until_reload))
+
+    def deliver_due(self):
+        """Claims and sends every reminder whose time has come. Returns the number sent."""
+        now = self.clock()
+        today = now.date()
+        sent = 0
+        while self._heap and self._heap[0].remind_at <= now:
+            reminder = heapq.heappop(self._heap)
+            try:
+                if not self.db.execute(CLAIM_SQL, (reminder.task_id, reminder.due_date)).rowcount:
+                    continue # Completed, rescheduled or already reminded since it was loaded
+                # A changed task: a shard move copying this user now starts over (see shards.move_user)
+                task_stats.bump_data_version(self.db, reminder.user_id)
+                self.sink.send(self.db, reminder, format_message(reminder, today))
+                self.db.commit()
+                sent += 1
+            except (sqlite3.Error, OSError) as e:
+                self.db.rollback() # Not marked as sent, so the next reload queues it again
+                self.log(f"Reminder for task {reminder.task_id} failed: {e}")
+        return sent
+
+    def run_once(self):
+        """Loads the window and sends whatever is due now (for cron). Returns the number sent."""
+        self.load()
+        return self.deliver_due()
+
+    def run_forever(self):
+        """Main loop; returns after stop() is called."""
+        self.log(f"Reminder worker started: {self.load()} reminder(s) queued.")
+        while not self._stop.is_set():
+            sent = self.deliver_due()
+            if sent:
+                self.log(f"Sent {sent} reminder(s).")
+            if time.monotonic() >= self._next_reload:
+                self.load()
+            self._stop.wait(self.next_wakeup())
+
+    def start(self):
+        """Runs the loop on a daemon thread (one worker per database, not per web process)."""
+        thread = threading.Thread(target=self.run_forever, name='fixmate-reminders', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
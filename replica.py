@@ -0,0 +1,126 @@
+# --- Imports ---
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.request import pathname2url
+
+from flask import current_app
+
+from db import get_db, shard_paths, user_shard
+
+# --- Default Replica Settings (override via app.config / CLI options) ---
+DEFAULT_PAGES_PER_STEP = 1024 # Pages copied per backup step (4 MB at SQLite's default page size)
+DEFAULT_STEP_PAUSE_MS = 0     # Pause between steps, to leave the live file's writers more room
+DEFAULT_MAX_AGE = 3600        # Seconds; an older snapshot is ignored and the live file is read
+REPLICA_SUFFIX = '.replica'
+
+# --- Read Replica Snapshots ---
+# `flask refresh-replica` copies each database file to fixmate.replica.db (fixmate.shard1.replica.db,
+# ...) with SQLite's online backup API, a batch of pages at a time, so reporting can read a
+# snapshot instead of the file the app is writing. The copy is built next to the replica and
+# renamed over it when complete, so the replica file itself is never written: readers open it
+# read-only and immutable (no locks, no WAL) and always see one whole snapshot, and a reader
+# still holding the previous file keeps reading that one until it closes.
+
+def replica_path(path):
+    """'fixmate.db' -> 'fixmate.replica.db' (next to the live file)."""
+    root, ext = os.path.splitext(path)
+    return f"{root}{REPLICA_SUFFIX}{ext or '.db'}"
+
+def is_replica(path):
+    return os.path.splitext(path)[0].endswith(REPLICA_SUFFIX)
+
+def refresh(source, dest, pages=DEFAULT_PAGES_PER_STEP, pause_ms=DEFAULT_STEP_PAUSE_MS, busy_timeout_ms=5000):
+    """
+    Snapshots the database at `source` into `dest` and returns (pages copied, seconds taken).
+    The live file is only read, `pages` at a time, from one snapshot, so the replica matches the
+    database as of the start of the copy however many writes commit meanwhile.
+    """
+    started = time.perf_counter()
+    building = f"{dest}.tmp"
+    if os.path.exists(building):
+        os.remove(building) # Left over from an interrupted refresh
+    copied = []
+
+    def progress(status, remaining, total):
+        copied[:] = [total]
+        if pause_ms:
+            time.sleep(pause_ms / 1000)
+
+    src = sqlite3.connect(source, timeout=busy_timeout_ms / 1000)
+    dst = sqlite3.connect(building)
+    try:
+        # One read transaction for the whole copy: every step reads the same WAL snapshot, so
+        # commits made meanwhile neither block the copy nor make SQLite restart it
+        src.execute('BEGIN')
+        src.execute('SELECT 1 FROM sqlite_master LIMIT 1')
+        taken_at = time.time()
+        src.backup(dst, pages=pages, progress=progress)
+        # The copy inherits WAL mode from the live file; a file that is never written doesn't need it
+        dst.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        dst.close()
+        src.close()
+    os.utime(building, (taken_at, taken_at)) # The file's mtime records when the snapshot was taken
+    os.replace(building, dest)
+    return (copied[0] if copied else 0), time.perf_counter() - started
+
+def snapshot_time(path):
+    """When the replica at `path` was taken (UTC datetime), or None if there is none."""
+    try:
+        return datetime.fromtimestamp(os.path.getmtime(path), timezone.utc)
+    except OSError:
+        return None
+
+def fresh_replica(path, max_age=DEFAULT_MAX_AGE):
+    """(replica path, snapshot time) for the live file `path`, or (None, None) if missing or older than max_age."""
+    snapshot = replica_path(path)
+    taken_at = snapshot_time(snapshot)
+    if taken_at is None or (datetime.now(timezone.utc) - taken_at).total_seconds() > max_age:
+        return None, None
+    return snapshot, taken_at
+
+@contextmanager
+def replica_connection(path):
+    """A read-only connection to the replica file `path`, closed afterwards."""
+    uri = f"file:{pathname2url(os.path.abspath(path))}?mode=ro&immutable=1"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+# --- Flask Integration ---
+@contextmanager
+def analytics_db(user_id):
+    """
+    Yields (db, snapshot time) for reading `user_id`'s analytics: the replica of their shard
+    when ANALYTICS_REPLICA is on and it is fresh enough, else (get_db(user_id), None).
+    """
+    config = current_app.config
+    snapshot, taken_at = None, None
+    if config.get('ANALYTICS_REPLICA', False):
+        snapshot, taken_at = fresh_replica(shard_paths()[user_shard(user_id)],
+                                          config.get('ANALYTICS_REPLICA_MAX_AGE', DEFAULT_MAX_AGE))
+    if snapshot is None:
+        yield get_db(user_id), None
+        return
+    with replica_connection(snapshot) as db:
+        yield db, taken_at
+
+def refresh_all(log=print):
+    """Refreshes the replica of every database file of the current app. Returns the count."""
+    config = current_app.config
+    for shard, path in enumerate(shard_paths()):
+        pages, seconds = refresh(
+            path, replica_path(path),
+            pages=config.get('REPLICA_PAGES_PER_STEP', DEFAULT_PAGES_PER_STEP),
+            pause_ms=config.get('REPLICA_STEP_PAUSE_MS', DEFAULT_STEP_PAUSE_MS),
+            busy_timeout_ms=config.get('DB_BUSY_TIMEOUT_MS', 5000),
+        )
+        log(f"Shard {shard}: copied {pages} page(s) in {seconds:.2f}s to {replica_path(path)}")
+    return len(shard_paths())
@@ -1,22 +1,223 @@
-PRAGMA foreign_keys = ON;
+-- FixMate schema at migration version 13.
+-- Reference only: generated by `python check_schema.py --dump-schema`.
+-- Create/upgrade a database with `flask init-db` (see migrations.py).
 
-CREATE TABLE users (
-  id       INTEGER PRIMARY KEY AUTOINCREMENT,
-  username TEXT    NOT NULL UNIQUE,
-  password TEXT    NOT NULL
+CREATE TABLE categories (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE COLLATE NOCASE
+);
+
+CREATE TABLE moved_users (
+    user_id  INTEGER PRIMARY KEY,
+    moved_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE reminder_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    task_id INTEGER,
+    due_date TEXT NOT NULL,
+    message TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sent_at TEXT, -- Set by whatever delivers the message
+    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+    FOREIGN KEY (task_id) REFERENCES tasks (id) ON DELETE SET NULL
+);
+
+CREATE TABLE sessions (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires_at INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE shard_directory (
+    user_id INTEGER PRIMARY KEY,
+    shard INTEGER NOT NULL,
+    moved_at TEXT
+);
+
+CREATE TABLE task_changes (
+    task_id INTEGER PRIMARY KEY,
+    seq     INTEGER NOT NULL
+);
+
+CREATE TABLE task_completions (
+    id           INTEGER PRIMARY KEY,
+    task_id      INTEGER NOT NULL,
+    due_date     TEXT,
+    completed_on TEXT    NOT NULL,
+    FOREIGN KEY (task_id) REFERENCES tasks (id) ON DELETE CASCADE
 );
 
+CREATE TABLE task_summary (
+    user_id     INTEGER NOT NULL,
+    category_id INTEGER NOT NULL,
+    completed   INTEGER NOT NULL,
+    task_count  INTEGER NOT NULL DEFAULT 0,
+    cost_cents  INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, category_id, completed),
+    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
 CREATE TABLE tasks (
-  id             INTEGER PRIMARY KEY AUTOINCREMENT,
-  user_id        INTEGER NOT NULL,
-  title          TEXT    NOT NULL,
-  category       TEXT,
-  due_date       TEXT,
-  frequency      TEXT,
-  cost           REAL,
-  estimated_time TEXT,
-  guide          TEXT,
-  video_url      TEXT,
-  completed      INTEGER NOT NULL DEFAULT 0,
-  FOREIGN KEY(user_id) REFERENCES users(id)
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    due_date TEXT,
+    frequency TEXT,
+    guide TEXT,
+    video_url TEXT,
+    completed INTEGER DEFAULT 0 CHECK(completed IN (0, 1)),
+    created_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, recur_unit TEXT, recur_every INTEGER, next_due_date TEXT, reminded_for TEXT, category_id INTEGER REFERENCES categories (id), cost_cents INTEGER, estimated_minutes INTEGER,
+    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+);
+
+CREATE VIRTUAL TABLE tasks_fts USING fts5(
+    title, category, guide, owner,
+    content = 'tasks_search_source',
+    content_rowid = 'id',
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+CREATE TABLE 'tasks_fts_config'(k PRIMARY KEY, v) WITHOUT ROWID;
+
+CREATE TABLE 'tasks_fts_data'(id INTEGER PRIMARY KEY, block BLOB);
+
+CREATE TABLE 'tasks_fts_docsize'(id INTEGER PRIMARY KEY, sz BLOB);
+
+CREATE TABLE 'tasks_fts_idx'(segid, term, pgno, PRIMARY KEY(segid, term)) WITHOUT ROWID;
+
+CREATE TABLE user_data_version (
+    user_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0, updated_at TEXT,
+    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+);
+
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password_hash TEXT NOT NULL
 );
+
+CREATE INDEX idx_reminder_outbox_task ON reminder_outbox (task_id);
+
+CREATE INDEX idx_reminder_outbox_unsent
+ON reminder_outbox (id) WHERE sent_at IS NULL;
+
+CREATE INDEX idx_sessions_expires ON sessions (expires_at);
+
+CREATE INDEX idx_task_changes_seq ON task_changes (seq);
+
+CREATE INDEX idx_task_completions_task ON task_completions (task_id, completed_on);
+
+CREATE INDEX idx_tasks_next_due ON tasks (next_due_date) WHERE next_due_date IS NOT NULL;
+
+CREATE INDEX idx_tasks_pending_due
+ON tasks (due_date) WHERE completed = 0 AND due_date IS NOT NULL;
+
+CREATE INDEX idx_tasks_user_category ON tasks (user_id, category_id);
+
+CREATE INDEX idx_tasks_user_due ON tasks (user_id, due_date, title);
+
+CREATE INDEX idx_tasks_user_recurring
+ON tasks (user_id) WHERE recur_unit IS NOT NULL;
+
+CREATE INDEX idx_tasks_user_status_due
+ON tasks (user_id, completed, due_date, title);
+
+CREATE INDEX idx_tasks_user_status_title
+ON tasks (user_id, completed, title);
+
+CREATE VIEW tasks_search_source AS
+SELECT t.id, t.title, c.name AS category, t.guide, 'u' || t.user_id AS owner
+FROM tasks t LEFT JOIN categories c ON c.id = t.category_id;
+
+CREATE TRIGGER trg_task_changes_delete AFTER DELETE ON tasks
+BEGIN
+    INSERT INTO task_changes (task_id, seq)
+    VALUES (OLD.id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM task_changes))
+    ON CONFLICT (task_id) DO UPDATE SET seq = excluded.seq;
+END;
+
+CREATE TRIGGER trg_task_changes_insert AFTER INSERT ON tasks
+BEGIN
+    INSERT INTO task_changes (task_id, seq)
+    VALUES (NEW.id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM task_changes))
+    ON CONFLICT (task_id) DO UPDATE SET seq = excluded.seq;
+END;
+
+CREATE TRIGGER trg_task_changes_update
+AFTER UPDATE OF user_id, category_id, due_date, completed, cost_cents, estimated_minutes,
+                recur_unit ON tasks
+BEGIN
+    INSERT INTO task_changes (task_id, seq)
+    VALUES (NEW.id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM task_changes))
+    ON CONFLICT (task_id) DO UPDATE SET seq = excluded.seq;
+END;
+
+CREATE TRIGGER trg_task_summary_delete AFTER DELETE ON tasks
+BEGIN
+    UPDATE task_summary SET
+        task_count = task_count - 1,
+        cost_cents = cost_cents - COALESCE(OLD.cost_cents, 0)
+    WHERE user_id = OLD.user_id AND category_id = COALESCE(OLD.category_id, 0)
+      AND completed = OLD.completed;
+    DELETE FROM task_summary WHERE user_id = OLD.user_id AND task_count <= 0;
+END;
+
+CREATE TRIGGER trg_task_summary_insert AFTER INSERT ON tasks
+BEGIN
+    INSERT INTO task_summary (user_id, category_id, completed, task_count, cost_cents)
+    VALUES (NEW.user_id, COALESCE(NEW.category_id, 0), NEW.completed, 1, COALESCE(NEW.cost_cents, 0))
+    ON CONFLICT (user_id, category_id, completed) DO UPDATE SET
+        task_count = task_count + 1,
+        cost_cents = cost_cents + excluded.cost_cents;
+END;
+
+CREATE TRIGGER trg_task_summary_update
+AFTER UPDATE OF user_id, category_id, completed, cost_cents ON tasks
+BEGIN
+    UPDATE task_summary SET
+        task_count = task_count - 1,
+        cost_cents = cost_cents - COALESCE(OLD.cost_cents, 0)
+    WHERE user_id = OLD.user_id AND category_id = COALESCE(OLD.category_id, 0)
+      AND completed = OLD.completed;
+    INSERT INTO task_summary (user_id, category_id, completed, task_count, cost_cents)
+    VALUES (NEW.user_id, COALESCE(NEW.category_id, 0), NEW.completed, 1, COALESCE(NEW.cost_cents, 0))
+    ON CONFLICT (user_id, category_id, completed) DO UPDATE SET
+        task_count = task_count + 1,
+        cost_cents = cost_cents + excluded.cost_cents;
+    DELETE FROM task_summary WHERE user_id = OLD.user_id AND task_count <= 0;
+END;
+
+CREATE TRIGGER trg_tasks_fts_delete AFTER DELETE ON tasks
+BEGIN
+    INSERT INTO tasks_fts (tasks_fts, rowid, title, category, guide, owner)
+    VALUES ('delete', OLD.id, OLD.title, (SELECT name FROM categories WHERE id = OLD.category_id),
+            OLD.guide, 'u' || OLD.user_id);
+END;
+
+CREATE TRIGGER trg_tasks_fts_insert AFTER INSERT ON tasks
+BEGIN
+    INSERT INTO tasks_fts (rowid, title, category, guide, owner)
+    VALUES (NEW.id, NEW.title, (SELECT name FROM categories WHERE id = NEW.category_id),
+            NEW.guide, 'u' || NEW.user_id);
+END;
+
+CREATE TRIGGER trg_tasks_fts_update AFTER UPDATE OF title, category_id, guide, user_id ON tasks
+BEGIN
+    INSERT INTO tasks_fts (tasks_fts, rowid, title, category, guide, owner)
+    VALUES ('delete', OLD.id, OLD.title, (SELECT name FROM categories WHERE id = OLD.category_id),
+            OLD.guide, 'u' || OLD.user_id);
+    INSERT INTO tasks_fts (rowid, title, category, guide, owner)
+    VALUES (NEW.id, NEW.title, (SELECT name FROM categories WHERE id = NEW.category_id),
+            NEW.guide, 'u' || NEW.user_id);
+END;
+
+CREATE TRIGGER trg_tasks_moved_user BEFORE INSERT ON tasks
+WHEN EXISTS (SELECT 1 FROM moved_users WHERE user_id = NEW.user_id)
+BEGIN
+    SELECT RAISE(ABORT, 'user moved to another shard');
+END;
+
@@ -0,0 +1,55 @@
+# --- Imports ---
+import re
+
+# --- Settings ---
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGES = 50  # Deep OFFSETs get slower; nobody pages this far through search results
+MAX_QUERY_TERMS = 8
+
+# Words as the unicode61 tokenizer sees them (letters/digits, everything else separates)
+_TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Ranked by the bm25 weights configured on tasks_fts (see migrations.py). The owner
+# filter runs inside the FTS index, so other users' matches are never touched.
+SEARCH_SQL = '''
+    SELECT t.id, t.title, (SELECT name FROM categories c WHERE c.id = t.category_id) AS category,
+           t.due_date, t.completed,
+           snippet(tasks_fts, 2, '[', ']', '…', 12) AS guide_snippet
+    FROM tasks_fts
+    JOIN tasks t ON t.id = tasks_fts.rowid
+    WHERE tasks_fts MATCH ?
+    ORDER BY rank
+    LIMIT ? OFFSET ?
+'''
+
+
+def build_match_query(text, user_id):
+    """
+    Turns free text typed by a user into a safe FTS5 MATCH expression:
+    every word becomes a quoted prefix term (so 'filt hva' finds 'filter' + 'HVAC'),
+    all terms must match, and results are restricted to the user's own tasks.
+    Returns None when the text contains no searchable words.
+    """
+    terms = _TERM_PATTERN.findall(text or '')[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    # Quoting neutralizes FTS5 syntax (AND/OR/NEAR, column filters, *, ^ ...)
+    words = ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+    # The words only look at the text columns; left unrestricted, 'u2' would match the owner token
+    return f'owner : "u{int(user_id)}" AND {{title category guide}} : ({words})'
+
+
+def search_tasks(db, user_id, text, page=1, per_page=SEARCH_PAGE_SIZE):
+    """
+    Returns (rows, has_more) for one page of ranked search results.
+    Rows have id, title, category, due_date, completed and a guide_snippet with the
+    matching words wrapped in [brackets].
+    """
+    match = build_match_query(text, user_id)
+    if match is None:
+        return [], False
+    page = min(max(1, page), MAX_SEARCH_PAGES)
+    rows = db.execute(
+        SEARCH_SQL, (match, per_page + 1, (page - 1) * per_page)
+    ).fetchall()
+    return rows[:per_page], len(rows) > per_page
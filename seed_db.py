@@ -1,11 +1,15 @@
 import sqlite3
+from werkzeug.security import generate_password_hash
+
+import migrations
 
 def seed():
     conn = sqlite3.connect('fixmate.db')
+    migrations.migrate(conn) # Make sure the tables exist and are current
     cur = conn.cursor()
     # Demo user: demo/demo
-    cur.execute("INSERT OR IGNORE INTO users (username, password) VALUES (?, ?)",
-                ("demo", "demo"))
+    cur.execute("INSERT OR IGNORE INTO users (username, password_hash) VALUES (?, ?)",
+                ("demo", generate_password_hash("demo")))
     conn.commit()
     conn.close()
     print("✔ Seeded demo user: demo/demo")
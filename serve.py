@@ -0,0 +1,144 @@
+"""
+Production launcher for FixMate.
+
+    python serve.py                                  # gunicorn with FIXMATE_WORKERS x FIXMATE_THREADS
+    python serve.py --workers 4 --threads 8 --bind 0.0.0.0:8000
+    gunicorn -w 4 --threads 8 'serve:create_app()'   # same app under your own gunicorn settings
+
+Configuration comes from the environment (FIXMATE_ prefix, see app.py); at minimum set
+FIXMATE_SECRET_KEY. Each worker process opens a few database connections and compiles
+the templates before it accepts requests, and is only reported ready by /readyz once
+the database is reachable and migrated. Uses gunicorn (Linux/macOS) if it is installed,
+otherwise waitress (single process, threads only; works on Windows).
+"""
+import argparse
+import logging
+import os
+import sys
+
+import assets
+from db import close_all_pools, get_app_pool, shard_count
+
+DEFAULT_BIND = '127.0.0.1:8000'
+DEFAULT_THREADS = 4      # Request threads per worker; keep at or below DB_POOL_SIZE
+DEFAULT_TIMEOUT = 30     # Seconds before a stuck worker is restarted
+GRACEFUL_TIMEOUT = 30    # Seconds in-flight requests get to finish on shutdown/restart
+
+
+def default_workers():
+    # SQLite allows one writer at a time, so more processes than cores rarely helps
+    return min(os.cpu_count() or 1, 8)
+
+
+def warm_up(app):
+    """Opens pooled connections and compiles every template so the first requests are not slow."""
+    with app.app_context():
+        opened = sum(get_app_pool(shard).warm(app.config.get('DB_POOL_WARM', 2))
+                     for shard in range(shard_count()))
+    assets.precompile_templates(app) # Loaded from the bytecode cache after the first worker
+    app.logger.info(f"Worker {os.getpid()} warmed up: {opened} DB connection(s) open.")
+
+
+def load_app():
+    """Imports the app (reading FIXMATE_* settings) and refuses development-only settings."""
+    import app as fixmate
+    app = fixmate.app
+    if app.config['SECRET_KEY'] == fixmate.DEV_SECRET_KEY:
+        raise RuntimeError("Set FIXMATE_SECRET_KEY before serving FixMate in production.")
+    if app.debug:
+        raise RuntimeError("Debug mode is on (FLASK_DEBUG); turn it off before serving in production.")
+    return app
+
+
+def create_app():
+    """Returns the configured, warmed-up FixMate app for a WSGI server (one call per worker)."""
+    app = load_app()
+    warm_up(app)
+    return app
+
+
+# --- Servers ---
+def run_gunicorn(options):
+    from gunicorn.app.base import BaseApplication
+
+    class FixMateApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Without --preload this runs in each worker, so every process warms its own pool
+            return create_app()
+
+    def post_fork(server, worker):
+        # With --preload the app was created (and warmed) in the master; SQLite
+        # connections must never be shared across processes, so reopen our own
+        close_all_pools()
+        if server.cfg.preload_app:
+            warm_up(load_app())
+
+    options['post_fork'] = post_fork
+    FixMateApplication().run()
+
+
+def run_waitress(app, bind, threads):
+    from waitress import serve
+    serve(app, listen=bind, threads=threads)
+
+
+def main(argv=None):
+    env = os.environ
+    parser = argparse.ArgumentParser(description="Run FixMate under a production WSGI server.")
+    parser.add_argument('--bind', default=env.get('FIXMATE_BIND', DEFAULT_BIND),
+                        help=f"address:port to listen on (default: {DEFAULT_BIND})")
+    parser.add_argument('--workers', type=int, default=int(env.get('FIXMATE_WORKERS', default_workers())),
+                        help="worker processes (default: CPU count, at most 8)")
+    parser.add_argument('--threads', type=int, default=int(env.get('FIXMATE_THREADS', DEFAULT_THREADS)),
+                        help=f"request threads per worker (default: {DEFAULT_THREADS})")
+    parser.add_argument('--timeout', type=int, default=int(env.get('FIXMATE_TIMEOUT', DEFAULT_TIMEOUT)),
+                        help=f"seconds before a stuck worker is restarted (default: {DEFAULT_TIMEOUT})")
+    parser.add_argument('--preload', action='store_true',
+                        help="import the app once in the master before forking workers")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    # Check the settings up front so a bad config fails here, not in every worker
+    try:
+        config = load_app().config
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return 1
+    if args.threads > config['DB_POOL_SIZE']:
+        print(f"Warning: {args.threads} threads per worker but DB_POOL_SIZE is {config['DB_POOL_SIZE']}; "
+              f"requests will wait for connections.")
+    if args.workers > 1 and config['SESSION_BACKEND'] == 'memory':
+        print("Warning: SESSION_BACKEND 'memory' is per process; use 'sqlite' with several workers.")
+
+    try:
+        import gunicorn # noqa: F401 (only checking it is installed)
+    except ImportError:
+        try:
+            import waitress # noqa: F401
+        except ImportError:
+            print("Install a production server first: pip install gunicorn (Linux/macOS) or waitress (Windows).")
+            return 1
+        print(f"gunicorn not found; serving with waitress on {args.bind} ({args.threads} threads, one process).")
+        run_waitress(create_app(), args.bind, args.threads)
+        return 0
+
+    run_gunicorn({
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'timeout': args.timeout,
+        'graceful_timeout': GRACEFUL_TIMEOUT,
+        'keepalive': 5,
+        'preload_app': args.preload,
+        'accesslog': '-',
+    })
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,306 @@
+# --- Imports ---
+import re
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from flask import has_app_context
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+
+from db import get_app_pool, get_directory_db
+
+# --- Default Session Settings (override via app.config) ---
+DEFAULT_COMPACT_INTERVAL = 3600 # Seconds between sweeps of expired sessions (per process)
+COMPACT_BATCH_SIZE = 1000       # Expired rows deleted per statement, so the write lock stays short
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{32,64}$')
+
+
+# --- Session Object ---
+class ServerSession(SessionMixin):
+    """
+    Session data kept on the server; the cookie holds only `sid`. Nothing is read or
+    deserialized until the view first touches the session, so requests that never
+    look at it (static files, /metrics, health checks) cost nothing.
+    """
+
+    def __init__(self, sid, loader):
+        self.sid = sid
+        self.expires_at = None
+        self.new = sid is None
+        self.modified = False
+        self.accessed = False
+        self.regenerate = False # Issue a new id on save (set by clear(), e.g. at login/logout)
+        self._loader = loader
+        self._data = None
+
+    def _load(self):
+        if self._data is None:
+            self.accessed = True
+            record = self._loader(self.sid) if self.sid else None
+            if record is None:
+                self._data, self.new = {}, True
+            else:
+                self._data, self.expires_at = record
+        return self._data
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self._load()[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __contains__(self, key):
+        return key in self._load()
+
+    def clear(self):
+        # Old data is not needed, so it is never loaded; the id is replaced to prevent fixation
+        self._data = {}
+        self.accessed = self.modified = self.regenerate = True
+
+
+# --- Stores ---
+class SessionStore(ABC):
+    """
+    Interface for session storage. Payloads are serialized strings; expires_at is unix seconds.
+    Implement these to plug in another store through app.config['SESSION_STORE'].
+    """
+
+    @abstractmethod
+    def load(self, sid):
+        """Returns (payload, expires_at), or None if missing or expired."""
+
+    @abstractmethod
+    def save(self, sid, payload, expires_at):
+        pass
+
+    @abstractmethod
+    def touch(self, sid, expires_at):
+        """Extends the expiry without rewriting the payload."""
+
+    @abstractmethod
+    def delete(self, sid):
+        pass
+
+    @abstractmethod
+    def compact(self, now):
+        """Deletes expired sessions. Returns how many were removed."""
+
+
+class MemorySessionStore(SessionStore):
+    """In-process dict. Only for a single worker process (sessions vanish on restart)."""
+
+    def __init__(self):
+        self._sessions = {} # sid -> (payload, expires_at)
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        record = self._sessions.get(sid)
+        if record is None or record[1] < time.time():
+            return None
+        return record
+
+    def save(self, sid, payload, expires_at):
+        with self._lock:
+            self._sessions[sid] = (payload, expires_at)
+
+    def touch(self, sid, expires_at):
+        with self._lock:
+            record = self._sessions.get(sid)
+            if record is not None:
+                self._sessions[sid] = (record[0], expires_at)
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def compact(self, now):
+        with self._lock:
+            expired = [sid for sid, (_, expires_at) in self._sessions.items() if expires_at < now]
+            for sid in expired:
+                del self._sessions[sid]
+        return len(expired)
+
+
+class SqliteSessionStore(SessionStore):
+    """The `sessions` table in the app database (migration 8). Shared by all worker processes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    @contextmanager
+    def _connection(self):
+        if not has_app_context():
+            # Outside a request (e.g., the test client's session_transaction())
+            with self.app.app_context(), get_app_pool().connection() as conn:
+                yield conn
+            return
+        db = get_directory_db()
+        if not db.in_transaction:
+            yield db
+            return
+        # The request left work uncommitted (it failed); don't commit that along with the session
+        with get_app_pool().connection() as conn:
+            yield conn
+
+    def load(self, sid):
+        with self._connection() as db:
+            row = db.execute('SELECT data, expires_at FROM sessions WHERE id = ? AND expires_at >= ?',
+                             (sid, int(time.time()))).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def save(self, sid, payload, expires_at):
+        with self._connection() as db:
+            db.execute('INSERT INTO sessions (id, data, expires_at) VALUES (?, ?, ?) '
+                       'ON CONFLICT (id) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at',
+                       (sid, payload, int(expires_at)))
+            db.commit()
+
+    def touch(self, sid, expires_at):
+        with self._connection() as db:
+            db.execute('UPDATE sessions SET expires_at = ? WHERE id = ?', (int(expires_at), sid))
+            db.commit()
+
+    def delete(self, sid):
+        with self._connection() as db:
+            db.execute('DELETE FROM sessions WHERE id = ?', (sid,))
+            db.commit()
+
+    def compact(self, now):
+        removed = 0
+        with self._connection() as db:
+            while True:
+                cursor = db.execute(
+                    'DELETE FROM sessions WHERE id IN '
+                    '(SELECT id FROM sessions WHERE expires_at < ? LIMIT ?)',
+                    (int(now), COMPACT_BATCH_SIZE)
+                )
+                db.commit()
+                removed += cursor.rowcount
+                if cursor.rowcount < COMPACT_BATCH_SIZE:
+                    return removed
+
+
+# --- Flask Integration ---
+class ServerSessionInterface(SessionInterface):
+    """
+    Stores session data in a SessionStore under a random id kept in the cookie.
+    Data is only written when the session changed; an untouched session is never
+    read. Sessions expire PERMANENT_SESSION_LIFETIME after their last write; reads
+    in the second half of that period push the expiry out again.
+    """
+    serializer = session_json_serializer # Flask's own (keeps tuples, bytes, datetimes)
+
+    def __init__(self, store, compact_interval=DEFAULT_COMPACT_INTERVAL):
+        self.store = store
+        self.compact_interval = compact_interval
+        self._next_compact = time.monotonic() + compact_interval
+        self._compact_lock = threading.Lock()
+
+    def _load(self, sid):
+        record = self.store.load(sid)
+        if record is None:
+            return None
+        payload, expires_at = record
+        try:
+            return self.serializer.loads(payload), expires_at
+        except ValueError:
+            return None # Unreadable payload; start a fresh session
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and not SESSION_ID_PATTERN.match(sid):
+            sid = None
+        return ServerSession(sid, self._load)
+
+    def save_session(self, app, session, response):
+        if not session.accessed:
+            return
+        response.vary.add('Cookie')
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        now = time.time()
+        lifetime = app.permanent_session_lifetime.total_seconds()
+
+        if not session:
+            # Emptied (logout) or never used: drop the row and the cookie
+            if session.modified and session.sid:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not session.modified:
+            if session.expires_at is not None and session.expires_at - now < lifetime / 2:
+                self.store.touch(session.sid, now + lifetime)
+            return
+
+        if session.regenerate or session.new:
+            if session.sid:
+                self.store.delete(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+        self.store.save(session.sid, self.serializer.dumps(dict(session)), now + lifetime)
+        response.set_cookie(
+            name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+        self._maybe_compact(app, now)
+
+    def _maybe_compact(self, app, now):
+        """Sweeps expired sessions at most once per compact_interval (one request pays for it)."""
+        if time.monotonic() < self._next_compact or not self._compact_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_compact = time.monotonic() + self.compact_interval
+            removed = self.store.compact(now)
+            if removed:
+                app.logger.info(f"Removed {removed} expired session(s).")
+        finally:
+            self._compact_lock.release()
+
+
+def init_app(app):
+    """
+    Selects where sessions are kept.
+    Config:
+      SESSION_BACKEND           'cookie' (Flask's signed cookie), 'sqlite' or 'memory'
+      SESSION_STORE             a SessionStore instance to use instead
+      SESSION_COMPACT_INTERVAL  seconds between sweeps of expired sessions
+    """
+    store = app.config.get('SESSION_STORE')
+    if store is None:
+        backend = app.config.get('SESSION_BACKEND', 'cookie')
+        if backend == 'cookie':
+            return
+        if backend == 'sqlite':
+            store = SqliteSessionStore(app)
+        elif backend == 'memory':
+            store = MemorySessionStore()
+        else:
+            raise ValueError(f"Unknown SESSION_BACKEND: {backend!r}")
+    app.session_interface = ServerSessionInterface(
+        store, app.config.get('SESSION_COMPACT_INTERVAL', DEFAULT_COMPACT_INTERVAL))
+
+
+def compact_sessions(app):
+    """Deletes expired server-side sessions now. Returns the number removed (0 for cookie sessions)."""
+    interface = app.session_interface
+    if not isinstance(interface, ServerSessionInterface):
+        return 0
+    return interface.store.compact(time.time())
@@ -0,0 +1,270 @@
+# --- Imports ---
+import os
+import zlib
+
+import task_fields
+import task_stats
+from db import get_app_pool, lookup_shard, shard_count, shard_paths
+
+# --- Shard Placement and Moves ---
+# Routing itself lives in db.get_db(); this module decides where users go and moves
+# them. A user is placed on a shard by a hash of their id when they register, and the
+# choice is written to shard_directory (on DATABASE), which stays authoritative: changing
+# DB_SHARDS never silently moves anyone. `flask rebalance-shards` moves users whose
+# directory entry differs from their hash placement (e.g. after adding shards), one at a
+# time and while they keep using the app.
+MOVE_ATTEMPTS = 5       # Copies retried when the user writes during a move
+MOVE_BATCH_SIZE = 500   # Tasks copied per SELECT
+
+UPSERT_DIRECTORY_SQL = '''INSERT INTO shard_directory (user_id, shard, moved_at)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT (user_id) DO UPDATE SET shard = excluded.shard, moved_at = excluded.moved_at'''
+
+# Stub row so the shard's foreign keys (tasks.user_id -> users.id) hold; never used to log in
+UPSERT_STUB_USER_SQL = '''INSERT INTO users (id, username, password_hash) VALUES (?, ?, '')
+    ON CONFLICT (id) DO UPDATE SET username = excluded.username'''
+
+
+class ShardMoveConflict(RuntimeError):
+    """The user kept changing their tasks during every copy attempt; try again later."""
+
+
+def placement(user_id, count):
+    """The shard a user id hashes to (CRC32, so it is the same in every process)."""
+    return zlib.crc32(str(int(user_id)).encode('ascii')) % count if count > 1 else 0
+
+
+def assign_user(directory_db, user_id, username):
+    """
+    Places a newly registered user on their hash shard: writes the directory row on
+    `directory_db` (the caller commits it, together with the users row) and creates the
+    stub users row on the shard right away. Returns the shard number.
+    """
+    count = shard_count()
+    shard = placement(user_id, count)
+    if count == 1:
+        return 0
+    if shard:
+        with get_app_pool(shard).connection() as shard_db:
+            shard_db.execute(UPSERT_STUB_USER_SQL, (user_id, username))
+            shard_db.commit()
+    directory_db.execute(UPSERT_DIRECTORY_SQL, (user_id, shard))
+    return shard
+
+
+def _delete_user_rows(db, user_id, shard):
+    """Removes one user's data from a shard (no commit). Triggers keep the summary/search in step."""
+    db.execute('DELETE FROM reminder_outbox WHERE user_id = ?', (user_id,))
+    db.execute('DELETE FROM tasks WHERE user_id = ?', (user_id,)) # Cascades to task_completions
+    db.execute('DELETE FROM task_summary WHERE user_id = ?', (user_id,))
+    db.execute('DELETE FROM user_data_version WHERE user_id = ?', (user_id,))
+    if shard:
+        db.execute('DELETE FROM users WHERE id = ?', (user_id,)) # The stub; shard 0 keeps the real row
+
+
+def _copy_user(source, target, target_shard, user_id, username):
+    """
+    Copies one user's tasks, completion history, outbox and data version from `source`
+    to `target` in a single target transaction. Task ids are assigned by the target
+    (ids are per file), so old links to the user's tasks stop working; everything
+    pointing at a task is remapped. The data version is bumped so no cached page or
+    ETag from before the move is reused. Returns the number of tasks copied.
+    """
+    columns = [row[1] for row in source.execute('PRAGMA table_info(tasks)')
+               if row[1] not in ('id', 'category_id')]
+    column_list = ', '.join(columns)
+    insert_sql = (f'INSERT INTO tasks ({column_list}, category_id) '
+                  f'VALUES ({", ".join("?" * len(columns))}, {task_fields.CATEGORY_ID_SQL})')
+    id_map = {}
+    try:
+        if target_shard:
+            target.execute(UPSERT_STUB_USER_SQL, (user_id, username))
+        _delete_user_rows(target, user_id, shard=0) # Leftovers from an interrupted move
+        target.execute('DELETE FROM moved_users WHERE user_id = ?', (user_id,)) # Moving back here
+        last_id = 0
+        while True:
+            rows = source.execute(
+                f'''SELECT id, {column_list}, {task_fields.CATEGORY_NAME_SQL} AS category
+                    FROM tasks WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?''',
+                (user_id, last_id, MOVE_BATCH_SIZE)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1]['id']
+            # Category ids differ between files, so they travel by name
+            task_fields.ensure_categories(target, (row['category'] for row in rows))
+            for row in rows:
+                values = [row[column] for column in columns] + [row['category']]
+                id_map[row['id']] = target.execute(insert_sql, values).lastrowid
+
+        # History and outbox, in id order (uncomplete_tasks relies on the latest id per task)
+        for task_id, due_date, completed_on in source.execute(
+                '''SELECT c.task_id, c.due_date, c.completed_on FROM task_completions c
+                   JOIN tasks t ON t.id = c.task_id WHERE t.user_id = ? ORDER BY c.id''', (user_id,)):
+            target.execute('INSERT INTO task_completions (task_id, due_date, completed_on) VALUES (?, ?, ?)',
+                           (id_map[task_id], due_date, completed_on))
+        for row in source.execute(
+                'SELECT task_id, due_date, message, created_at, sent_at FROM reminder_outbox '
+                'WHERE user_id = ? ORDER BY id', (user_id,)):
+            target.execute(
+                'INSERT INTO reminder_outbox (user_id, task_id, due_date, message, created_at, sent_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (user_id, id_map.get(row['task_id']), row['due_date'], row['message'],
+                 row['created_at'], row['sent_at'])
+            )
+        version = task_stats.get_data_version(source, user_id)
+        target.execute(
+            'INSERT INTO user_data_version (user_id, version, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)',
+            (user_id, version + 1)
+        )
+        target.commit()
+    except Exception:
+        target.rollback()
+        raise
+    return len(id_map)
+
+
+def move_user(user_id, target_shard, log=print):
+    """
+    Moves one user's data to `target_shard` while the app keeps running:
+      1. copy everything to the target (the user can keep reading and writing the source)
+      2. take the source's write lock, check the user's data version is unchanged
+         (else discard the copy and start again), point the directory at the target,
+         delete the source rows and list the user in the source's moved_users, then
+         release the lock
+    Requests that looked up the source before step 2 wait for the lock. Their reads and
+    updates then find nothing there ("not found"), and the moved_users trigger refuses
+    their new tasks, which run_write() then adds on the target. Later requests go to the
+    target.
+    Returns the number of tasks moved. Raises ShardMoveConflict after MOVE_ATTEMPTS copies.
+    """
+    if not 0 <= target_shard < shard_count():
+        raise ValueError(f"Shard {target_shard} does not exist (DB_SHARDS is {shard_count()}).")
+    with get_app_pool().connection() as directory:
+        user = directory.execute('SELECT id, username FROM users WHERE id = ?', (user_id,)).fetchone()
+        if user is None:
+            raise ValueError(f"User {user_id} does not exist.")
+        source_shard = lookup_shard(directory, user_id)
+    if source_shard == target_shard:
+        log(f"User {user_id} is already on shard {target_shard}.")
+        return 0
+
+    with get_app_pool(source_shard).connection() as source, \
+            get_app_pool(target_shard).connection() as target:
+        for attempt in range(1, MOVE_ATTEMPTS + 1):
+            # WAL lets this read run alongside the user's own writes to the source
+            source.execute('BEGIN')
+            version = task_stats.get_data_version(source, user_id)
+            moved = _copy_user(source, target, target_shard, user_id, user['username'])
+            source.rollback() # Ends the read snapshot
+
+            source.execute('BEGIN IMMEDIATE') # Blocks writers to the source shard until the switch is done
+            try:
+                if task_stats.get_data_version(source, user_id) != version:
+                    source.rollback()
+                    _delete_user_rows(target, user_id, target_shard)
+                    target.commit()
+                    log(f"User {user_id} changed data during copy {attempt}; retrying.")
+                    continue
+                # The directory is on shard 0; reuse the connection already holding that file's lock
+                if source_shard == 0:
+                    source.execute(UPSERT_DIRECTORY_SQL, (user_id, target_shard))
+                else:
+                    with get_app_pool().connection() as directory:
+                        directory.execute(UPSERT_DIRECTORY_SQL, (user_id, target_shard))
+                        directory.commit()
+                _delete_user_rows(source, user_id, source_shard)
+                # Fences the source: tasks added by requests that looked up the old shard now fail there
+                source.execute('INSERT OR REPLACE INTO moved_users (user_id) VALUES (?)', (user_id,))
+                source.commit()
+            except Exception:
+                source.rollback()
+                raise
+            log(f"Moved user {user_id} ({moved} task(s)) from shard {source_shard} to shard {target_shard}.")
+            return moved
+    raise ShardMoveConflict(f"User {user_id} kept changing data; not moved. Try again later.")
+
+
+def rebalance(limit=None, dry_run=False, log=print):
+    """
+    Moves users whose shard differs from their hash placement, `limit` users at most.
+    Returns the number of users moved (or that would be, with dry_run).
+    """
+    count = shard_count()
+    moved = 0
+    last_id = 0
+    while limit is None or moved < limit:
+        with get_app_pool().connection() as directory:
+            rows = directory.execute(
+                '''SELECT u.id, COALESCE(d.shard, 0) AS shard FROM users u
+                   LEFT JOIN shard_directory d ON d.user_id = u.id
+                   WHERE u.id > ? ORDER BY u.id LIMIT ?''',
+                (last_id, MOVE_BATCH_SIZE)
+            ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+        for row in rows:
+            target = placement(row['id'], count)
+            if row['shard'] == target:
+                continue
+            if dry_run:
+                log(f"Would move user {row['id']} from shard {row['shard']} to shard {target}.")
+            else:
+                try:
+                    move_user(row['id'], target, log=log)
+                except ShardMoveConflict as e:
+                    log(str(e))
+                    continue
+            moved += 1
+            if limit is not None and moved >= limit:
+                break
+    return moved
+
+
+# --- Cross-Shard Aggregation (admin) ---
+SHARD_TOTALS_SQL = '''
+    SELECT COUNT(DISTINCT user_id) AS users,
+           COALESCE(SUM(task_count), 0) AS tasks,
+           COALESCE(SUM(CASE WHEN completed THEN task_count END), 0) AS done,
+           COALESCE(SUM(cost_cents), 0) AS cost_cents
+    FROM task_summary
+'''
+SHARD_CATEGORIES_SQL = '''
+    SELECT COALESCE(c.name, 'Uncategorized') AS name,
+           SUM(s.task_count) AS tasks, SUM(s.cost_cents) AS cost_cents
+    FROM task_summary s LEFT JOIN categories c ON c.id = s.category_id
+    GROUP BY s.category_id
+'''
+
+def fleet_summary():
+    """
+    Totals across every shard, read from each shard's task_summary (no task scans):
+    {'shards': [{shard, path, size_bytes, users, tasks, done, cost}], 'total': {...},
+     'categories': [{name, tasks, cost}]}. Categories are merged by name, since ids differ per file.
+    """
+    shards = []
+    total = {'users': 0, 'tasks': 0, 'done': 0, 'cost': 0.0}
+    categories = {}
+    for shard, path in enumerate(shard_paths()):
+        with get_app_pool(shard).connection() as db:
+            row = db.execute(SHARD_TOTALS_SQL).fetchone()
+            category_rows = db.execute(SHARD_CATEGORIES_SQL).fetchall()
+        info = {
+            'shard': shard, 'path': os.path.abspath(path),
+            'size_bytes': os.path.getsize(path) if os.path.exists(path) else 0,
+            'users': row['users'], 'tasks': row['tasks'], 'done': row['done'],
+            'cost': row['cost_cents'] / 100,
+        }
+        shards.append(info)
+        for key in total:
+            total[key] += info[key]
+        for category in category_rows:
+            bucket = categories.setdefault(category['name'], {'name': category['name'], 'tasks': 0, 'cost': 0.0})
+            bucket['tasks'] += category['tasks']
+            bucket['cost'] += category['cost_cents'] / 100
+    return {
+        'shards': shards,
+        'total': total,
+        'categories': sorted(categories.values(), key=lambda c: (-c['tasks'], c['name'])),
+    }
@@ -0,0 +1,165 @@
+# --- Imports ---
+import calendar
+import heapq
+from datetime import date, datetime, timedelta, timezone
+
+import recurrence
+from task_fields import select_columns
+
+# --- Settings ---
+MAX_WINDOW_DAYS = 93     # Longest range one request may ask for (about a quarter)
+WINDOW_FETCH_SIZE = 500  # Rows pulled from the cursor at a time
+ICAL_PAST_DAYS = 90      # The iCalendar feed covers this many days back...
+ICAL_FUTURE_DAYS = 365   # ...and this many ahead (recurring tasks are projected that far)
+ICAL_FLUSH_EVENTS = 200  # Events per streamed chunk
+
+ENTRY_COLUMNS = ('id', 'title', 'category', 'due_date', 'completed')
+
+# Tasks due inside the window, in date order: a range walk over idx_tasks_user_due
+WINDOW_SQL = f'''SELECT {select_columns(ENTRY_COLUMNS)} FROM tasks
+    WHERE user_id = ? AND due_date >= ? AND due_date <= ?
+    ORDER BY due_date, title, id'''
+
+# Recurring tasks that can have an occurrence on or before the window end (idx_tasks_user_recurring).
+# Pending ones repeat after their due date; completed ones come back on next_due_date.
+RECURRING_SQL = f'''SELECT {select_columns(ENTRY_COLUMNS + ('recur_unit', 'recur_every', 'next_due_date'))}
+    FROM tasks
+    WHERE user_id = ? AND recur_unit IS NOT NULL
+      AND ((completed = 0 AND due_date <= ?) OR (completed = 1 AND next_due_date <= ?))'''
+
+
+# --- Windows ---
+def parse_window(start, end):
+    """Checks a requested start..end (YYYY-MM-DD, inclusive). Returns two dates or raises ValueError."""
+    first, last = recurrence.parse_iso_date(start), recurrence.parse_iso_date(end)
+    if first is None or last is None:
+        raise ValueError("start and end must be YYYY-MM-DD dates")
+    if last < first:
+        raise ValueError("end must not be before start")
+    if (last - first).days + 1 > MAX_WINDOW_DAYS:
+        raise ValueError(f"the window can be at most {MAX_WINDOW_DAYS} days")
+    return first, last
+
+def month_weeks(day):
+    """The Monday-to-Sunday weeks (lists of dates) a month grid for `day`'s month shows."""
+    return calendar.Calendar(firstweekday=0).monthdatescalendar(day.year, day.month)
+
+def week_days(day):
+    """Monday..Sunday of the week containing `day`."""
+    monday = day - timedelta(days=day.weekday())
+    return [monday + timedelta(days=offset) for offset in range(7)]
+
+
+# --- Entries ---
+# An entry is one task on one day: id, title, category, date (ISO), completed, and
+# projected (True for a future occurrence of a recurring task that doesn't exist yet).
+
+def _iter_dated(db, user_id, start, end):
+    cursor = db.execute(WINDOW_SQL, (user_id, start.isoformat(), end.isoformat()))
+    while True:
+        rows = cursor.fetchmany(WINDOW_FETCH_SIZE)
+        if not rows:
+            break
+        for row in rows:
+            yield {'id': row['id'], 'title': row['title'], 'category': row['category'],
+                   'date': row['due_date'], 'completed': bool(row['completed']), 'projected': False}
+
+def _iter_projected(row, start, end, today):
+    """Occurrences of one recurring task inside the window, assuming each is done on time."""
+    if row['completed']:
+        first = recurrence.parse_iso_date(row['next_due_date'])
+    else:
+        # Where completing it now would schedule the next one (same rule as task_ops)
+        first = recurrence.next_due_date(row['due_date'], row['recur_unit'], row['recur_every'], today)
+    if first is None:
+        return
+    for day in recurrence.occurrences(first, row['recur_unit'], row['recur_every'], start, end):
+        yield {'id': row['id'], 'title': row['title'], 'category': row['category'],
+               'date': day.isoformat(), 'completed': False, 'projected': True}
+
+def iter_window(db, user_id, start, end, today=None):
+    """
+    Yields the user's entries dated start..end (inclusive) in (date, title, id) order.
+    Stored tasks stream from the cursor; recurring tasks are projected only across
+    this window, one lazy generator per task, merged in as the dates come up.
+    """
+    today = today or date.today()
+    end_iso = end.isoformat()
+    recurring = db.execute(RECURRING_SQL, (user_id, end_iso, end_iso)).fetchall()
+    streams = [_iter_dated(db, user_id, start, end)]
+    streams.extend(_iter_projected(row, start, end, today) for row in recurring)
+    return heapq.merge(*streams, key=lambda entry: (entry['date'], entry['title'], entry['id']))
+
+def entries_by_day(entries):
+    """{ISO date: [entries]} for the template grid."""
+    days = {}
+    for entry in entries:
+        days.setdefault(entry['date'], []).append(entry)
+    return days
+
+
+# --- iCalendar Export (streamed) ---
+def _ical_text(value):
+    """Escapes a TEXT value (RFC 5545 section 3.3.11)."""
+    return (str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+def _ical_line(line):
+    """Folds a content line to 75 octets per physical line, never splitting a character."""
+    parts = []
+    current, size = '', 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > 75:
+            parts.append(current)
+            current, size = ' ', 1 # Continuation lines start with a space
+        current += char
+        size += width
+    parts.append(current)
+    return '\r\n'.join(parts) + '\r\n'
+
+def _ical_event(entry, stamp, task_url):
+    day = date.fromisoformat(entry['date'])
+    # A projected occurrence gets its own UID so each one is a separate event
+    uid = f"task-{entry['id']}-{day:%Y%m%d}" if entry['projected'] else f"task-{entry['id']}"
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:{uid}@fixmate",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART;VALUE=DATE:{day:%Y%m%d}",
+        f"DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}",
+        f"SUMMARY:{_ical_text(entry['title'])}",
+        'TRANSP:TRANSPARENT', # All-day reminders, not busy time
+        f"STATUS:{'TENTATIVE' if entry['projected'] else 'CONFIRMED'}",
+    ]
+    if entry['category']:
+        lines.append(f"CATEGORIES:{_ical_text(entry['category'])}")
+    if entry['completed']:
+        lines.append('DESCRIPTION:Completed.')
+    elif entry['projected']:
+        lines.append('DESCRIPTION:Upcoming occurrence of a recurring task.')
+    if task_url:
+        lines.append(f"URL:{task_url(entry['id'])}")
+    lines.append('END:VEVENT')
+    return ''.join(_ical_line(line) for line in lines)
+
+def iter_ical(db, user_id, today=None, task_url=None):
+    """
+    Generator of iCalendar text chunks for a streaming response: one all-day event per
+    task due from ICAL_PAST_DAYS ago to ICAL_FUTURE_DAYS ahead, plus the projected
+    occurrences of recurring tasks in that range. `task_url(id)` adds a link to each event.
+    """
+    today = today or date.today()
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    start, end = today - timedelta(days=ICAL_PAST_DAYS), today + timedelta(days=ICAL_FUTURE_DAYS)
+    chunk = [_ical_line(line) for line in (
+        'BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//FixMate//Tasks//EN',
+        'CALSCALE:GREGORIAN', 'METHOD:PUBLISH', 'X-WR-CALNAME:FixMate tasks',
+    )]
+    for count, entry in enumerate(iter_window(db, user_id, start, end, today), start=1):
+        chunk.append(_ical_event(entry, stamp, task_url))
+        if count % ICAL_FLUSH_EVENTS == 0:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append(_ical_line('END:VCALENDAR'))
+    yield ''.join(chunk)
@@ -0,0 +1,149 @@
+# --- Imports ---
+import re
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+# --- Typed Task Columns ---
+# Tasks store typed values (see migration 9): due dates as ISO 'YYYY-MM-DD' text,
+# cost as integer cents, estimated time as integer minutes and the category as an id
+# into the categories lookup table. Forms, imports and the API accept the friendly
+# forms ("$12.50", "1 h 30 min", "Plumbing & Water") and these helpers convert them.
+
+MINUTES_PER_DAY = 8 * 60 # "2 days" of work means two working days, not 48 hours
+MAX_COST_CENTS = 10 ** 11 # $1 billion; anything bigger is a typo
+
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%m/%d/%Y', '%m-%d-%Y') # Tried in this order
+
+_DURATION_PART = re.compile(
+    r'\b(\d+(?:\.\d+)?|half an?|an?|one)\s*'
+    r'(minutes?|mins?|m|hours?|hrs?|h|days?|d)\b'
+)
+_UNIT_MINUTES = {'m': 1, 'h': 60, 'd': MINUTES_PER_DAY}
+_WORD_AMOUNTS = {'a': 1, 'an': 1, 'one': 1, 'half a': 0.5, 'half an': 0.5}
+_CLOCK_DURATION = re.compile(r'^(\d+):([0-5]\d)$') # '1:30' = 90 minutes
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+def parse_due_date(value):
+    """Returns an ISO 'YYYY-MM-DD' string or None. Raises ValueError for anything else."""
+    if _blank(value):
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    text = str(value).strip()
+    if len(text) > 10 and text[10] in 'T ':
+        text = text[:10] # '2025-06-01T09:00' or '2025-06-01 09:00:00'
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"due_date '{value}' is not a date (use YYYY-MM-DD)")
+
+def parse_cost_cents(value):
+    """'$1,234.50' / 12.5 / '' -> 123450 / 1250 / None. Raises ValueError if not a non-negative amount."""
+    if _blank(value):
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"cost '{value}' is not a number")
+    text = str(value).strip().lstrip('$').replace(',', '').strip()
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"cost '{value}' is not a number")
+    if not amount.is_finite():
+        raise ValueError(f"cost '{value}' is not a number")
+    if amount < 0:
+        raise ValueError("cost cannot be negative")
+    cents = int((amount * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+    if cents > MAX_COST_CENTS:
+        raise ValueError(f"cost '{value}' is too large")
+    return cents
+
+def parse_minutes(value):
+    """
+    '90' / '2 hours' / '1h 30m' / '1:30' / 'half a day' -> minutes (int), '' -> None.
+    Bare numbers are minutes. For ranges ('1-2 hours') the upper end is kept.
+    Raises ValueError if no duration can be read.
+    """
+    if _blank(value):
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"estimated_time '{value}' is not a duration")
+    if isinstance(value, (int, float)):
+        minutes = value
+    else:
+        text = str(value).strip().lower()
+        clock = _CLOCK_DURATION.match(text)
+        if clock:
+            minutes = int(clock.group(1)) * 60 + int(clock.group(2))
+        else:
+            try:
+                minutes = float(text)
+            except ValueError:
+                parts = _DURATION_PART.findall(text)
+                if not parts:
+                    raise ValueError(f"estimated_time '{value}' is not a duration (e.g. 45 min, 2 hours)")
+                minutes = sum(float(_WORD_AMOUNTS.get(amount, amount or 1)) * _UNIT_MINUTES[unit[0]]
+                              for amount, unit in parts)
+    if minutes < 0:
+        raise ValueError("estimated_time cannot be negative")
+    return int(round(minutes))
+
+def format_minutes(minutes):
+    """90 -> '1 h 30 min'. Parses back to the same value with parse_minutes()."""
+    if minutes is None:
+        return None
+    hours, rest = divmod(int(minutes), 60)
+    if not hours:
+        return f"{rest} min"
+    return f"{hours} h {rest} min" if rest else f"{hours} h"
+
+def normalize_category(value):
+    """Trims and collapses whitespace; empty becomes None."""
+    if value is None:
+        return None
+    return ' '.join(str(value).split()) or None
+
+
+# --- Categories (lookup table) ---
+# Names are unique case-insensitively; the first spelling saved is the one shown.
+CATEGORY_ID_SQL = '(SELECT id FROM categories WHERE name = ?)'
+
+def ensure_categories(db, names):
+    """Adds any of `names` missing from the categories table (no commit)."""
+    new = {(name,) for name in names if name}
+    if new:
+        db.executemany('INSERT INTO categories (name) VALUES (?) ON CONFLICT (name) DO NOTHING', new)
+
+
+# --- Reading Tasks Back ---
+# SQL for the friendly column names the templates, exports and API use. Select
+# through select_columns() rather than naming the stored columns directly.
+CATEGORY_NAME_SQL = '(SELECT name FROM categories WHERE categories.id = tasks.category_id)'
+ESTIMATED_TIME_SQL = '''CASE
+        WHEN estimated_minutes IS NULL THEN NULL
+        WHEN estimated_minutes < 60 THEN estimated_minutes || ' min'
+        WHEN estimated_minutes % 60 = 0 THEN (estimated_minutes / 60) || ' h'
+        ELSE (estimated_minutes / 60) || ' h ' || (estimated_minutes % 60) || ' min'
+    END''' # Same text as format_minutes()
+OUTPUT_COLUMNS = {
+    'category': f'{CATEGORY_NAME_SQL} AS category',
+    'cost': 'cost_cents / 100.0 AS cost',
+    'estimated_time': f'{ESTIMATED_TIME_SQL} AS estimated_time',
+}
+
+# Everything the task detail and edit pages show
+DETAIL_FIELDS = (
+    'id', 'user_id', 'title', 'category', 'due_date', 'frequency', 'cost', 'cost_cents',
+    'estimated_time', 'estimated_minutes', 'guide', 'video_url', 'completed',
+    'created_timestamp', 'recur_unit', 'recur_every', 'next_due_date',
+)
+
+def select_columns(names):
+    """'id, title, (SELECT name ...) AS category, ...' for a SELECT ... FROM tasks."""
+    return ', '.join(OUTPUT_COLUMNS.get(name, name) for name in names)
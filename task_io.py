@@ -0,0 +1,234 @@
+# --- Imports ---
+import csv
+import io
+import json
+
+import recurrence
+import task_fields
+import task_stats
+
+# --- Settings ---
+# Columns accepted on import and written on export (ids are assigned by the database)
+TASK_FIELDS = (
+    'title', 'category', 'due_date', 'frequency', 'cost',
+    'estimated_time', 'guide', 'video_url', 'completed',
+)
+IMPORT_BATCH_SIZE = 500  # Rows per executemany() + commit
+EXPORT_FETCH_SIZE = 500  # Rows pulled from the cursor at a time while streaming
+MAX_REPORTED_ERRORS = 20 # Row errors kept for the summary message
+
+INSERT_TASK_SQL = f'''INSERT INTO tasks
+    (user_id, title, category_id, due_date, frequency, cost_cents,
+     estimated_minutes, guide, video_url, completed, recur_unit, recur_every)
+    VALUES (?, ?, {task_fields.CATEGORY_ID_SQL}, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+UPDATE_TASK_SQL = f'''UPDATE tasks SET
+    title = ?, category_id = {task_fields.CATEGORY_ID_SQL}, due_date = ?, frequency = ?,
+    cost_cents = ?, estimated_minutes = ?, guide = ?, video_url = ?, completed = ?,
+    recur_unit = ?, recur_every = ?,
+    -- A task that no longer repeats must not reopen later
+    next_due_date = CASE WHEN ? IS NULL THEN NULL ELSE next_due_date END
+    WHERE id = ? AND user_id = ?'''
+
+
+EXPORT_TASKS_SQL = f'''SELECT {task_fields.select_columns(TASK_FIELDS)} FROM tasks
+    WHERE user_id = ?
+    ORDER BY completed, due_date, title, id'''
+
+
+class ImportFormatError(ValueError):
+    """Raised when an uploaded file can't be read as the expected format at all."""
+
+
+# --- Reading Uploads (one row at a time) ---
+def iter_csv_rows(binary_stream):
+    """Yields each CSV record as a dict. The header row names the columns."""
+    text = io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    if not reader.fieldnames or 'title' not in [f.strip() for f in reader.fieldnames]:
+        raise ImportFormatError("CSV file must have a header row with at least a 'title' column.")
+    for record in reader:
+        yield {(k or '').strip(): v for k, v in record.items()}
+
+def iter_jsonl_rows(binary_stream):
+    """Yields each JSON Lines record as a dict (blank lines are skipped)."""
+    text = io.TextIOWrapper(binary_stream, encoding='utf-8-sig')
+    for line in text:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            record = {'__error__': f"invalid JSON ({e.msg})"}
+        if not isinstance(record, dict):
+            record = {'__error__': "each line must be a JSON object"}
+        yield record
+
+def iter_upload_rows(binary_stream, fmt):
+    """Picks the reader for `fmt` ('csv' or 'jsonl')."""
+    if fmt == 'csv':
+        return iter_csv_rows(binary_stream)
+    if fmt == 'jsonl':
+        return iter_jsonl_rows(binary_stream)
+    raise ImportFormatError(f"Unsupported import format: {fmt}")
+
+def detect_format(filename, requested=None):
+    """Returns 'csv' or 'jsonl' from an explicit choice or the file extension."""
+    if requested in ('csv', 'jsonl'):
+        return requested
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    raise ImportFormatError("Could not tell the file format. Use a .csv or .jsonl file.")
+
+
+# --- Validation ---
+def _text(value):
+    """Normalizes optional text fields: strips whitespace, empty becomes None."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def validate_row(record):
+    """
+    Checks and normalizes one record (an imported row, a submitted form or an API body).
+    Returns (values_tuple, None) on success or (None, error_message) on failure.
+    The tuple matches INSERT_TASK_SQL minus the leading user_id: the category is still
+    a name (looked up by the SQL), cost is in cents and the estimate in minutes.
+    """
+    if '__error__' in record:
+        return None, record['__error__']
+
+    title = _text(record.get('title'))
+    if not title:
+        return None, "title is required"
+
+    try:
+        due_date = task_fields.parse_due_date(record.get('due_date'))
+        cost_cents = task_fields.parse_cost_cents(record.get('cost'))
+        if 'estimated_minutes' in record: # API clients may send minutes directly
+            minutes = task_fields.parse_minutes(record['estimated_minutes'])
+        else:
+            minutes = task_fields.parse_minutes(record.get('estimated_time'))
+    except ValueError as e:
+        return None, str(e)
+
+    completed = record.get('completed')
+    if isinstance(completed, str):
+        completed = completed.strip().lower()
+    if completed in (None, '', 0, False, '0', 'false', 'no', 'n'):
+        completed = 0
+    elif completed in (1, True, '1', 'true', 'yes', 'y'):
+        completed = 1
+    else:
+        return None, f"completed '{record.get('completed')}' must be 0/1 or true/false"
+
+    frequency = _text(record.get('frequency'))
+    recur_unit, recur_every = recurrence.parse_frequency(frequency) or (None, None)
+
+    return (
+        title, task_fields.normalize_category(record.get('category')), due_date, frequency,
+        cost_cents, minutes, _text(record.get('guide')),
+        _text(record.get('video_url')), completed, recur_unit, recur_every,
+    ), None
+
+
+# --- Writing Tasks ---
+def insert_task(db, user_id, values):
+    """Inserts one validated task (see validate_row). No commit. Returns the new id."""
+    task_fields.ensure_categories(db, [values[1]])
+    return db.execute(INSERT_TASK_SQL, (user_id,) + values).lastrowid
+
+def update_task(db, user_id, task_id, values):
+    """Overwrites one of the user's tasks with validated values. No commit. Returns the rowcount."""
+    task_fields.ensure_categories(db, [values[1]])
+    recur_unit = values[9]
+    return db.execute(UPDATE_TASK_SQL, values + (recur_unit, task_id, user_id)).rowcount
+
+
+# --- Import ---
+def insert_batch(db, user_id, batch):
+    """Inserts validated rows ((user_id,) + values each) with one executemany(). No commit."""
+    task_fields.ensure_categories(db, (values[2] for values in batch))
+    db.executemany(INSERT_TASK_SQL, batch)
+    task_stats.bump_data_version(db, user_id)
+
+def import_tasks(write, user_id, records, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Validates `records` and inserts the good ones for `user_id`, one insert_batch() per
+    batch so a large file doesn't hold the write lock for long. `write(operation, *args)`
+    runs and commits one batch (write_queue.run_write in the app).
+    Returns (imported_count, skipped_count, errors) where errors is a list of
+    "row N: message" strings (capped at MAX_REPORTED_ERRORS).
+    A database error stops the import; batches committed before it are kept.
+    """
+    imported = 0
+    skipped = 0
+    errors = []
+    batch = []
+
+    def flush():
+        nonlocal imported
+        if not batch:
+            return
+        write(insert_batch, user_id, list(batch))
+        imported += len(batch)
+        batch.clear()
+
+    for row_number, record in enumerate(records, start=1):
+        values, error = validate_row(record)
+        if error:
+            skipped += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(f"row {row_number}: {error}")
+            continue
+        batch.append((user_id,) + values)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return imported, skipped, errors
+
+
+# --- Export (streamed) ---
+def _iter_task_rows(db, user_id):
+    """Yields the user's tasks from the cursor in chunks, never holding the full list."""
+    # Ordered like idx_tasks_user_status_due (pending first, then by due date) so no sort is needed
+    cursor = db.execute(
+        EXPORT_TASKS_SQL,
+        (user_id,)
+    )
+    while True:
+        rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+        if not rows:
+            break
+        yield from rows
+
+def iter_export_csv(db, user_id):
+    """Generator of CSV text chunks (header first) for a streaming response."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(TASK_FIELDS)
+    count = 0
+    for row in _iter_task_rows(db, user_id):
+        writer.writerow(tuple(row))
+        count += 1
+        if count % EXPORT_FETCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def iter_export_jsonl(db, user_id):
+    """Generator of JSON Lines chunks (one task object per line) for a streaming response."""
+    lines = []
+    for row in _iter_task_rows(db, user_id):
+        lines.append(json.dumps(dict(zip(TASK_FIELDS, row)), ensure_ascii=False))
+        if len(lines) >= EXPORT_FETCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
@@ -0,0 +1,180 @@
+# --- Imports ---
+from datetime import date
+
+import recurrence
+import task_stats
+
+# SQLite caps the number of ? parameters per statement, so very long id lists
+# are split into chunks (all still inside one transaction).
+MAX_IDS_PER_STATEMENT = 500
+
+# action name -> flash verb
+BATCH_ACTIONS = {
+    'complete': 'marked as complete',
+    'uncomplete': 'marked as incomplete',
+    'delete': 'deleted',
+}
+
+
+def parse_ids(values):
+    """Turns submitted id strings into a de-duplicated list of ints, ignoring junk."""
+    ids = []
+    seen = set()
+    for value in values:
+        try:
+            task_id = int(value)
+        except (TypeError, ValueError):
+            continue
+        if task_id not in seen:
+            seen.add(task_id)
+            ids.append(task_id)
+    return ids
+
+
+def _chunks(ids):
+    """Yields (chunk, '?, ?, ...') pairs small enough for one statement."""
+    for start in range(0, len(ids), MAX_IDS_PER_STATEMENT):
+        chunk = ids[start:start + MAX_IDS_PER_STATEMENT]
+        yield chunk, ', '.join('?' * len(chunk))
+
+
+# --- Single Operations (no commit; callers own the transaction) ---
+def complete_tasks(db, user_id, ids, today=None):
+    """
+    Marks the user's pending tasks in `ids` as complete. Recurring tasks also get a
+    row in task_completions and a next_due_date, the day they reopen automatically
+    (see reopen_due_recurring). Returns the number of tasks completed.
+    """
+    today = today or date.today()
+    completed_on = today.isoformat()
+    changed = 0
+    for chunk, placeholders in _chunks(ids):
+        recurring = db.execute(
+            f'''SELECT id, due_date, recur_unit, recur_every FROM tasks
+                WHERE user_id = ? AND completed = 0 AND recur_unit IS NOT NULL
+                  AND id IN ({placeholders})''',
+            [user_id] + chunk
+        ).fetchall()
+        if recurring:
+            # Compact history: just the dates, not a copy of the task
+            db.executemany(
+                'INSERT INTO task_completions (task_id, due_date, completed_on) VALUES (?, ?, ?)',
+                [(row['id'], row['due_date'], completed_on) for row in recurring]
+            )
+            db.executemany(
+                'UPDATE tasks SET next_due_date = ? WHERE id = ?',
+                [(recurrence.next_due_date(row['due_date'], row['recur_unit'],
+                                           row['recur_every'], today).isoformat(), row['id'])
+                 for row in recurring]
+            )
+        changed += db.execute(
+            f'UPDATE tasks SET completed = 1 WHERE user_id = ? AND completed = 0 AND id IN ({placeholders})',
+            [user_id] + chunk
+        ).rowcount
+    return changed
+
+
+def uncomplete_tasks(db, user_id, ids):
+    """
+    Marks the user's completed tasks in `ids` as pending again, cancelling the
+    scheduled next occurrence and the history entry of the undone completion.
+    Returns the number of tasks changed.
+    """
+    changed = 0
+    for chunk, placeholders in _chunks(ids):
+        db.execute(
+            f'''DELETE FROM task_completions WHERE id IN (
+                    SELECT MAX(c.id) FROM task_completions c
+                    JOIN tasks t ON t.id = c.task_id
+                    WHERE t.user_id = ? AND t.completed = 1 AND t.next_due_date IS NOT NULL
+                      AND t.id IN ({placeholders})
+                    GROUP BY c.task_id)''',
+            [user_id] + chunk
+        )
+        changed += db.execute(
+            f'''UPDATE tasks SET completed = 0, next_due_date = NULL
+                WHERE user_id = ? AND completed = 1 AND id IN ({placeholders})''',
+            [user_id] + chunk
+        ).rowcount
+    return changed
+
+
+def delete_tasks(db, user_id, ids):
+    """Deletes the user's tasks in `ids`. Returns the number deleted."""
+    changed = 0
+    for chunk, placeholders in _chunks(ids):
+        changed += db.execute(
+            f'DELETE FROM tasks WHERE user_id = ? AND id IN ({placeholders})',
+            [user_id] + chunk
+        ).rowcount
+    return changed
+
+
+_OPERATIONS = {
+    'complete': complete_tasks,
+    'uncomplete': uncomplete_tasks,
+    'delete': delete_tasks,
+}
+
+
+def apply_action(db, user_id, action, ids):
+    """
+    Applies `action` ('complete', 'uncomplete' or 'delete') to the user's tasks in `ids`
+    and bumps the data version if anything changed. No commit (see write_queue.run_write).
+    Tasks that don't belong to the user (or are already in the target state) are left alone.
+    Returns the number of tasks changed.
+    """
+    changed = _OPERATIONS[action](db, user_id, ids)
+    if changed:
+        task_stats.bump_data_version(db, user_id)
+    return changed
+
+
+# --- Recurring Tasks ---
+def _due_filter(today, user_id):
+    where = 'next_due_date IS NOT NULL AND next_due_date <= ?'
+    params = [(today or date.today()).isoformat()]
+    if user_id is not None:
+        where += ' AND user_id = ?'
+        params.append(user_id)
+    return where, params
+
+def has_due_recurring(db, user_id=None, today=None):
+    """True if completed recurring tasks (of one user, or anyone's) are due to reopen. Only reads."""
+    where, params = _due_filter(today, user_id)
+    return db.execute(f'SELECT 1 FROM tasks WHERE {where} LIMIT 1', params).fetchone() is not None
+
+def reopen_due_recurring(db, user_id=None, today=None):
+    """
+    Reopens completed recurring tasks whose next_due_date has arrived, moving that date
+    into due_date, and bumps each affected user's data version. No commit (see
+    write_queue.run_write). Uses the partial index on next_due_date. Returns the number reopened.
+    """
+    where, params = _due_filter(today, user_id)
+    # De-duplicated in Python: SELECT DISTINCT would steer the planner away from the partial index
+    user_ids = sorted({row[0] for row in db.execute(f'SELECT user_id FROM tasks WHERE {where}', params)})
+    if not user_ids:
+        return 0
+    reopened = db.execute(
+        f'UPDATE tasks SET completed = 0, due_date = next_due_date, next_due_date = NULL WHERE {where}',
+        params
+    ).rowcount
+    for affected_user in user_ids:
+        task_stats.bump_data_version(db, affected_user)
+    return reopened
+
+def roll_due_recurring(db, today=None, user_id=None):
+    """
+    reopen_due_recurring() committed on `db`, for `flask roll-recurring` (everyone, outside
+    any request). Only takes the write lock when something is actually due. Requests use
+    has_due_recurring() and run reopen_due_recurring() through run_write instead.
+    """
+    if not has_due_recurring(db, user_id, today):
+        return 0
+    try:
+        reopened = reopen_due_recurring(db, user_id, today)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return reopened
@@ -0,0 +1,194 @@
+# --- Imports ---
+import sqlite3
+
+from flask import current_app, flash, redirect, render_template, request, url_for
+
+import fragment_cache
+import replica
+import task_fields
+import task_io
+import task_ops
+import task_stats
+from pagination import decode_cursor
+from write_queue import run_write
+
+# --- Shared Task Pages ---
+# The dashboard, task add/edit/detail, complete/uncomplete/delete and analytics pages are
+# served by the views in app.py and, under asgi.py, by the coroutines in async_views.py.
+# Everything those pages do apart from waiting on the database lives here, so the two
+# versions only differ in how they call the database steps below: app.py calls them
+# directly (or through run_write), async_views.py through AsyncDatabase.
+
+DASHBOARD_VIEWS = ('incomplete', 'completed')
+TASK_DETAIL_SQL = (f'SELECT {task_fields.select_columns(task_fields.DETAIL_FIELDS)} '
+                   'FROM tasks WHERE id = ? AND user_id = ?')
+TASK_HISTORY_SQL = ('SELECT due_date, completed_on FROM task_completions '
+                    'WHERE task_id = ? ORDER BY completed_on DESC, id DESC LIMIT 10')
+
+# action -> (flash on success, flash category, what failed, dashboard arguments to return to)
+ACTIONS = {
+    'complete': ("Task marked as complete.", "success", "completing task", {}),
+    'uncomplete': ("Task marked as incomplete.", "info", "marking task as incomplete", {'view': 'completed'}),
+    'delete': ("Task deleted.", "info", "deleting task", {}),
+}
+
+
+# --- Database Steps (blocking; each takes a connection to the user's shard) ---
+def dashboard_stamp(db, user_id):
+    """(the user's (data version, updated_at), whether recurring tasks are due to reopen)."""
+    return task_stats.get_data_stamp(db, user_id), task_ops.has_due_recurring(db, user_id)
+
+def reopen_due_tasks(db, user_id):
+    """
+    Brings back the user's recurring tasks that are due, through run_write. Usually just
+    the read; for the sync views (the async dashboard checks dashboard_stamp's flag).
+    Returns True if any were reopened.
+    """
+    if not task_ops.has_due_recurring(db, user_id):
+        return False
+    return run_write(task_ops.reopen_due_recurring, user_id) > 0
+
+def fetch_task(db, user_id, task_id):
+    """The user's task with every detail column, or None (missing or someone else's)."""
+    return db.execute(TASK_DETAIL_SQL, (task_id, user_id)).fetchone()
+
+def fetch_task_detail(db, user_id, task_id):
+    """(task or None, recent completions) for the detail page; history is only kept for recurring tasks."""
+    task = fetch_task(db, user_id, task_id)
+    history = []
+    if task and task['recur_unit']:
+        try:
+            history = db.execute(TASK_HISTORY_SQL, (task_id,)).fetchall()
+        except sqlite3.Error as e:
+            current_app.logger.error(f"Task History DB Error: {e}")
+    return task, history
+
+def add_task(db, user_id, values):
+    task_io.insert_task(db, user_id, values)
+    task_stats.bump_data_version(db, user_id) # Invalidates cached analytics
+
+def update_task(db, user_id, task_id, values):
+    task_io.update_task(db, user_id, task_id, values)
+    task_stats.bump_data_version(db, user_id) # Invalidates cached analytics
+
+def analytics_summary(user_id):
+    """(summary, snapshot time): from the replica when ANALYTICS_REPLICA is on, else the live file."""
+    with replica.analytics_db(user_id) as (db, snapshot_at):
+        # Reads the trigger-maintained task_summary table, so the cost does not grow with task count
+        return task_stats.get_user_summary(db, user_id), snapshot_at
+
+
+# --- Requests and Responses ---
+def db_error(message, label, e):
+    """Flashes `message: error` and logs it under `label`."""
+    flash(f"{message}: {e}", "danger")
+    current_app.logger.error(f"{label} DB Error: {e}")
+
+def task_not_found():
+    flash("Task not found or access denied.", "warning")
+    return redirect(url_for('dashboard'))
+
+def page_validators(name, user_id, stamp, *parts):
+    """(cache key, ETag, Last-Modified) for a page built from the user's data at `stamp`."""
+    version, updated_at = stamp
+    key = fragment_cache.fragment_key(name, user_id, version, *parts)
+    return key, fragment_cache.make_etag(key), fragment_cache.last_modified_from(updated_at)
+
+def with_validators(html, etag, last_modified):
+    return fragment_cache.add_validators(current_app.make_response(html), etag, last_modified)
+
+# Dashboard
+def dashboard_args():
+    """(view, cursor, position) from the query string; position is the `after` token when it decoded."""
+    current_view = request.args.get('view', 'incomplete')
+    if current_view not in DASHBOARD_VIEWS:
+        current_view = 'incomplete' # Fallback for invalid values
+    after = request.args.get('after')
+    cursor = decode_cursor(after) # None means the first page
+    return current_view, cursor, after if cursor else ''
+
+def render_task_list(tasks, next_cursor, cursor, current_view):
+    return render_template('task_list.html', tasks=tasks, next_cursor=next_cursor,
+                           is_first_page=cursor is None, current_view=current_view)
+
+def render_dashboard(task_list, current_view):
+    return render_template('dashboard.html', task_list=task_list, current_view=current_view)
+
+def dashboard_failed(e, current_view):
+    """The dashboard with an empty list (the page itself still works)."""
+    db_error("Error fetching tasks", "Dashboard", e)
+    return render_dashboard(render_task_list([], None, None, current_view), current_view)
+
+# Add / edit
+def task_form(task=None, task_id=None):
+    """The add form, or the edit form of task `task_id`, filled from `task`."""
+    action = url_for('add_task') if task_id is None else url_for('edit_task', id=task_id)
+    return render_template('task_form.html', task=task, form_action=action)
+
+def validate_task_form(task=None):
+    """
+    Parses and checks every submitted field (dates, cost in cents, time in minutes).
+    When editing `task`, fields the form doesn't show (video_url, completed) keep their
+    stored values. Returns (values, None), or (None, the form shown again with the error).
+    """
+    if task is None:
+        record = request.form
+    else:
+        record = {field: task[field] for field in task_io.TASK_FIELDS}
+        record.update(request.form.to_dict())
+    values, error = task_io.validate_row(record)
+    if error is None:
+        return values, None
+    flash(f"Could not save task: {error}.", "danger")
+    if task is None:
+        return None, task_form(record)
+    return None, task_form(dict(record, id=task['id']), task['id'])
+
+def task_saved(task_id=None):
+    flash("Task added successfully!" if task_id is None else "Task updated successfully!", "success")
+    return redirect(url_for('dashboard'))
+
+def save_failed(e, task, task_id=None):
+    """The form again, after a database error while saving."""
+    if task_id is None:
+        db_error("Error adding task", "Add Task", e)
+    else:
+        db_error("Error updating task", "Edit Task Update", e)
+    return task_form(task, task_id)
+
+# Detail
+def render_task_body(task, history):
+    """The cacheable part of the detail page; None when there is no such task (not cached)."""
+    if not task:
+        return None
+    return render_template('task_detail_body.html', task=task, history=history)
+
+def render_task_detail(task_body, etag, last_modified):
+    if task_body is None:
+        return task_not_found()
+    return with_validators(render_template('task_detail.html', task_body=task_body), etag, last_modified)
+
+# Complete / uncomplete / delete buttons
+def action_done(action, changed):
+    """Flashes how one button went (nothing changed: not the user's task) and returns to the list."""
+    done_message, category, _, back_to = ACTIONS[action]
+    if changed == 0:
+        flash("Task not found or access denied.", "warning")
+    else:
+        flash(done_message, category)
+    return redirect(url_for('dashboard', **back_to))
+
+def action_failed(action, e):
+    _, _, failed, back_to = ACTIONS[action]
+    db_error(f"Error {failed}", f"{action.capitalize()} Task", e)
+    return redirect(url_for('dashboard', **back_to))
+
+# Analytics
+def render_analytics(summary, snapshot_at=None):
+    return render_template('analytics.html', total=summary['total'], done=summary['done'],
+                           summary=summary, snapshot_at=snapshot_at)
+
+def analytics_failed(e):
+    """The page with zero counts."""
+    db_error("Error fetching analytics data", "Analytics", e)
+    return render_template('analytics.html', total=0, done=0, summary=None)
@@ -0,0 +1,149 @@
+# --- Imports ---
+from datetime import date, timedelta
+
+# How far ahead a pending task counts as "upcoming"
+UPCOMING_DAYS = 7
+
+# --- Summary Table ---
+# task_summary (created in migrations.py) holds one row per (user, category_id, completed)
+# with the task count and cost total (in cents) for that bucket; category_id 0 collects
+# tasks without a category. Triggers keep it up to date inside
+# the same transaction as every INSERT/UPDATE/DELETE on tasks (add_task, edit_task,
+# complete_task, uncomplete_task, delete_task, ...), so analytics never has to
+# scan the tasks table to count things.
+
+
+# --- Per-User Data Version ---
+# A counter (user_data_version table) the write routes bump whenever a user's tasks
+# change. Caches key their entries on it, so a cached result is simply never looked
+# up again once stale.
+
+def bump_data_version(db, user_id):
+    """Marks the user's data as changed. Call inside the write's transaction, before commit()."""
+    db.execute(
+        '''INSERT INTO user_data_version (user_id, version, updated_at) VALUES (?, 1, CURRENT_TIMESTAMP)
+           ON CONFLICT (user_id) DO UPDATE SET version = version + 1, updated_at = CURRENT_TIMESTAMP''',
+        (user_id,)
+    )
+
+
+def get_data_version(db, user_id):
+    """Returns the user's current data version (0 if they have never written anything)."""
+    return get_data_stamp(db, user_id)[0]
+
+
+def get_data_stamp(db, user_id):
+    """Returns (version, updated_at) for the user; updated_at is a UTC 'YYYY-MM-DD HH:MM:SS' or None."""
+    row = db.execute(
+        'SELECT version, updated_at FROM user_data_version WHERE user_id = ?', (user_id,)
+    ).fetchone()
+    return (row[0], row[1]) if row else (0, None)
+
+
+# --- Aggregation Queries ---
+# Shared by /analytics and the Streamlit dashboard. Everything is computed in SQLite;
+# due dates are ISO strings (YYYY-MM-DD), so plain string comparison orders them correctly.
+
+# Task count per category (from task_summary, so no scan of tasks)
+CATEGORY_COUNTS_SQL = '''
+    SELECT COALESCE(c.name, 'Uncategorized') AS category,
+           SUM(s.task_count) AS task_count
+    FROM task_summary s
+    LEFT JOIN categories c ON c.id = s.category_id
+    WHERE s.user_id = ?
+    GROUP BY s.category_id
+    ORDER BY task_count DESC, category ASC
+'''
+
+# Completed vs pending totals (from task_summary)
+STATUS_COUNTS_SQL = '''
+    SELECT completed, SUM(task_count) AS task_count
+    FROM task_summary
+    WHERE user_id = ?
+    GROUP BY completed
+'''
+
+# Cost total/average (in dollars) over tasks that have a cost
+COST_STATS_SQL = '''
+    SELECT COUNT(cost_cents) AS priced_tasks,
+           COALESCE(SUM(cost_cents), 0) / 100.0 AS total_cost,
+           AVG(cost_cents) / 100.0 AS avg_cost
+    FROM tasks
+    WHERE user_id = ?
+'''
+
+# Pending tasks with a due date before the given cutoff (ISO date); used for both
+# the overdue list (cutoff = today) and the upcoming list (today..today+N)
+DUE_TASKS_SQL = '''
+    SELECT title, due_date, (SELECT name FROM categories c WHERE c.id = tasks.category_id) AS category
+    FROM tasks
+    WHERE user_id = ? AND completed = 0
+      AND due_date >= ? AND due_date < ?
+    ORDER BY due_date ASC, title ASC
+'''
+
+
+def due_window(today=None, days=UPCOMING_DAYS):
+    """
+    Returns ((overdue_from, overdue_to), (upcoming_from, upcoming_to)) as ISO strings
+    for use with DUE_TASKS_SQL. Upcoming includes the cutoff day itself.
+    """
+    today = today or date.today()
+    # '0' sorts after '' (tasks saved without a date) and before any real year
+    overdue = ('0', today.isoformat())
+    upcoming = (today.isoformat(), (today + timedelta(days=days + 1)).isoformat())
+    return overdue, upcoming
+
+
+def get_user_summary(db, user_id, today=None):
+    """
+    Returns the analytics numbers for one user as a dict:
+      total, done, pending, cost_total, cost_done, overdue, upcoming,
+      and `categories` - a list of per-category dicts (name, total, done, cost).
+    Counts come from task_summary; overdue/upcoming use a due-date range on pending tasks.
+    """
+    today = today or date.today()
+    summary = {
+        'total': 0, 'done': 0, 'pending': 0,
+        'cost_total': 0.0, 'cost_done': 0.0,
+        'overdue': 0, 'upcoming': 0,
+        'categories': [],
+    }
+
+    by_category = {}
+    rows = db.execute(
+        '''SELECT c.name AS category, s.completed, s.task_count, s.cost_cents
+           FROM task_summary s LEFT JOIN categories c ON c.id = s.category_id
+           WHERE s.user_id = ?''',
+        (user_id,)
+    ).fetchall()
+    for row in rows:
+        name = row['category'] or 'Uncategorized'
+        cost = row['cost_cents'] / 100 # Summed as integer cents, so no float drift
+        bucket = by_category.setdefault(name, {'name': name, 'total': 0, 'done': 0, 'cost': 0.0})
+        bucket['total'] += row['task_count']
+        bucket['cost'] += cost
+        summary['total'] += row['task_count']
+        summary['cost_total'] += cost
+        if row['completed']:
+            bucket['done'] += row['task_count']
+            summary['done'] += row['task_count']
+            summary['cost_done'] += cost
+    summary['pending'] = summary['total'] - summary['done']
+    summary['categories'] = sorted(by_category.values(), key=lambda c: (-c['total'], c['name']))
+
+    # Due dates are ISO strings (YYYY-MM-DD), so string comparison is date comparison
+    today_iso = today.isoformat()
+    cutoff_iso = (today + timedelta(days=UPCOMING_DAYS)).isoformat()
+    due = db.execute(
+        '''SELECT
+               COALESCE(SUM(due_date < ?), 0) AS overdue,
+               COALESCE(SUM(due_date >= ?), 0) AS upcoming
+           FROM tasks
+           WHERE user_id = ? AND completed = 0
+             AND due_date > '' AND due_date <= ?''',
+        (today_iso, today_iso, user_id, cutoff_iso)
+    ).fetchone()
+    summary['overdue'] = due['overdue']
+    summary['upcoming'] = due['upcoming']
+    return summary
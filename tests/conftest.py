@@ -0,0 +1,104 @@
+import asyncio
+import os
+from urllib.parse import urlencode
+
+import pytest
+
+# Every test logs in from the same address; keep the login rate limits out of the way
+os.environ.setdefault('FIXMATE_LOGIN_RATE_PER_IP', '[100000, 0.001]')
+os.environ.setdefault('FIXMATE_LOGIN_RATE_PER_USER', '[100000, 0.001]')
+
+import app as fixmate # noqa: E402 (after the environment above)
+import async_db # noqa: E402
+import write_queue # noqa: E402
+from asgi import FixMateASGI # noqa: E402
+from db import close_all_pools, get_app_pool # noqa: E402
+
+
+@pytest.fixture
+def settings():
+    """Extra app.config values for a test module; override this fixture (or parametrize it)."""
+    return {}
+
+@pytest.fixture
+def app(tmp_path, settings):
+    """The FixMate app pointed at fresh, migrated database files in tmp_path."""
+    flask_app = fixmate.app
+    overrides = {'DATABASE': str(tmp_path / 'fixmate.db'), 'TESTING': True, **settings}
+    saved = {key: flask_app.config.get(key) for key in overrides}
+    flask_app.config.update(overrides)
+    # Per-process caches are keyed by user id, which every fresh database reuses
+    flask_app.extensions['fragment_cache'].clear()
+    flask_app.extensions['auth']['user_cache'].clear()
+    with flask_app.app_context():
+        fixmate.init_db()
+    yield flask_app
+    write_queue.close_queues(flask_app)
+    close_all_pools()
+    flask_app.config.update(saved)
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def asgi_client(app):
+    async_db.init_app(app) # A fresh DB thread pool; close() below shuts it down
+    application = FixMateASGI(app, sync_threads=4)
+    yield ASGIClient(application)
+    application.sync_executor.shutdown(wait=True)
+    application.adb.close()
+
+
+def register(client, username='alice', password='correct horse'):
+    """Registers (and thereby logs in) a user. Returns the response."""
+    return client.post('/register', data={'username': username, 'password': password})
+
+def query(app, sql, params=(), shard=0):
+    """Runs one statement on a database file of the app and returns all rows."""
+    with app.app_context(), get_app_pool(shard).connection() as db:
+        rows = db.execute(sql, params).fetchall()
+        db.commit()
+    return rows
+
+
+class ASGIClient:
+    """Drives the ASGI app directly on an event loop, keeping cookies like a browser."""
+
+    def __init__(self, application):
+        self.application = application
+        self.cookies = {}
+
+    async def request(self, method, path, form=None):
+        path, _, query_string = path.partition('?')
+        body = urlencode(form).encode() if form else b''
+        headers = [(b'host', b'localhost')]
+        if form:
+            headers.append((b'content-type', b'application/x-www-form-urlencoded'))
+        if self.cookies:
+            headers.append((b'cookie', '; '.join(f'{k}={v}' for k, v in self.cookies.items()).encode()))
+        scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query_string.encode(),
+                 'headers': headers, 'http_version': '1.1', 'scheme': 'http', 'root_path': '',
+                 'server': ('localhost', 80), 'client': ('127.0.0.1', 50000)}
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Event().wait() # No disconnect while the response is sent
+
+        response = {'body': b''}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['headers'] = {k.decode(): v.decode() for k, v in message['headers']}
+                for name, value in message['headers']:
+                    if name == b'set-cookie':
+                        cookie_name, cookie_value = value.decode().split(';')[0].split('=', 1)
+                        self.cookies[cookie_name] = cookie_value
+            else:
+                response['body'] += message.get('body', b'')
+
+        await self.application(scope, receive, send)
+        return response
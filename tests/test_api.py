@@ -0,0 +1,102 @@
+from datetime import date
+
+import pytest
+
+from conftest import query, register
+
+
+@pytest.fixture
+def task(app, client):
+    """Alice's task 1, created through the API after logging in there (no flash messages in the session)."""
+    register(app.test_client())
+    assert client.post('/api/v1/session', json={'username': 'alice', 'password': 'correct horse'}).status_code == 200
+    response = client.post('/api/v1/tasks', json={'title': 'Clean gutters', 'category': 'Exterior',
+                                                  'due_date': '2025-03-01', 'cost': '12.50'})
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def test_patch_changes_only_the_fields_sent(client, task):
+    response = client.patch(f'/api/v1/tasks/{task}', json={'due_date': '2025-04-01'})
+    assert response.status_code == 200
+    body = client.get(f'/api/v1/tasks/{task}').get_json()
+    assert (body['title'], body['category'], body['due_date']) == ('Clean gutters', 'Exterior', '2025-04-01')
+    assert body['cost'] == 12.5
+
+@pytest.mark.parametrize('body, status', [
+    ({}, 400),
+    ({'owner': 2}, 400),
+    ({'due_date': 'next week'}, 422),
+    ({'title': ''}, 422),
+])
+def test_bad_patch_changes_nothing(client, task, body, status):
+    before = client.get(f'/api/v1/tasks/{task}').get_json()
+    response = client.patch(f'/api/v1/tasks/{task}', json=body)
+    assert response.status_code == status
+    assert 'error' in response.get_json()
+    assert client.get(f'/api/v1/tasks/{task}').get_json() == before
+
+@pytest.mark.parametrize('body', [
+    {'action': 'delete', 'ids': '23'}, # Not read digit by digit as tasks 2 and 3
+    {'action': 'delete', 'ids': 5},
+    {'action': 'delete', 'ids': [2, None]},
+    {'action': 'delete', 'ids': []},
+])
+def test_bad_batch_changes_nothing(app, client, task, body):
+    for title in ('Fix tap', 'Paint door'):
+        client.post('/api/v1/tasks', json={'title': title})
+    response = client.post('/api/v1/tasks/batch', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert len(query(app, 'SELECT id FROM tasks')) == 3
+
+def test_batch_accepts_ids_as_numbers_or_strings(client, task):
+    client.post('/api/v1/tasks', json={'title': 'Fix tap'})
+    response = client.post('/api/v1/tasks/batch', json={'action': 'complete', 'ids': [task, '2']})
+    assert response.get_json() == {'changed': 2}
+
+@pytest.mark.parametrize('body', [['alice', 'correct horse'], 'alice'])
+def test_login_needs_a_json_object(app, body):
+    register(app.test_client())
+    response = app.test_client().post('/api/v1/session', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+def test_patch_of_someone_elses_task_is_not_found(app, client, task):
+    bob = app.test_client()
+    register(bob, 'bob')
+    assert bob.patch(f'/api/v1/tasks/{task}', json={'title': 'Mine now'}).status_code == 404
+    assert client.get(f'/api/v1/tasks/{task}').get_json()['title'] == 'Clean gutters'
+
+def test_completing_a_recurring_task_by_patch_schedules_it(app, client, task):
+    client.patch(f'/api/v1/tasks/{task}', json={'frequency': 'Monthly'})
+    body = client.patch(f'/api/v1/tasks/{task}', json={'completed': True}).get_json()
+    assert body['completed'] in (1, True)
+    assert body['next_due_date'] > date.today().isoformat() # A month after it was done
+    assert len(query(app, 'SELECT id FROM task_completions WHERE task_id = ?', (task,))) == 1
+
+def test_conditional_get_until_the_task_changes(client, task):
+    first = client.get(f'/api/v1/tasks/{task}')
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')
+    assert first.headers['Last-Modified']
+
+    unchanged = client.get(f'/api/v1/tasks/{task}', headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304
+    assert unchanged.get_data() == b''
+
+    client.patch(f'/api/v1/tasks/{task}', json={'title': 'Clear gutters'})
+    changed = client.get(f'/api/v1/tasks/{task}', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()['title'] == 'Clear gutters'
+
+def test_list_etag_depends_on_the_query(client, task):
+    etag = client.get('/api/v1/tasks?status=pending').headers['ETag']
+    assert client.get('/api/v1/tasks?status=pending', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/v1/tasks?status=completed', headers={'If-None-Match': etag}).status_code == 200
+
+def test_sparse_fields(client, task):
+    body = client.get(f'/api/v1/tasks/{task}?fields=id,title').get_json()
+    assert body == {'id': task, 'title': 'Clean gutters'}
+    assert client.get(f'/api/v1/tasks/{task}?fields=id,password').status_code == 400
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import query
+
+
+@pytest.fixture
+def context_errors(caplog):
+    """Errors logged about Flask's contexts (e.g. by db.close_db) during the test."""
+    caplog.set_level(logging.ERROR)
+    yield lambda: [r.getMessage() for r in caplog.records if 'context' in r.getMessage()]
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_async_dashboard_and_add(app, asgi_client):
+    async def scenario():
+        await asgi_client.request('POST', '/register', {'username': 'alice', 'password': 'pw'})
+        added = await asgi_client.request('POST', '/task/add', {'title': 'Async task', 'cost': '5'})
+        dashboard = await asgi_client.request('GET', '/dashboard')
+        return added, dashboard
+
+    added, dashboard = run(scenario())
+    assert added['status'] == 302
+    assert dashboard['status'] == 200 and b'Async task' in dashboard['body']
+
+def test_streamed_calendar_feed(app, asgi_client, context_errors):
+    async def scenario():
+        await asgi_client.request('POST', '/register', {'username': 'alice', 'password': 'pw'})
+        query(app, "INSERT INTO tasks (user_id, title, due_date) VALUES (1, 'Clean gutters', ?)",
+              ((date.today() + timedelta(days=7)).isoformat(),))
+        return await asgi_client.request('GET', '/calendar.ics')
+
+    response = run(scenario())
+    assert response['status'] == 200
+    assert response['body'].startswith(b'BEGIN:VCALENDAR')
+    assert b'Clean gutters' in response['body'] and response['body'].rstrip().endswith(b'END:VCALENDAR')
+    assert context_errors() == []
+
+def test_concurrent_csv_exports(app, asgi_client, context_errors):
+    async def scenario():
+        await asgi_client.request('POST', '/register', {'username': 'alice', 'password': 'pw'})
+        for i in range(50):
+            query(app, 'INSERT INTO tasks (user_id, title) VALUES (1, ?)', (f'Task {i}',))
+        return await asyncio.gather(*[asgi_client.request('GET', '/tasks/export/csv') for _ in range(8)])
+
+    responses = run(scenario())
+    assert {r['status'] for r in responses} == {200}
+    assert {r['body'].count(b'Task ') for r in responses} == {50}
+    assert context_errors() == []
+
+def test_client_leaving_mid_stream_stops_the_view(app, asgi_client):
+    async def scenario():
+        await asgi_client.request('POST', '/register', {'username': 'alice', 'password': 'pw'})
+        for i in range(2000):
+            query(app, 'INSERT INTO tasks (user_id, title) VALUES (1, ?)', (f'Task {i}',))
+        scope = {'type': 'http', 'method': 'GET', 'path': '/tasks/export/csv', 'query_string': b'',
+                 'headers': [(b'host', b'localhost'), (b'cookie', '; '.join(
+                     f'{k}={v}' for k, v in asgi_client.cookies.items()).encode())]}
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.body':
+                raise OSError('client went away')
+
+        with pytest.raises(OSError):
+            await asgi_client.application(scope, receive, send)
+
+    run(scenario())
+    # The view noticed and finished; the pool is free again (the fixture's shutdown would hang otherwise)
+    asgi_client.application.sync_executor.submit(lambda: None).result(timeout=5)
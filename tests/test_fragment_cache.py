@@ -0,0 +1,44 @@
+import pytest
+from flask import Flask
+
+import assets
+import fragment_cache
+from fragment_cache import CacheBackend, MemoryCache
+
+
+def test_incomplete_backend_fails_at_construction():
+    class GetOnly(CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+def test_memory_cache_entries_expire():
+    cache = MemoryCache(ttl=-1)
+    cache.set('a', 1)
+    assert cache.get('a') is None
+
+def namespace_after_build(tmp_path, css):
+    """FRAGMENT_CACHE_NAMESPACE of an app whose static/site.css holds `css`."""
+    (tmp_path / 'static').mkdir(exist_ok=True)
+    (tmp_path / 'templates').mkdir(exist_ok=True)
+    (tmp_path / 'static' / 'site.css').write_text(css)
+    app = Flask('fixmate_test', root_path=str(tmp_path), instance_path=str(tmp_path / 'instance'))
+    assets.init_app(app)
+    fragment_cache.init_app(app)
+    return app.config['FRAGMENT_CACHE_NAMESPACE']
+
+def test_namespace_changes_when_the_assets_are_rebuilt(tmp_path):
+    # A cached page or 304 must not keep linking to a fingerprinted file that is no longer served
+    first = namespace_after_build(tmp_path, 'body { color: red; }')
+    assert namespace_after_build(tmp_path, 'body { color: red; }') == first
+    assert namespace_after_build(tmp_path, 'body { color: blue; }') != first
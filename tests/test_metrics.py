@@ -0,0 +1,39 @@
+import pytest
+from flask import Flask
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def tracer_settings():
+    """init_app() sets the shared TRACER; put the app's settings back afterwards."""
+    saved = dict(vars(metrics.TRACER))
+    yield
+    vars(metrics.TRACER).clear()
+    vars(metrics.TRACER).update(saved)
+
+def metrics_app(**config):
+    flask_app = Flask(__name__)
+    flask_app.config.update(METRICS_ENDPOINT='/metrics', **config)
+    metrics.init_app(flask_app)
+    return flask_app.test_client()
+
+
+def test_page_and_tracing_are_off_by_default(app, client):
+    assert client.get('/metrics').status_code == 404
+    assert not app.config['SQL_TRACING']
+    assert 'DB_CONNECTION_FACTORY' not in app.config
+
+def test_page_answers_only_localhost_without_a_token():
+    client = metrics_app()
+    assert client.get('/metrics').status_code == 200
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '203.0.113.5'}).status_code == 403
+
+@pytest.mark.parametrize('authorization, status', [
+    (None, 403), ('Bearer wrong', 403), ('s3cret', 403), ('Bearer s3cret', 200),
+])
+def test_token_is_required_when_set(authorization, status):
+    client = metrics_app(METRICS_TOKEN='s3cret')
+    headers = {'Authorization': authorization} if authorization else {}
+    response = client.get('/metrics', headers=headers, environ_base={'REMOTE_ADDR': '203.0.113.5'})
+    assert response.status_code == status
@@ -0,0 +1,112 @@
+import sqlite3
+
+import pytest
+from werkzeug.security import check_password_hash
+
+import check_schema
+import migrations
+import task_stats
+
+# The schema.sql every database was created from before migrations.py existed
+ORIGINAL_SCHEMA = '''
+    CREATE TABLE users (
+      id       INTEGER PRIMARY KEY AUTOINCREMENT,
+      username TEXT    NOT NULL UNIQUE,
+      password TEXT    NOT NULL
+    );
+    CREATE TABLE tasks (
+      id             INTEGER PRIMARY KEY AUTOINCREMENT,
+      user_id        INTEGER NOT NULL,
+      title          TEXT    NOT NULL,
+      category       TEXT,
+      due_date       TEXT,
+      frequency      TEXT,
+      cost           REAL,
+      estimated_time TEXT,
+      guide          TEXT,
+      video_url      TEXT,
+      completed      INTEGER NOT NULL DEFAULT 0,
+      FOREIGN KEY(user_id) REFERENCES users(id)
+    );
+'''
+
+
+@pytest.fixture
+def connect(tmp_path):
+    """Opens the test database file the way the pool does (sqlite3.Row, foreign keys on)."""
+    connections = []
+
+    def open_db():
+        db = sqlite3.connect(tmp_path / 'fixmate.db')
+        db.row_factory = sqlite3.Row
+        db.execute('PRAGMA foreign_keys = ON')
+        connections.append(db)
+        return db
+    yield open_db
+    for db in connections:
+        db.close()
+
+def quiet(message):
+    pass
+
+def schema(db):
+    return db.execute("SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' "
+                      "ORDER BY type, name").fetchall()
+
+def index_names(db):
+    return {row['name'] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_fresh_database_reaches_the_latest_version(connect):
+    db = connect()
+    applied = migrations.migrate(db, log=quiet)
+    assert applied == [version for version, _, _ in migrations.MIGRATIONS]
+    assert migrations.get_version(db) == migrations.LATEST_VERSION
+    assert set(check_schema.EXPECTED_INDEXES) <= index_names(db)
+
+def test_migrating_again_changes_nothing(connect):
+    db = connect()
+    migrations.migrate(db, log=quiet)
+    before = schema(db)
+    assert migrations.migrate(db, log=quiet) == []
+    assert schema(db) == before
+    assert migrations.get_version(db) == migrations.LATEST_VERSION
+
+def test_original_schema_is_upgraded_with_its_data(connect):
+    db = connect()
+    db.executescript(ORIGINAL_SCHEMA)
+    db.execute("INSERT INTO users (username, password) VALUES ('demo', 'plain text')")
+    db.execute("INSERT INTO tasks (user_id, title, category, due_date, cost, estimated_time, completed) "
+               "VALUES (1, 'Clean gutters', 'Exterior', '2025-03-01', 12.5, '2 hours', 0)")
+    db.execute("INSERT INTO tasks (user_id, title, category, cost, estimated_time, completed) "
+               "VALUES (1, 'Fix tap', 'plumbing', '', 'a while', 1)")
+    db.commit()
+
+    assert migrations.migrate(db, log=quiet) == [version for version, _, _ in migrations.MIGRATIONS]
+    assert migrations.get_version(db) == migrations.LATEST_VERSION
+
+    user = db.execute('SELECT password_hash FROM users').fetchone()
+    assert check_password_hash(user['password_hash'], 'plain text')
+    tasks = db.execute('SELECT title, due_date, cost_cents, estimated_minutes, guide FROM tasks ORDER BY id').fetchall()
+    assert tuple(tasks[0]) == ('Clean gutters', '2025-03-01', 1250, 120, None)
+    # Unreadable values are kept in the guide rather than lost
+    assert tuple(tasks[1])[:4] == ('Fix tap', None, None, None)
+    assert 'a while' in tasks[1]['guide']
+
+    # The trigger-maintained counters start out matching the old rows
+    summary = task_stats.get_user_summary(db, 1)
+    assert (summary['total'], summary['done'], summary['cost_total']) == (2, 1, 12.5)
+    assert set(check_schema.EXPECTED_INDEXES) <= index_names(db)
+
+def test_failed_migration_leaves_the_last_good_version(connect, monkeypatch):
+    db = connect()
+
+    def broken(db):
+        db.execute('CREATE TABLE half_done (id INTEGER)')
+        raise sqlite3.OperationalError("disk I/O error")
+    monkeypatch.setattr(migrations, 'MIGRATIONS', migrations.MIGRATIONS[:2] + [(3, 'broken', broken)])
+
+    with pytest.raises(sqlite3.OperationalError):
+        migrations.migrate(db, log=quiet)
+    assert migrations.get_version(db) == 2
+    assert db.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
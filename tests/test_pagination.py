@@ -0,0 +1,65 @@
+import pytest
+
+from conftest import query, register
+from pagination import decode_cursor, encode_cursor, fetch_task_page
+from db import get_app_pool
+
+
+@pytest.fixture
+def tasks(app, client):
+    """Seven pending tasks with ties on due date and title, undated ones first, plus three done."""
+    register(client)
+    rows = [
+        (None, 'b'), (None, 'a'), ('2025-01-01', 'x'), ('2025-01-01', 'x'),
+        ('2025-01-01', 'a'), ('2025-02-01', 'a'), ('2024-12-31', 'z'),
+    ]
+    for due_date, title in rows:
+        query(app, 'INSERT INTO tasks (user_id, title, due_date) VALUES (1, ?, ?)', (title, due_date))
+    for title in ('c', 'a', 'b'):
+        query(app, 'INSERT INTO tasks (user_id, title, completed) VALUES (1, ?, 1)', (title,))
+
+
+def walk(app, view, limit):
+    """Every row of the view, fetched page by page through the cursors."""
+    seen, cursor = [], None
+    with app.app_context(), get_app_pool().connection() as db:
+        while True:
+            rows, next_token = fetch_task_page(db, 1, view, cursor, limit=limit)
+            seen += [tuple(row) for row in rows]
+            if next_token is None:
+                return seen
+            cursor = decode_cursor(next_token)
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 50])
+def test_pending_pages_cover_every_task_once_in_order(app, tasks, limit):
+    expected = query(app, 'SELECT id, title, category_id, due_date FROM tasks '
+                          'WHERE completed = 0 ORDER BY due_date, title, id')
+    got = walk(app, 'incomplete', limit)
+    assert [row[0] for row in got] == [row['id'] for row in expected]
+
+@pytest.mark.parametrize('limit', [1, 2, 50])
+def test_completed_pages_sorted_by_title(app, tasks, limit):
+    assert [row[1] for row in walk(app, 'completed', limit)] == ['a', 'b', 'c']
+
+def test_cursor_round_trip_and_garbage():
+    token = encode_cursor([None, 'Title', 12])
+    assert decode_cursor(token) == [None, 'Title', 12]
+    assert decode_cursor('not-base64!') is None
+    assert decode_cursor(encode_cursor({'a': 1})) is None # Must be a list
+    assert decode_cursor('') is None
+
+def test_dashboard_ignores_a_bad_cursor(client, tasks):
+    response = client.get('/dashboard?after=%%%garbage')
+    assert response.status_code == 200
+
+def test_api_pages_follow_next_cursor(client, tasks):
+    ids, cursor = [], None
+    while True:
+        url = '/api/v1/tasks?status=pending&limit=2' + (f'&cursor={cursor}' if cursor else '')
+        body = client.get(url).get_json()
+        ids += [task['id'] for task in body['tasks']]
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+    assert len(ids) == len(set(ids)) == 7
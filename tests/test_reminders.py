@@ -0,0 +1,22 @@
+import json
+
+import pytest
+
+from reminders import FileSink, Reminder, ReminderSink
+
+
+def test_sink_without_send_fails_at_construction():
+    class Silent(ReminderSink):
+        pass
+
+    with pytest.raises(TypeError):
+        Silent()
+
+def test_file_sink_appends_one_json_line_per_reminder(tmp_path):
+    path = tmp_path / 'reminders.jsonl'
+    sink = FileSink(str(path))
+    for task_id in (1, 2):
+        reminder = Reminder(None, task_id, 1, 'alice', 'Clean gutters', '2025-03-01')
+        sink.send(None, reminder, f"Reminder {task_id}")
+    records = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [(record['task_id'], record['message']) for record in records] == [(1, 'Reminder 1'), (2, 'Reminder 2')]
@@ -0,0 +1,39 @@
+from conftest import query, register
+from db import get_app_pool
+from search import build_match_query, search_tasks
+
+
+def seed(app, client):
+    register(client, 'alice')
+    register(app.test_client(), 'bob') # A fresh client: a logged-in one is sent to the dashboard
+    for user_id, title in ((1, 'Replace HVAC filter'), (1, 'Clean gutters'), (2, 'Replace HVAC filter')):
+        query(app, 'INSERT INTO tasks (user_id, title) VALUES (?, ?)', (user_id, title))
+
+def titles(app, user_id, text):
+    with app.app_context(), get_app_pool().connection() as db:
+        rows, _ = search_tasks(db, user_id, text)
+    return sorted(row['title'] for row in rows)
+
+
+def test_prefix_words_find_tasks(app, client):
+    seed(app, client)
+    assert titles(app, 1, 'hva filt') == ['Replace HVAC filter']
+    assert titles(app, 1, 'gutter') == ['Clean gutters']
+
+def test_words_do_not_match_the_owner_token(app, client):
+    seed(app, client)
+    for text in ('u', 'u1', 'u2'):
+        assert titles(app, 1, text) == []
+
+def test_other_users_tasks_are_never_returned(app, client):
+    seed(app, client)
+    with app.app_context(), get_app_pool().connection() as db:
+        rows, _ = search_tasks(db, 2, 'replace')
+        owners = {db.execute('SELECT user_id FROM tasks WHERE id = ?', (row['id'],)).fetchone()[0]
+                  for row in rows}
+    assert owners == {2}
+
+def test_fts_syntax_is_quoted():
+    assert build_match_query('title:x OR y*', 7) == (
+        'owner : "u7" AND {title category guide} : ("title"* "x"* "OR"* "y"*)')
+    assert build_match_query('  ;; ', 7) is None
@@ -0,0 +1,49 @@
+import pytest
+from flask.sessions import SecureCookieSessionInterface
+
+import sessions
+from conftest import query, register
+
+
+@pytest.fixture
+def server_sessions(app):
+    """The app with SESSION_BACKEND = 'sqlite' for one test."""
+    saved = app.session_interface
+    app.session_interface = sessions.ServerSessionInterface(sessions.SqliteSessionStore(app))
+    yield
+    app.session_interface = saved
+
+
+def test_cookie_sessions_are_the_default(app, client):
+    assert isinstance(app.session_interface, SecureCookieSessionInterface)
+    register(client)
+    assert client.get('/dashboard').status_code == 200
+    assert query(app, 'SELECT COUNT(*) FROM sessions')[0][0] == 0
+
+def test_sqlite_sessions_keep_only_an_id_in_the_cookie(app, client, server_sessions):
+    register(client)
+    sid = client.get_cookie(app.config['SESSION_COOKIE_NAME']).value
+    assert sessions.SESSION_ID_PATTERN.match(sid)
+    assert [row[0] for row in query(app, 'SELECT id FROM sessions')] == [sid]
+    assert client.get('/dashboard').status_code == 200
+
+    client.get('/logout')
+    assert query(app, 'SELECT id FROM sessions WHERE id = ?', (sid,)) == []
+    assert client.get('/dashboard').status_code == 302
+
+def test_unknown_backend_is_rejected(app):
+    saved = app.config['SESSION_BACKEND']
+    app.config['SESSION_BACKEND'] = 'redis'
+    try:
+        with pytest.raises(ValueError):
+            sessions.init_app(app)
+    finally:
+        app.config['SESSION_BACKEND'] = saved
+
+def test_incomplete_store_fails_at_construction():
+    class LoadOnly(sessions.SessionStore):
+        def load(self, sid):
+            return None
+
+    with pytest.raises(TypeError):
+        LoadOnly()
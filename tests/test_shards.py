@@ -0,0 +1,69 @@
+import pytest
+from flask import session
+
+import shards
+import task_io
+import task_pages
+import task_stats
+from conftest import query, register
+from db import get_app_pool, get_db, user_shard
+from reminders import OutboxSink, ReminderScheduler
+from write_queue import run_write
+
+
+@pytest.fixture(params=[False, True], ids=['direct', 'write-queue'])
+def settings(request):
+    return {'DB_SHARDS': 2, 'WRITE_QUEUE': request.param}
+
+@pytest.fixture
+def alice(app, client):
+    """User 1, who hashes to shard 1, with one task."""
+    register(client)
+    client.post('/task/add', data={'title': 'Before the move'})
+    assert query(app, 'SELECT shard FROM shard_directory WHERE user_id = 1')[0][0] == 1
+    return 1
+
+def titles(app, shard, user_id=1):
+    return sorted(row[0] for row in query(app, 'SELECT title FROM tasks WHERE user_id = ?', (user_id,), shard=shard))
+
+def add_task_after_move(app, user_id, target_shard):
+    """A request that looked up the user's shard, then adds a task after the user was moved."""
+    with app.test_request_context():
+        session['user'] = {'id': user_id, 'username': 'alice'}
+        source = user_shard(user_id) # Cached for the rest of the request
+        get_db() # Connection to the old shard already borrowed
+        shards.move_user(user_id, target_shard, log=lambda message: None)
+        values, _ = task_io.validate_row({'title': 'During the move'})
+        run_write(task_pages.add_task, user_id, values)
+    return source
+
+
+@pytest.mark.parametrize('target', [0, 1])
+def test_task_added_by_a_request_that_missed_the_move_lands_on_the_new_shard(app, client, alice, target):
+    if target == 1: # Start from shard 0 to move back to 1
+        with app.test_request_context():
+            shards.move_user(alice, 0, log=lambda message: None)
+    source = add_task_after_move(app, alice, target)
+
+    assert source != target
+    assert titles(app, target) == ['Before the move', 'During the move']
+    assert titles(app, source) == []
+    dashboard = client.get('/dashboard').get_data(as_text=True)
+    assert 'Before the move' in dashboard and 'During the move' in dashboard
+
+def test_moving_back_lifts_the_fence(app, client, alice):
+    with app.test_request_context():
+        shards.move_user(alice, 0, log=lambda message: None)
+        shards.move_user(alice, 1, log=lambda message: None)
+    assert query(app, 'SELECT user_id FROM moved_users', shard=1) == []
+    assert [row[0] for row in query(app, 'SELECT user_id FROM moved_users', shard=0)] == [alice]
+    client.post('/task/add', data={'title': 'Back home'})
+    assert titles(app, 1) == ['Back home', 'Before the move']
+
+def test_reminder_claim_bumps_the_data_version(app, alice):
+    query(app, "UPDATE tasks SET due_date = date('now', 'localtime') WHERE user_id = 1", shard=1)
+    with app.app_context(), get_app_pool(1).connection() as db:
+        before = task_stats.get_data_version(db, alice)
+        scheduler = ReminderScheduler(db, OutboxSink(), remind_hour=0, log=lambda message: None)
+        assert scheduler.run_once() == 1
+        assert task_stats.get_data_version(db, alice) == before + 1
@@ -0,0 +1,90 @@
+import asyncio
+import re
+from datetime import date
+
+import app as fixmate
+from conftest import query
+
+ALERT = re.compile(r'class="alert alert-(\w+)[^"]*" role="alert">\s*(.*?)\s*<button', re.S)
+
+# (method, path, form): the task pages, including failures (invalid form, other user's task)
+STEPS = [
+    ('GET', '/task/add', None),
+    ('POST', '/task/add', {'title': '', 'cost': '5'}),
+    ('POST', '/task/add', {'title': 'Clean gutters', 'cost': 'lots'}),
+    ('POST', '/task/add', {'title': 'Clean gutters', 'cost': '$12.50', 'due_date': '2030-01-01'}), # Task 2
+    ('POST', '/task/add', {'title': 'Replace filter', 'frequency': 'Monthly', 'due_date': date.today().isoformat()}),
+    ('GET', '/dashboard', None),
+    ('GET', '/dashboard?view=bogus&after=garbage', None),
+    ('GET', '/task/edit/2', None),
+    ('POST', '/task/edit/2', {'title': 'Clean gutters and drains', 'cost': '20'}),
+    ('POST', '/task/edit/2', {'title': 'Clean gutters', 'due_date': '31/12/2030'}),
+    ('GET', '/task/2', None),
+    ('POST', '/task/complete/3', None),
+    ('GET', '/task/3', None),
+    ('POST', '/task/complete/3', None),
+    ('POST', '/task/complete/2', None),
+    ('POST', '/task/uncomplete/2', None),
+    ('POST', '/task/delete/2', None),
+    ('POST', '/task/delete/2', None),
+    ('GET', '/task/1', None), # Bob's
+    ('POST', '/task/complete/1', None),
+    ('POST', '/task/edit/1', {'title': 'Mine now'}),
+    ('GET', '/task/99', None),
+    ('GET', '/analytics', None),
+]
+
+
+class FlaskFrontEnd:
+    """The test client behind the same interface as conftest.ASGIClient."""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def request(self, method, path, form=None):
+        response = self.client.open(path, method=method, data=form)
+        return {'status': response.status_code, 'headers': {k.lower(): v for k, v in response.headers.items()},
+                'body': response.get_data()}
+
+
+async def walk(front_end):
+    """What a user sees at each step: status, where a redirect goes and the messages shown."""
+    await front_end.request('POST', '/register', {'username': 'alice', 'password': 'pw'})
+    seen = []
+    for method, path, form in STEPS:
+        response = await front_end.request(method, path, form)
+        location = response['headers'].get('location')
+        if location: # Messages are shown on the page redirected to
+            response = await front_end.request('GET', location)
+        body = response['body'].decode()
+        seen.append((path, response['status'], location, ALERT.findall(body), 'Clean gutters' in body))
+    return seen
+
+def add_bob(app):
+    """A second user with task 1 in the app's current database."""
+    query(app, "INSERT INTO users (id, username, password_hash) VALUES (2, 'bob', 'x')")
+    query(app, "INSERT INTO shard_directory (user_id, shard) VALUES (2, 0)")
+    query(app, "INSERT INTO tasks (user_id, title) VALUES (2, 'Bob task')")
+
+def fresh_database(app, path):
+    app.config['DATABASE'] = str(path)
+    app.extensions['fragment_cache'].clear()
+    app.extensions['auth']['user_cache'].clear()
+    with app.app_context():
+        fixmate.init_db()
+    add_bob(app)
+
+
+def test_flask_and_async_views_behave_the_same(app, tmp_path, asgi_client):
+    fresh_database(app, tmp_path / 'asgi.db')
+    through_asgi = asyncio.run(walk(asgi_client))
+    fresh_database(app, tmp_path / 'flask.db')
+    through_flask = asyncio.run(walk(FlaskFrontEnd(app.test_client())))
+
+    assert through_asgi == through_flask
+    messages = [message for step in through_flask for _, message in step[3]]
+    for expected in ("Task added successfully!", "Task updated successfully!", "Task marked as complete.",
+                     "Task marked as incomplete.", "Task deleted.", "Task not found or access denied."):
+        assert expected in messages
+    assert any(message.startswith("Could not save task") for message in messages)
+    assert [tuple(row) for row in query(app, 'SELECT title, completed FROM tasks WHERE id = 1')] == [('Bob task', 0)]
@@ -0,0 +1,105 @@
+import io
+import json
+import sqlite3
+
+import pytest
+
+import task_io
+from conftest import query, register
+from db import get_app_pool
+from write_queue import WriteQueue
+
+
+@pytest.fixture
+def settings():
+    return {'WRITE_QUEUE': True}
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Sizes of the batches the writers apply during the test."""
+    sizes = []
+    apply = WriteQueue._apply
+
+    def recording_apply(self, db, batch):
+        sizes.append(len(batch))
+        return apply(self, db, batch)
+    monkeypatch.setattr(WriteQueue, '_apply', recording_apply)
+    return sizes
+
+def add(title):
+    values, _ = task_io.validate_row({'title': title})
+    return lambda db: task_io.insert_task(db, 1, values)
+
+def fail_after_adding(db):
+    add('Rolled back')(db)
+    raise ValueError("bad mutation")
+
+def titles(app):
+    return sorted(row[0] for row in query(app, 'SELECT title FROM tasks'))
+
+
+def test_writes_queued_together_commit_as_one_batch(app, client, batches):
+    register(client)
+    batches.clear()
+    with app.app_context():
+        writer = WriteQueue(app, get_app_pool(0), max_delay_ms=500)
+        futures = [writer.enqueue(add(f'Task {n}')) for n in range(5)]
+        task_ids = [future.result(5) for future in futures]
+        writer.close()
+    assert batches == [5]
+    assert len(set(task_ids)) == 5
+    assert titles(app) == [f'Task {n}' for n in range(5)]
+
+def test_failing_mutation_is_rolled_back_alone(app, client, batches):
+    register(client)
+    batches.clear()
+    with app.app_context():
+        writer = WriteQueue(app, get_app_pool(0), max_delay_ms=500)
+        before = writer.enqueue(add('Before'))
+        failing = writer.enqueue(fail_after_adding)
+        after = writer.enqueue(add('After'))
+        with pytest.raises(ValueError):
+            failing.result(5)
+        assert before.result(5) and after.result(5)
+        writer.close()
+    assert batches == [3]
+    assert titles(app) == ['After', 'Before']
+
+def test_import_goes_through_the_queue(app, client, batches):
+    register(client)
+    batches.clear()
+    upload = io.BytesIO(b'title,category\nFix tap,Plumbing\n,Missing title\nPaint door,\n')
+    response = client.post('/tasks/import', data={'file': (upload, 'tasks.csv')},
+                           content_type='multipart/form-data', follow_redirects=True)
+    assert 'Imported 2 task(s).' in response.get_data(as_text=True)
+    assert batches == [1]
+    assert titles(app) == ['Fix tap', 'Paint door']
+
+    batches.clear()
+    response = client.post('/api/v1/tasks', data=json.dumps([{'title': 'Clean gutters'}, 'not an object']),
+                           content_type='application/json')
+    assert response.status_code == 201
+    assert response.get_json()['imported'] == 1
+    assert batches == [1]
+
+def test_due_recurring_tasks_reopen_through_the_queue_only_when_due(app, client, batches):
+    register(client)
+    client.post('/task/add', data={'title': 'Change filter', 'frequency': 'every 1 month'})
+    client.post('/task/complete/1')
+    batches.clear()
+    client.get('/dashboard')
+    assert batches == [] # Nothing due: the page only reads
+
+    query(app, "UPDATE tasks SET next_due_date = '2000-01-01'")
+    assert 'Change filter' in client.get('/dashboard').get_data(as_text=True)
+    assert batches == [1]
+    assert tuple(query(app, 'SELECT completed, due_date, next_due_date FROM tasks')[0]) == (0, '2000-01-01', None)
+
+def test_writes_fail_cleanly_after_the_queue_gives_up(app, client):
+    register(client)
+    with app.app_context():
+        writer = WriteQueue(app, get_app_pool(0))
+        writer.close() # Nothing will ever apply what is queued now
+        with pytest.raises(sqlite3.OperationalError):
+            writer.submit(add('Never saved'), timeout=0.1)
+    assert titles(app) == []
@@ -0,0 +1,236 @@
+# --- Imports ---
+import asyncio
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import current_app, session
+
+import metrics
+from db import get_app_pool, get_shard_db, is_user_moved, user_shard
+
+# --- Default Write Queue Settings (override via app.config) ---
+DEFAULT_MAX_BATCH = 64      # Mutations applied per transaction at most
+DEFAULT_MAX_DELAY_MS = 2    # How long the writer waits for more mutations before committing
+DEFAULT_TIMEOUT = 10.0      # Seconds a request waits for its mutation to be queued and applied
+
+WRITE_BATCH_SIZE = metrics.REGISTRY.register(metrics.Histogram(
+    'fixmate_write_batch_size', 'Mutations committed together by the write queue.',
+    (), (1, 2, 5, 10, 20, 50, 100)))
+WRITE_COMMIT_DURATION = metrics.REGISTRY.register(metrics.Histogram(
+    'fixmate_write_commit_duration_seconds', 'Time spent applying and committing one write-queue batch.',
+    (), metrics.QUERY_BUCKETS))
+
+_STOP = object()
+
+def _busy_error():
+    return sqlite3.OperationalError("The database is busy; the change was not saved. Try again.")
+
+
+# --- Group Commit ---
+class WriteQueue:
+    """
+    A single writer thread for one database file. Request threads hand it mutations
+    (`operation(db) -> result`, no commit) and wait; the writer applies whatever has
+    queued up (up to max_batch, collecting for at most max_delay_ms) in one
+    transaction with one commit, so a burst of clicks costs one fsync instead of one
+    each and no request thread ever waits on SQLite's write lock.
+
+    Each mutation runs inside its own SAVEPOINT: if it raises, only its changes are
+    undone and only its caller sees the exception; the rest of the batch still
+    commits. A caller is answered only after the commit, with exactly what its
+    operation returned (e.g. a rowcount), so "not found" checks work as before and
+    the redirect that follows reads the new data.
+    """
+
+    def __init__(self, app, pool, max_batch=DEFAULT_MAX_BATCH, max_delay_ms=DEFAULT_MAX_DELAY_MS):
+        self.app = app
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=f'fixmate-writer-{os.path.basename(pool.path)}',
+                                        daemon=True)
+        self._thread.start()
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def enqueue(self, operation, *args):
+        """Queues operation(db, *args). Returns a Future that resolves after the commit."""
+        future = Future()
+        self._queue.put((future, operation, args))
+        return future
+
+    def submit(self, operation, *args, timeout=DEFAULT_TIMEOUT):
+        """
+        Runs operation(db, *args) on the writer thread and returns its result once it is
+        committed, or raises what it raised. A mutation still queued after `timeout`
+        seconds is withdrawn and raises sqlite3.OperationalError (nothing was written);
+        one the writer has already started is waited for.
+        """
+        future = self.enqueue(operation, *args)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise _busy_error()
+            return future.result()
+
+    async def submit_async(self, operation, *args, timeout=DEFAULT_TIMEOUT):
+        """submit() for coroutines: waits without tying up a thread."""
+        future = self.enqueue(operation, *args)
+        waiter = asyncio.wrap_future(future)
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise _busy_error()
+            return await waiter
+
+    def close(self):
+        """Applies everything already queued, then stops the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _collect(self, first):
+        """Gathers what is queued behind `first`, up to max_batch or max_delay. Returns (batch, stop)."""
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _apply(self, db, batch):
+        """Applies one batch in a single transaction. Returns [(future, result, error)]."""
+        outcomes = []
+        db.execute('BEGIN IMMEDIATE')
+        for future, operation, args in batch:
+            db.execute('SAVEPOINT mutation')
+            try:
+                result, error = operation(db, *args), None
+            except Exception as e:
+                db.execute('ROLLBACK TO mutation')
+                result, error = None, e
+            db.execute('RELEASE mutation')
+            outcomes.append((future, result, error))
+        db.commit()
+        return outcomes
+
+    def _run(self):
+        stop = False
+        with self.app.app_context(), self.pool.connection() as db:
+            while not stop:
+                first = self._queue.get()
+                if first is _STOP:
+                    break
+                batch, stop = self._collect(first)
+                # Callers that gave up waiting are dropped before anything is written for them
+                batch = [item for item in batch if item[0].set_running_or_notify_cancel()]
+                if not batch:
+                    continue
+                started = time.perf_counter()
+                try:
+                    outcomes = self._apply(db, batch)
+                except Exception as e:
+                    # BEGIN or COMMIT failed (e.g. disk full): nothing in the batch was saved
+                    if db.in_transaction:
+                        db.rollback()
+                    self.app.logger.error(f"Write Queue DB Error: {e}")
+                    outcomes = [(future, None, e) for future, _, _ in batch]
+                WRITE_COMMIT_DURATION.observe(time.perf_counter() - started)
+                WRITE_BATCH_SIZE.observe(len(batch))
+                for future, result, error in outcomes:
+                    if error is None:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(error)
+
+
+# --- Flask Integration ---
+def get_queue(shard):
+    """The writer for one of the app's database files, started on first use in this process."""
+    state = current_app.extensions['write_queue']
+    pool = get_app_pool(shard)
+    with state['lock']:
+        writer = state['queues'].get(pool.path)
+        # A writer thread doesn't survive fork(); workers start their own
+        if writer is None or not writer.is_alive():
+            config = current_app.config
+            writer = WriteQueue(
+                current_app._get_current_object(), pool,
+                max_batch=config.get('WRITE_QUEUE_MAX_BATCH', DEFAULT_MAX_BATCH),
+                max_delay_ms=config.get('WRITE_QUEUE_MAX_DELAY_MS', DEFAULT_MAX_DELAY_MS),
+            )
+            state['queues'][pool.path] = writer
+    return writer
+
+def run_write(operation, *args, shard=None):
+    """
+    Runs operation(db, *args) as one committed unit of work and returns its result:
+    through the write queue when WRITE_QUEUE is on, else on the request's own
+    connection. `shard` picks the database file (default: the logged-in user's;
+    0 for the users table). The operation must not commit.
+    """
+    if shard is not None:
+        return _run_write_on(shard, operation, args)
+    user = session.get('user')
+    if not user:
+        return _run_write_on(0, operation, args)
+    try:
+        return _run_write_on(user_shard(user['id']), operation, args)
+    except sqlite3.IntegrityError as e:
+        if not is_user_moved(e):
+            raise
+        # The user moved after this request looked up their shard; nothing was written
+        return _run_write_on(user_shard(user['id'], refresh=True), operation, args)
+
+def _run_write_on(shard, operation, args):
+    if current_app.config.get('WRITE_QUEUE', False):
+        timeout = current_app.config.get('WRITE_QUEUE_TIMEOUT', DEFAULT_TIMEOUT)
+        return get_queue(shard).submit(operation, *args, timeout=timeout)
+
+    db = get_shard_db(shard)
+    try:
+        result = operation(db, *args)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result
+
+def close_queues(app):
+    """Drains and stops this process's writer threads (also runs at interpreter exit)."""
+    state = app.extensions.get('write_queue')
+    if not state:
+        return
+    with state['lock']:
+        writers = list(state['queues'].values())
+        state['queues'].clear()
+    for writer in writers:
+        writer.close()
+
+def init_app(app):
+    """
+    Sets up the optional write-behind queue.
+    Config:
+      WRITE_QUEUE               True to apply writes on one writer thread per database
+                                file, group-committed (default False: each request commits)
+      WRITE_QUEUE_MAX_BATCH     mutations per transaction at most (default 64)
+      WRITE_QUEUE_MAX_DELAY_MS  how long the writer collects a batch (default 2)
+      WRITE_QUEUE_TIMEOUT       seconds a request waits before giving up (default 10)
+    """
+    app.extensions['write_queue'] = {'lock': threading.Lock(), 'queues': {}}
+    atexit.register(close_queues, app)